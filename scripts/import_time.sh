@@ -0,0 +1,11 @@
+#!/usr/bin/env bash
+# Show the slowest imports when loading the Dagster code location.
+# Usage: bash scripts/import_time.sh [module]   (run from repo root)
+set -euo pipefail
+
+MODULE="${1:-alpes_water_monitor.dagster_app.definitions}"
+
+PYTHONPATH=./src python -X importtime -c "import ${MODULE}" 2>&1 >/dev/null \
+  | grep '^import time:' \
+  | sort -t'|' -k2 -n -r \
+  | head -n 25
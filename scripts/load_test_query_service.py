@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Load test for the metrics query service (`alpes-wm serve`): concurrent GETs over a
+mix of endpoints, reporting throughput and p50/p90/p99 latency per endpoint.
+
+Usage:
+  python scripts/load_test_query_service.py --url http://localhost:8080 \
+      --requests 2000 --concurrency 16 [--conditional] [--field sc_field_1]
+
+With --conditional every client replays the ETag it last saw (If-None-Match), as a
+dashboard polling for changes would, so most answers are 304s.
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import argparse
+import collections
+import json
+import statistics
+import threading
+import time
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    k = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[k]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--conditional", action="store_true", help="Send If-None-Match with the last ETag.")
+    parser.add_argument("--field", default=None, help="Field id for /fields/<id>/series (default: from /latest).")
+    parser.add_argument("--location", default=None, help="Location id (default: from /latest).")
+    parser.add_argument("--from", dest="start", default=None)
+    parser.add_argument("--to", dest="end", default=None)
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    latest = json.load(urlopen(f"{base}/latest", timeout=30))
+    field = args.field or (latest["fields"][0]["field_id"] if latest["fields"] else "unknown")
+    location = args.location or (latest["summary"][0]["location_id"] if latest["summary"] else "unknown")
+    query = "&".join(f"{k}={v}" for k, v in (("from", args.start), ("to", args.end)) if v)
+    suffix = f"?{query}" if query else ""
+    paths = [
+        "/latest",
+        f"/fields/{field}/series{suffix}",
+        f"/locations/{location}/series{suffix}",
+        f"/deltas{suffix}",
+    ]
+
+    etags = {}
+    etag_lock = threading.Lock()
+    latencies = collections.defaultdict(list)
+    statuses = collections.Counter()
+
+    def one(i: int) -> None:
+        path = paths[i % len(paths)]
+        request = Request(base + path)
+        if args.conditional:
+            with etag_lock:
+                etag = etags.get(path)
+            if etag:
+                request.add_header("If-None-Match", etag)
+        start = time.perf_counter()
+        try:
+            with urlopen(request, timeout=30) as resp:
+                resp.read()
+                status, etag = resp.status, resp.headers.get("ETag")
+        except HTTPError as e:
+            status, etag = e.code, e.headers.get("ETag")
+        elapsed = (time.perf_counter() - start) * 1000.0
+        with etag_lock:
+            latencies[path].append(elapsed)
+            statuses[status] += 1
+            if etag:
+                etags[path] = etag
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    everything = [v for values in latencies.values() for v in values]
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {wall:.2f}s, {args.requests / wall:.0f} req/s")
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+    print(f"{'endpoint':<48} {'n':>6} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8}  (ms)")
+    for path, values in sorted(latencies.items()) + [("ALL", everything)]:
+        print(
+            f"{path:<48} {len(values):>6} {statistics.fmean(values):>8.2f} {percentile(values, 50):>8.2f} "
+            f"{percentile(values, 90):>8.2f} {percentile(values, 99):>8.2f}"
+        )
+    return 0 if set(statuses) <= {200, 304} else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,5 @@
+import sys
+
+from alpes_water_monitor.cli import main
+
+sys.exit(main())
@@ -0,0 +1,136 @@
+"""Command line entry point: `python -m alpes_water_monitor` (or scripts/alpes-wm)."""
+from __future__ import annotations
+from pathlib import Path
+from typing import List, Optional
+import argparse
+import datetime as dt
+import logging
+import os
+import sys
+
+
+def _date(value: str) -> dt.date:
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def _backfill(args: argparse.Namespace) -> int:
+    from alpes_water_monitor.config.fields import resolve_location_config
+    from alpes_water_monitor.services.backfill import BackfillConfig, run_backfill
+    from alpes_water_monitor.services.field_metrics import MetricsConfig
+    from alpes_water_monitor.utils.ndwi import NDWIConfig
+
+    field_config = resolve_location_config(args.location)
+    metrics_cfg = MetricsConfig.from_env()
+    if args.water_threshold_pos is not None:
+        metrics_cfg.water_threshold_pos = args.water_threshold_pos
+    if args.water_threshold_strong is not None:
+        metrics_cfg.water_threshold_strong = args.water_threshold_strong
+    config = BackfillConfig(
+        start=args.start,
+        end=args.end,
+        out_dir=args.out,
+        fetch_workers=args.fetch_workers,
+        workers=args.workers,
+        overwrite=args.overwrite,
+        ndwi=NDWIConfig(
+            width=args.size,
+            height=args.size,
+            indices=tuple(args.indices.split(",")),
+            true_color=False,
+            fingerprint_acquisitions=False,
+        ),
+        metrics=metrics_cfg,
+    )
+    print(
+        f"Backfilling {field_config.location_id} {config.start}..{config.end} into {config.out_dir} "
+        f"({config.fetch_workers} fetch threads, {config.workers} compute workers)",
+        file=sys.stderr,
+    )
+    result = run_backfill(field_config, config)
+    print(
+        f"Done in {result.elapsed_s:.1f}s: {len(result.written)} written, "
+        f"{len(result.skipped)} skipped (already present), {len(result.failed)} failed",
+        file=sys.stderr,
+    )
+    for day, error in sorted(result.failed.items()):
+        print(f"  {day}: {error}", file=sys.stderr)
+    return 1 if result.failed else 0
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from alpes_water_monitor.query.server import QueryServer
+    from alpes_water_monitor.query.store import QueryConfig
+
+    config = QueryConfig.from_env()
+    if args.hot_days is not None:
+        config.hot_days = args.hot_days
+    if args.poll_seconds is not None:
+        config.poll_seconds = args.poll_seconds
+    if args.cache_size is not None:
+        config.cache_size = args.cache_size
+    server = QueryServer(args.host, args.port, config)
+    print(f"Serving metrics queries on {server.url} (store version {server.service.store.version})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="alpes-wm", description="Alpes Water Monitor tools.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log at INFO level.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser(
+        "backfill",
+        help="Fetch and compute per-field metrics for a date range into local Parquet, outside Dagster.",
+    )
+    backfill.add_argument("--from", dest="start", type=_date, required=True, help="First date, inclusive.")
+    backfill.add_argument("--to", dest="end", type=_date, required=True, help="Last date, inclusive.")
+    backfill.add_argument(
+        "--location",
+        default=None,
+        help="Location id (from etc/fields_*.geojson) or a GeoJSON path. Default: the Saint-Cassien fields.",
+    )
+    backfill.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Compute processes (default: CPU count)."
+    )
+    backfill.add_argument("--fetch-workers", type=int, default=4, help="Concurrent CDSE requests (default: 4).")
+    backfill.add_argument("--out", type=Path, default=Path("out"), help="Output directory (default: out/).")
+    backfill.add_argument("--overwrite", action="store_true", help="Recompute dates already written.")
+    backfill.add_argument("--size", type=int, default=512, help="Raster width/height in pixels.")
+    backfill.add_argument("--indices", default="ndwi,mndwi,ndvi", help="Comma-separated indices to fetch.")
+    backfill.add_argument(
+        "--water-threshold-pos", type=float, default=None, help="Default: ALPES_WATER_THRESHOLD_POS or 0.0."
+    )
+    backfill.add_argument(
+        "--water-threshold-strong", type=float, default=None, help="Default: ALPES_WATER_THRESHOLD_STRONG or 0.2."
+    )
+    backfill.set_defaults(handler=_backfill)
+
+    serve = commands.add_parser("serve", help="Serve the read-only metrics query API over HTTP.")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--hot-days", type=int, default=None, help="Recent dates kept in memory (ALPES_QUERY_HOT_DAYS).")
+    serve.add_argument(
+        "--poll-seconds", type=float, default=None, help="Store re-listing interval (ALPES_QUERY_POLL_SECONDS)."
+    )
+    serve.add_argument("--cache-size", type=int, default=None, help="LRU result entries (ALPES_QUERY_CACHE_SIZE).")
+    serve.set_defaults(handler=_serve)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(levelname)s %(name)s: %(message)s",
+    )
+    if args.command == "backfill" and args.end < args.start:
+        parser.error("--to must not be before --from")
+    return args.handler(args)
@@ -3,15 +3,31 @@ from pathlib import Path
 from typing import List
 import json
 import datetime as dt
+import hashlib
 import logging
+import pickle
 from functools import lru_cache
 import os
 
 from shapely.geometry import shape, Polygon
-from alpes_water_monitor.utils.models import Field, FieldConfig, BBox
+from alpes_water_monitor.utils.models import Field, FieldConfig, BBox, Hypsometry
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_FIELDS_PATH = Path(__file__).resolve().parents[3] / "etc" / "fields_st_cassien.geojson"
+
+def parse_hypsometry(value: dict | None, where: str) -> Hypsometry | None:
+    """`{"area_ha": [...], "volume_hm3": [...]}` -> Hypsometry (area strictly increasing)."""
+    if not value:
+        return None
+    area = [float(v) for v in value.get("area_ha", [])]
+    volume = [float(v) for v in value.get("volume_hm3", [])]
+    if len(area) < 2 or len(area) != len(volume):
+        raise ValueError(f"Invalid hypsometry for {where}: need >= 2 matching area_ha/volume_hm3 points")
+    if any(b <= a for a, b in zip(area, area[1:])):
+        raise ValueError(f"Invalid hypsometry for {where}: area_ha must be strictly increasing")
+    return Hypsometry(area_ha=tuple(area), volume_hm3=tuple(volume))
+
 def load_field_config(geojson_path: Path) -> FieldConfig:
     if not geojson_path.exists():
         raise FileNotFoundError(geojson_path)
@@ -59,6 +75,7 @@ def load_field_config(geojson_path: Path) -> FieldConfig:
                 name=name,
                 polygon=poly,
                 monitoring_start=monitoring_start,
+                hypsometry=parse_hypsometry(fprops.get("hypsometry"), field_id),
             )
         )
 
@@ -67,6 +84,7 @@ def load_field_config(geojson_path: Path) -> FieldConfig:
         location_name=location_name,
         bbox=bbox,
         fields=fields,
+        hypsometry=parse_hypsometry(props.get("hypsometry"), location_id),
     )
 
 def load_field_config_from_env(env_var: str = "ALPES_FIELDS_CONFIG") -> FieldConfig:
@@ -75,7 +93,62 @@ def load_field_config_from_env(env_var: str = "ALPES_FIELDS_CONFIG") -> FieldCon
         raise EnvironmentError(env_var)
     return load_field_config(Path(path_val))
 
+def _fields_cache_path(geojson_path: Path) -> Path:
+    cache_dir = os.getenv("ALPES_FIELDS_CACHE_DIR")
+    base = Path(cache_dir) if cache_dir else geojson_path.parent / ".cache"
+    return base / f"{geojson_path.stem}.pkl"
+
+
+def warm_field_config_cache(geojson_path: Path = DEFAULT_FIELDS_PATH) -> Path:
+    """Parse the GeoJSON once (e.g. at image build) and pickle it next to the source."""
+    cfg = load_field_config(geojson_path)
+    digest = hashlib.sha256(geojson_path.read_bytes()).hexdigest()
+    cache_path = _fields_cache_path(geojson_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with cache_path.open("wb") as f:
+        pickle.dump((digest, cfg), f)
+    return cache_path
+
+
+def load_field_config_cached(geojson_path: Path) -> FieldConfig:
+    """`load_field_config` backed by the pre-warmed pickle, if it matches the GeoJSON."""
+    cache_path = _fields_cache_path(geojson_path)
+    if cache_path.exists():
+        try:
+            with cache_path.open("rb") as f:
+                digest, cfg = pickle.load(f)
+            if digest == hashlib.sha256(geojson_path.read_bytes()).hexdigest():
+                return cfg
+            logger.info("Field config cache %s is stale, re-parsing %s", cache_path, geojson_path)
+        except Exception as e:
+            logger.warning("Ignoring unreadable field config cache %s: %s", cache_path, e)
+    return load_field_config(geojson_path)
+
+
 @lru_cache(maxsize=1)
 def default_st_cassien_config() -> FieldConfig:
-    path = Path(__file__).resolve().parents[3] / "etc" / "fields_st_cassien.geojson"
-    return load_field_config(path)
+    return load_field_config_cached(DEFAULT_FIELDS_PATH)
+
+
+def resolve_location_config(location: str | None = None) -> FieldConfig:
+    """
+    Field config for a location id (matched against the `location_id` of the
+    etc/fields_*.geojson files) or a GeoJSON path; the default location if None.
+    """
+    if not location:
+        return default_st_cassien_config()
+    path = Path(location)
+    if path.suffix.lower() in (".geojson", ".json") or path.exists():
+        return load_field_config_cached(path)
+
+    known = []
+    for candidate in sorted(DEFAULT_FIELDS_PATH.parent.glob("fields_*.geojson")):
+        cfg = load_field_config_cached(candidate)
+        if location in (cfg.location_id, candidate.stem.removeprefix("fields_")):
+            return cfg
+        known.append(cfg.location_id)
+    raise ValueError(f"Unknown location {location!r}; known: {', '.join(known) or 'none'}")
+
+
+if __name__ == "__main__":
+    print(warm_field_config_cache())
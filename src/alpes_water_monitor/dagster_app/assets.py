@@ -1,6 +1,9 @@
+# Heavy dependencies (pandas, numpy, rasterio, shapely, PIL, minio, requests, zarr)
+# are imported inside the asset bodies: the code server and every run worker import
+# this module, but each step only needs the libraries of the asset it executes.
+# tests/benchmarks/test_import_time.py guards this.
 import os
 import datetime as dt
-import pandas as pd
 from dagster import (
     asset,
     DailyPartitionsDefinition,
@@ -9,20 +12,7 @@ from dagster import (
     AssetIn,
 )
 
-from alpes_water_monitor.config.fields import default_st_cassien_config
-from alpes_water_monitor.utils.ndwi import NDWIConfig, fetch_ndwi_for_bbox
-from alpes_water_monitor.utils.storage import (
-    upload_file_to_minio,
-    load_ndwi_from_path,
-    read_csv_from_s3_uri,
-    write_df_to_minio_csv,
-)
-from alpes_water_monitor.services.field_metrics import (
-    compute_field_metrics_from_ndwi,
-    compute_deltas,
-    summarize_today_and_delta,
-    MetricsConfig,
-)
+from alpes_water_monitor.dagster_app.instrumentation import with_timing_metadata
 
 field_ndwi_partitions = DailyPartitionsDefinition(start_date="2024-04-01")
 
@@ -31,58 +21,179 @@ field_ndwi_partitions = DailyPartitionsDefinition(start_date="2024-04-01")
     name="raw_ndwi_daily",
     partitions_def=field_ndwi_partitions,
     description=(
-        "Fetch NDWI from CDSE for the Saint-Cassien bbox and store the raw PNG "
-        "in MinIO/S3 for downstream processing."
+        "Fetch NDWI, MNDWI, NDVI and a true-color quicklook from CDSE in one Process API "
+        "call for the Saint-Cassien bbox and store the raw PNGs in MinIO/S3, plus a "
+        "georeferenced NDWI COG (tiled, compressed, with overviews) for ranged reads. "
+        "Outputs the decoded float32 index rasters (SceneRasters). If the response is "
+        "identical to an earlier partition's (same fingerprint), nothing is decoded or "
+        "uploaded and the partition is carried forward from that one."
     ),
 )
-def raw_ndwi_daily(context: AssetExecutionContext) -> Output[str]:
+@with_timing_metadata
+def raw_ndwi_daily(context: AssetExecutionContext) -> Output:
+    import json
+    from alpes_water_monitor.config.fields import default_st_cassien_config
+    from alpes_water_monitor.dagster_app.io_manager import stored_asset_partition_exists
+    from alpes_water_monitor.utils.cdse_client import decode_scene, request_bands, save_parts
+    from alpes_water_monitor.utils.cog import png_to_ndwi_cog
+    from alpes_water_monitor.utils.fingerprint import lookup_fingerprint, record_fingerprint, scene_fingerprint
+    from alpes_water_monitor.utils.models import SceneRasters
+    from alpes_water_monitor.utils.ndwi import NDWIConfig, fetch_index_parts_for_bbox
+    from alpes_water_monitor.utils.quota import estimate_processing_units, quota_metadata
+    from alpes_water_monitor.utils.storage import (
+        list_minio_objects,
+        minio_bucket_name,
+        put_bytes_to_minio,
+        remove_minio_object,
+        upload_file_to_minio,
+    )
+
     target_date = dt.date.fromisoformat(context.partition_key)
     field_cfg = default_st_cassien_config()
 
-    context.log.info(f"[raw_ndwi_daily] Fetching NDWI for {target_date}")
+    ndwi_cfg = NDWIConfig()
+    context.log.info(f"[raw_ndwi_daily] Fetching {', '.join(ndwi_cfg.indices)} for {target_date}")
 
-    raw_path = fetch_ndwi_for_bbox(
+    parts, acquisition_ids = fetch_index_parts_for_bbox(
         bbox=field_cfg.bbox,
         date=target_date,
-        config=NDWIConfig(),
+        config=ndwi_cfg,
     )
 
-    object_name = f"raw_ndwi/date={target_date.isoformat()}/ndwi.png"
-    s3_uri = upload_file_to_minio(context, raw_path, object_name)
+    # Shared CDSE consumption after this request (all runs, see utils/quota).
+    cdse_metadata = {
+        "cdse_pu_estimate": round(
+            estimate_processing_units(
+                ndwi_cfg.width, ndwi_cfg.height, len(request_bands(ndwi_cfg.indices, ndwi_cfg.true_color))
+            ),
+            3,
+        ),
+        **quota_metadata(),
+    }
+
+    fingerprint = scene_fingerprint(parts)
+    previous = lookup_fingerprint(fingerprint)
+    source = previous["partition"] if previous and previous["partition"] != context.partition_key else None
+    if source and not stored_asset_partition_exists("raw_ndwi_daily", source):
+        context.log.warning(f"[raw_ndwi_daily] Scene matches {source} but its output is gone; reprocessing.")
+        source = None
+
+    ref_object = f"raw_ndwi/date={target_date.isoformat()}/carried_forward.json"
+    if source:
+        context.log.info(f"[raw_ndwi_daily] Same scene as {source}; carrying it forward.")
+        reference = {"source_partition": source, "fingerprint": fingerprint}
+        put_bytes_to_minio(json.dumps(reference).encode(), ref_object, content_type="application/json")
+        record_fingerprint(fingerprint, context.partition_key, acquisition_ids, source=source)
+        # A re-run may replace a scene stored by an earlier run: drop its PNG parts and
+        # COG, so readers of raw_ndwi/ (reprocessing) follow the reference instead.
+        for stale in list_minio_objects(f"raw_ndwi/date={target_date.isoformat()}/"):
+            if stale != ref_object:
+                remove_minio_object(stale)
+
+        object_name = f"raw_ndwi/date={source}/ndwi.png"
+        metadata = {
+            "date": target_date.isoformat(),
+            "carried_forward": True,
+            "carried_forward_from": source,
+            "fingerprint": fingerprint,
+            "acquisitions": len(acquisition_ids),
+            "minio_object": object_name,
+            "s3_uri": f"s3://{minio_bucket_name()}/{object_name}",
+            "reference_object": ref_object,
+            **cdse_metadata,
+        }
+        return Output(SceneRasters(fingerprint=fingerprint, carried_forward_from=source), metadata=metadata)
+
+    png_paths = save_parts(parts, str(ndwi_cfg.out_dir))
+
+    # raw_ndwi/date=D/ndwi.png is the data contract; the other parts sit next to it.
+    part_objects = {
+        identifier: f"raw_ndwi/date={target_date.isoformat()}/{identifier}.png"
+        for identifier in png_paths
+    }
+    part_uris = {
+        identifier: upload_file_to_minio(context, png_paths[identifier], part_objects[identifier])
+        for identifier in png_paths
+    }
+    object_name, s3_uri = part_objects["ndwi"], part_uris["ndwi"]
+
+    cog_path = png_to_ndwi_cog(png_paths["ndwi"], field_cfg.bbox)
+    cog_object = f"raw_ndwi/date={target_date.isoformat()}/ndwi.tif"
+    cog_uri = upload_file_to_minio(context, cog_path, cog_object)
+
+    scene = decode_scene(parts, ndwi_cfg.indices)
+    scene.fingerprint = fingerprint
+    record_fingerprint(fingerprint, context.partition_key, acquisition_ids)
+    # A re-run may replace a scene that was carried forward before.
+    remove_minio_object(ref_object)
 
     metadata = {
         "date": target_date.isoformat(),
+        "carried_forward": False,
+        "fingerprint": fingerprint,
+        "acquisitions": len(acquisition_ids),
         "minio_object": object_name,
         "s3_uri": s3_uri,
+        "cog_object": cog_object,
+        "cog_uri": cog_uri,
+        "indices": ", ".join(scene.indices),
+        "part_objects": ", ".join(part_objects.values()),
+        **cdse_metadata,
     }
 
-    return Output(s3_uri, metadata=metadata)
+    return Output(scene, metadata=metadata)
 
 
 @asset(
     name="field_ndwi_daily",
     partitions_def=field_ndwi_partitions,
-    ins={"raw_ndwi_path": AssetIn("raw_ndwi_daily")},
+    ins={"scene": AssetIn("raw_ndwi_daily")},
     description=(
-        "Daily NDWI metrics per field inside the Saint-Cassien bbox. "
-        "Reads NDWI from S3/MinIO and writes one CSV per date. "
+        "Daily NDWI metrics per field inside the Saint-Cassien bbox, with the mean of "
+        "every other fetched index (mean_mndwi, mean_ndvi) computed in the same pass, "
+        "and the field and water areas in hectares (geodesic pixel areas). "
+        "Writes one CSV per date to S3/MinIO and passes the DataFrame downstream. "
         "One row per field polygon."
     ),
 )
-def field_ndwi_daily(context: AssetExecutionContext, raw_ndwi_path: str) -> Output[str]:
+@with_timing_metadata
+def field_ndwi_daily(context: AssetExecutionContext, scene) -> Output:
+    import pandas as pd
+    from alpes_water_monitor.config.fields import default_st_cassien_config
+    from alpes_water_monitor.dagster_app.io_manager import load_stored_asset_partition
+    from alpes_water_monitor.services.field_metrics import (
+        compute_field_metrics_from_indices,
+        MetricsConfig,
+        same_active_fields,
+    )
+    from alpes_water_monitor.utils.storage import write_df_to_minio_csv
+
     target_date = dt.date.fromisoformat(context.partition_key)
 
     context.log.info(f"[field_ndwi_daily] Running for date {target_date}")
 
     field_cfg = default_st_cassien_config()
 
-    ndwi_real = load_ndwi_from_path(context, raw_ndwi_path)
-    results = compute_field_metrics_from_ndwi(ndwi_real, field_cfg, target_date, MetricsConfig())
-
-    if not results:
-        context.log.warning("No active fields for this date (maybe before monitoring_start).")
-
-    df = pd.DataFrame(results)
+    source = scene.carried_forward_from
+    df = None
+    if source:
+        if same_active_fields(field_cfg, dt.date.fromisoformat(source), target_date):
+            try:
+                df = load_stored_asset_partition("field_ndwi_daily", source).assign(date=target_date.isoformat())
+                context.log.info(f"[field_ndwi_daily] Scene unchanged since {source}; reusing its metrics.")
+            except FileNotFoundError:
+                pass
+        if df is None:
+            # The field set changed (or the metrics are gone): recompute from the source scene.
+            scene = load_stored_asset_partition("raw_ndwi_daily", source)
+
+    if df is None:
+        results = compute_field_metrics_from_indices(
+            scene.indices, field_cfg, target_date, MetricsConfig.from_env()
+        )
+        if not results:
+            context.log.warning("No active fields for this date (maybe before monitoring_start).")
+        df = pd.DataFrame(results)
     object_name = f"field_ndwi_daily/date={target_date.isoformat()}/metrics.csv"
     s3_uri = write_df_to_minio_csv(context, df, object_name)
 
@@ -93,57 +204,142 @@ def field_ndwi_daily(context: AssetExecutionContext, raw_ndwi_path: str) -> Outp
         "date": target_date.isoformat(),
         "minio_object": object_name,
         "s3_uri": s3_uri,
+        "carried_forward": bool(source),
+    }
+    if source:
+        metadata["carried_forward_from"] = source
+
+    return Output(df, metadata=metadata)
+
+
+@asset(
+    name="ndwi_datacube",
+    partitions_def=field_ndwi_partitions,
+    ins={"scene": AssetIn("raw_ndwi_daily")},
+    description=(
+        "Append the day's NDWI raster (uint8 code) into the chunked, compressed Zarr "
+        "datacube (time x y x x) used for per-pixel time series and time-slice queries."
+    ),
+)
+@with_timing_metadata
+def ndwi_datacube(context: AssetExecutionContext, scene) -> Output[str]:
+    from alpes_water_monitor.config.fields import default_st_cassien_config
+    from alpes_water_monitor.utils.datacube import (
+        DatacubeConfig,
+        append_ndwi_to_cube,
+        clear_cube_date,
+        datacube_uri,
+    )
+
+    target_date = dt.date.fromisoformat(context.partition_key)
+    field_cfg = default_st_cassien_config()
+
+    cube_uri = datacube_uri(field_cfg.location_id)
+    cube_cfg = DatacubeConfig(start_date=field_ndwi_partitions.start.date())
+    if scene.carried_forward_from:
+        # The cube already holds this scene under its first date; don't duplicate it,
+        # and drop a different scene an earlier run of this partition wrote.
+        context.log.info(f"[ndwi_datacube] Scene carried forward from {scene.carried_forward_from}; skipping.")
+        cleared = clear_cube_date(cube_uri, target_date, cube_cfg)
+        metadata = {
+            "date": target_date.isoformat(),
+            "cube_uri": cube_uri,
+            "carried_forward": True,
+            "carried_forward_from": scene.carried_forward_from,
+            "cleared_stale_slice": cleared,
+        }
+        return Output(cube_uri, metadata=metadata)
+
+    time_index = append_ndwi_to_cube(cube_uri, scene.ndwi, target_date, field_cfg.bbox, cube_cfg)
+
+    context.log.info(f"[ndwi_datacube] Appended {target_date} at index {time_index} to {cube_uri}")
+
+    metadata = {
+        "date": target_date.isoformat(),
+        "time_index": time_index,
+        "shape": str(scene.ndwi.shape),
+        "cube_uri": cube_uri,
+        "carried_forward": False,
     }
 
-    return Output(s3_uri, metadata=metadata)
+    return Output(cube_uri, metadata=metadata)
 
 
 @asset(
     name="field_ndwi_daily_delta",
     partitions_def=field_ndwi_partitions,
-    ins={"today_path": AssetIn("field_ndwi_daily")},
+    ins={"df_today": AssetIn("field_ndwi_daily")},
     description=(
-        "Per-field change in NDWI metrics between today and yesterday "
-        "based on the per-partition CSVs from field_ndwi_daily."
+        "Per-field change in NDWI metrics since the previous materialized "
+        "field_ndwi_daily partition (the last acquisition date, usually 2-5 days "
+        "earlier; at most ALPES_DELTA_MAX_GAP_DAYS back). When that partition has the "
+        "same scene (carried forward), the deltas are zero without loading it."
     ),
 )
-def field_ndwi_daily_delta(context: AssetExecutionContext, today_path: str) -> Output[str]:
+@with_timing_metadata
+def field_ndwi_daily_delta(context: AssetExecutionContext, df_today) -> Output:
+    import pandas as pd
+    from alpes_water_monitor.config.fields import default_st_cassien_config
+    from alpes_water_monitor.dagster_app.io_manager import load_stored_asset_partition
+    from alpes_water_monitor.services.field_metrics import (
+        DELTA_COLUMNS,
+        compute_deltas,
+        same_active_fields,
+        unchanged_deltas,
+    )
+    from alpes_water_monitor.utils.fingerprint import partition_record
+    from alpes_water_monitor.utils.storage import (
+        latest_partition_date_before,
+        read_csv_from_s3_uri,
+        write_df_to_minio_csv,
+    )
+
     target_date = dt.date.fromisoformat(context.partition_key)
 
-    yesterday_date = target_date - dt.timedelta(days=1)
+    # The sensor only runs acquisition dates, so compare with the last one before
+    # this partition rather than the calendar day before.
+    previous_date = latest_partition_date_before(
+        "field_ndwi_daily/",
+        target_date,
+        max_gap_days=int(os.getenv("ALPES_DELTA_MAX_GAP_DAYS", "31")),
+    )
     bucket_name = os.getenv("ALPES_MINIO_BUCKET", "alpes-water-monitor")
-    yesterday_object = f"field_ndwi_daily/date={yesterday_date.isoformat()}/metrics.csv"
-    yesterday_s3 = f"s3://{bucket_name}/{yesterday_object}"
 
-    context.log.info(
-        f"[field_ndwi_daily_delta] Computing deltas for {target_date} "
-        f"(today={today_path}, yesterday_s3={yesterday_s3})"
-    )
+    context.log.info(f"[field_ndwi_daily_delta] Computing deltas for {target_date} against {previous_date}")
 
-    df_today = read_csv_from_s3_uri(context, today_path)
+    today_record = partition_record(context.partition_key)
+    previous_record = partition_record(previous_date.isoformat()) if previous_date else None
+    unchanged = (
+        today_record is not None
+        and previous_record is not None
+        and today_record["fingerprint"] == previous_record["fingerprint"]
+        and same_active_fields(default_st_cassien_config(), previous_date, target_date)
+    )
 
-    try:
-        df_yest = read_csv_from_s3_uri(context, yesterday_s3)
-    except FileNotFoundError:
-        context.log.warning(
-            "[field_ndwi_daily_delta] Yesterday CSV missing in MinIO (%s); returning empty delta.",
-            yesterday_s3,
-        )
-        merged = pd.DataFrame(
-            columns=[
-                "field_id",
-                "field_name",
-                "delta_mean_ndwi",
-                "delta_water_fraction_pos",
-                "delta_water_fraction_strong",
-            ]
-        )
+    if unchanged:
+        # Same scene and fields as the previous partition (carried forward): every
+        # delta is zero, no need to load and merge its metrics.
+        context.log.info(f"[field_ndwi_daily_delta] Scene unchanged since {previous_date}; deltas are zero.")
+        merged = unchanged_deltas(df_today)
     else:
-        merged = compute_deltas(df_today, df_yest)
-        if merged.empty:
-            context.log.warning(
-                "[field_ndwi_daily_delta] Merged dataframe is empty, no overlapping fields?"
-            )
+        try:
+            if previous_date is None:
+                raise FileNotFoundError("no earlier field_ndwi_daily partition")
+            try:
+                df_yest = load_stored_asset_partition("field_ndwi_daily", previous_date.isoformat())
+            except FileNotFoundError:
+                # Partitions materialized before the Arrow IO manager only have the CSV.
+                previous_object = f"field_ndwi_daily/date={previous_date.isoformat()}/metrics.csv"
+                df_yest = read_csv_from_s3_uri(context, f"s3://{bucket_name}/{previous_object}")
+        except FileNotFoundError as e:
+            context.log.warning(f"[field_ndwi_daily_delta] No previous metrics ({e}); returning empty delta.")
+            merged = pd.DataFrame(columns=DELTA_COLUMNS)
+        else:
+            merged = compute_deltas(df_today, df_yest)
+            if merged.empty:
+                context.log.warning(
+                    "[field_ndwi_daily_delta] Merged dataframe is empty, no overlapping fields?"
+                )
 
     object_name = f"field_ndwi_daily_delta/date={target_date.isoformat()}/metrics_delta.csv"
     s3_uri = write_df_to_minio_csv(context, merged, object_name)
@@ -153,67 +349,85 @@ def field_ndwi_daily_delta(context: AssetExecutionContext, today_path: str) -> O
     metadata = {
         "rows": int(len(merged)),
         "date": target_date.isoformat(),
-        "yesterday_date": yesterday_date.isoformat(),
+        "previous_date": previous_date.isoformat() if previous_date else "",
+        "gap_days": (target_date - previous_date).days if previous_date else 0,
+        "unchanged_scene": unchanged,
         "minio_object": object_name,
         "s3_uri": s3_uri,
     }
 
-    return Output(s3_uri, metadata=metadata)
+    return Output(merged, metadata=metadata)
 
 
 @asset(
     name="st_cassien_daily_summary",
     partitions_def=field_ndwi_partitions,
     ins={
-        "field_ndwi_daily_path": AssetIn("field_ndwi_daily"),
-        "field_ndwi_daily_delta_path": AssetIn("field_ndwi_daily_delta"),
+        "df_today": AssetIn("field_ndwi_daily"),
+        "df_delta": AssetIn("field_ndwi_daily_delta"),
     },
     description=(
         "Daily summary over all Saint-Cassien fields: number of active fields, "
-        "average NDWI, average NDWI delta, etc."
+        "average NDWI, average NDWI delta, total water area (ha) and the reservoir "
+        "volume from the location's hypsometry table, etc. A carried-forward "
+        "partition reuses its source's summary while it still matches the metrics."
     ),
 )
+@with_timing_metadata
 def st_cassien_daily_summary(
     context: AssetExecutionContext,
-    field_ndwi_daily_path: str,
-    field_ndwi_daily_delta_path: str,
-) -> Output[str]:
+    df_today,
+    df_delta,
+) -> Output:
+    import pandas as pd
+    from alpes_water_monitor.config.fields import default_st_cassien_config
+    from alpes_water_monitor.dagster_app.io_manager import load_stored_asset_partition
+    from alpes_water_monitor.query.notify import notify_query_service
+    from alpes_water_monitor.services.field_metrics import (
+        carry_forward_summary,
+        same_active_fields,
+        summarize_today_and_delta,
+    )
+    from alpes_water_monitor.utils.fingerprint import partition_record
+    from alpes_water_monitor.utils.storage import write_df_to_minio_csv
+
     target_date = dt.date.fromisoformat(context.partition_key)
     field_cfg = default_st_cassien_config()
 
     context.log.info(f"[st_cassien_daily_summary] Building summary for {target_date}")
 
-    df_today = read_csv_from_s3_uri(context, field_ndwi_daily_path)
-
-    try:
-        df_delta = read_csv_from_s3_uri(context, field_ndwi_daily_delta_path)
-    except FileNotFoundError:
-        context.log.warning(
-            f"[st_cassien_daily_summary] Delta file not found at {field_ndwi_daily_delta_path}, using empty dataframe."
-        )
-        df_delta = pd.DataFrame(
-            columns=[
-                "field_id",
-                "field_name",
-                "delta_mean_ndwi",
-                "delta_water_fraction_pos",
-                "delta_water_fraction_strong",
-            ]
-        )
-
-    summary_rows = summarize_today_and_delta(df_today, df_delta, target_date, field_cfg)
+    record = partition_record(context.partition_key)
+    source = record["source"] if record and record["source"] != context.partition_key else None
+    summary_rows = None
+    if source and same_active_fields(field_cfg, dt.date.fromisoformat(source), target_date):
+        try:
+            previous = load_stored_asset_partition("st_cassien_daily_summary", source)
+        except FileNotFoundError:
+            previous = pd.DataFrame()
+        summary_rows = carry_forward_summary(previous, df_today, df_delta, target_date)
+        if summary_rows is not None:
+            context.log.info(f"[st_cassien_daily_summary] Scene unchanged since {source}; reusing its summary.")
+    if summary_rows is None:
+        summary_rows = summarize_today_and_delta(df_today, df_delta, target_date, field_cfg)
     summary_df = pd.DataFrame(summary_rows)
 
     object_name = f"st_cassien_daily_summary/date={target_date.isoformat()}/summary.csv"
     s3_uri = write_df_to_minio_csv(context, summary_df, object_name)
 
     context.log.info(f"[st_cassien_daily_summary] Wrote {len(summary_df)} summary row(s) to {s3_uri}")
+    # Last asset of the partition: let the query service pick up the new CSVs now.
+    notify_query_service()
 
     metadata = {
         "rows": int(len(summary_df)),
         "date": target_date.isoformat(),
         "minio_object": object_name,
         "s3_uri": s3_uri,
+        "carried_forward": bool(source),
     }
+    for key in ("total_water_area_ha", "water_volume_hm3"):
+        value = summary_rows[0].get(key) if summary_rows else None
+        if value is not None and not pd.isna(value):
+            metadata[key] = round(value, 3)
 
-    return Output(s3_uri, metadata=metadata)
+    return Output(summary_df, metadata=metadata)
@@ -2,13 +2,22 @@
 
 import os
 from dagster import Definitions, load_assets_from_modules, resource
-from minio import Minio
 
 from . import assets
+from .io_manager import minio_arrow_io_manager
+from .jobs import raw_archive_maintenance_job, raw_archive_monthly_schedule, reprocess_field_metrics_job
+from .sensors import (
+    daily_ndwi_job,
+    field_metrics_downstream_job,
+    new_acquisitions_sensor,
+    reprocessed_metrics_sensor,
+)
 
 
 @resource
 def minio_client_resource(_):
+    from minio import Minio
+
     endpoint = os.getenv("ALPES_MINIO_ENDPOINT", "minio:9000")
     secure = False
     if endpoint.startswith("http://"):
@@ -31,7 +40,11 @@ def minio_client_resource(_):
 
 defs = Definitions(
     assets=load_assets_from_modules([assets]),
+    jobs=[daily_ndwi_job, field_metrics_downstream_job, reprocess_field_metrics_job, raw_archive_maintenance_job],
+    schedules=[raw_archive_monthly_schedule],
+    sensors=[new_acquisitions_sensor, reprocessed_metrics_sensor],
     resources={
         "minio_client": minio_client_resource,
+        "io_manager": minio_arrow_io_manager,
     },
 )
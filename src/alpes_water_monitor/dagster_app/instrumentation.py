@@ -0,0 +1,33 @@
+from __future__ import annotations
+from functools import wraps
+from typing import Callable
+
+from dagster import AssetExecutionContext, Output
+
+from alpes_water_monitor.utils.profiling import profile_to_file, record_spans, span
+
+
+def with_timing_metadata(fn: Callable[..., Output]) -> Callable[..., Output]:
+    """
+    Wrap an asset body so every span recorded during the run (CDSE, decode,
+    rasterize, metrics, MinIO) is attached to the returned Output as metadata.
+    With ALPES_PROFILE=cprofile|pyinstrument a profile dump is written as well.
+    """
+
+    @wraps(fn)
+    def wrapper(context: AssetExecutionContext, *args, **kwargs) -> Output:
+        asset_name = fn.__name__
+        label = f"{asset_name}_{context.partition_key}" if context.has_partition_key else asset_name
+
+        with record_spans() as recorder, profile_to_file(label) as profile:
+            with span(f"asset.{asset_name}"):
+                out = fn(context, *args, **kwargs)
+
+        metadata = {**out.metadata, **recorder.as_metadata()}
+        if profile.get("profile_path"):
+            metadata["profile_path"] = profile["profile_path"]
+            context.log.info(f"[{asset_name}] Profile written to {profile['profile_path']}")
+
+        return Output(out.value, output_name=out.output_name, metadata=metadata)
+
+    return wrapper
@@ -0,0 +1,231 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+import io
+import json
+import os
+import pickle
+import threading
+
+from dagster import InputContext, IOManager, OutputContext, io_manager
+
+# Serialization is chosen from the Python type on write and recorded as the
+# object's Content-Type, so reads need no type hints from the asset signature.
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.file"
+NPY_CONTENT_TYPE = "application/x-npy"
+SCENE_CONTENT_TYPE = "application/x-npz"
+_SCENE_META = "__meta__"
+PICKLE_CONTENT_TYPE = "application/x-python-pickle"
+
+
+def serialize(obj: Any) -> Tuple[bytes, str]:
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(obj, pd.DataFrame):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(obj, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_CONTENT_TYPE
+
+    if isinstance(obj, np.ndarray):
+        buf = io.BytesIO()
+        np.save(buf, obj, allow_pickle=False)
+        return buf.getvalue(), NPY_CONTENT_TYPE
+
+    from alpes_water_monitor.utils.models import SceneRasters
+
+    if isinstance(obj, SceneRasters):
+        # One uncompressed .npz member per index; arrays are already float32.
+        meta = {"fingerprint": obj.fingerprint, "carried_forward_from": obj.carried_forward_from}
+        buf = io.BytesIO()
+        np.savez(buf, **obj.indices, **{_SCENE_META: np.array(json.dumps(meta))})
+        return buf.getvalue(), SCENE_CONTENT_TYPE
+
+    return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), PICKLE_CONTENT_TYPE
+
+
+def deserialize(data: bytes, content_type: str) -> Any:
+    if content_type == ARROW_CONTENT_TYPE:
+        import pyarrow as pa
+
+        # The Arrow table references `data` directly; numeric columns without
+        # nulls become pandas blocks without a copy.
+        table = pa.ipc.open_file(pa.py_buffer(data)).read_all()
+        return table.to_pandas(split_blocks=True)
+
+    if content_type == NPY_CONTENT_TYPE:
+        import numpy as np
+
+        # Parse the .npy header, then view the payload in place (read-only).
+        buf = io.BytesIO(data)
+        version = np.lib.format.read_magic(buf)
+        read_header = (
+            np.lib.format.read_array_header_1_0
+            if version == (1, 0)
+            else np.lib.format.read_array_header_2_0
+        )
+        shape, fortran_order, dtype = read_header(buf)
+        arr = np.frombuffer(data, dtype=dtype, offset=buf.tell(), count=int(np.prod(shape)))
+        return arr.reshape(shape, order="F" if fortran_order else "C")
+
+    if content_type == SCENE_CONTENT_TYPE:
+        import numpy as np
+        from alpes_water_monitor.utils.models import SceneRasters
+
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            meta = json.loads(str(npz[_SCENE_META])) if _SCENE_META in npz.files else {}
+            indices = {name: npz[name] for name in npz.files if name != _SCENE_META}
+        return SceneRasters(indices=indices, **meta)
+
+    if content_type == PICKLE_CONTENT_TYPE:
+        return pickle.loads(data)
+
+    raise ValueError(f"Unsupported IO manager payload type {content_type!r}")
+
+
+def _read_only(obj: Any) -> Any:
+    import numpy as np
+
+    if isinstance(obj, np.ndarray):
+        view = obj.view()
+        view.flags.writeable = False
+        return view
+
+    from alpes_water_monitor.utils.models import SceneRasters
+
+    if isinstance(obj, SceneRasters):
+        return SceneRasters(
+            indices={name: _read_only(arr) for name, arr in obj.indices.items()},
+            fingerprint=obj.fingerprint,
+            carried_forward_from=obj.carried_forward_from,
+        )
+    return obj
+
+
+class _ObjectCache:
+    """
+    LRU of (etag, object) by object name, bounded by the objects' serialized sizes.
+    Objects larger than the whole budget are not kept.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._data: OrderedDict[str, Tuple[str, Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, object_name: str, etag: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(object_name)
+            if entry is None or entry[0] != etag:
+                return None
+            self._data.move_to_end(object_name)
+            return entry[1]
+
+    def put(self, object_name: str, etag: str, obj: Any, size: int) -> None:
+        with self._lock:
+            previous = self._data.pop(object_name, None)
+            if previous is not None:
+                self.nbytes -= previous[2]
+            if size > self.max_bytes:
+                return
+            self._data[object_name] = (etag, obj, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MinioArrowIOManager(IOManager):
+    """
+    Stores asset outputs in MinIO: DataFrames as Arrow IPC, NDWI arrays as NPY,
+    SceneRasters as NPZ, anything else pickled. Recently written or read objects are
+    kept in a process-wide LRU (ALPES_IO_CACHE_MAX_BYTES of serialized size, 256 MiB
+    by default) and handed to downstream steps directly as long as the ETag is unchanged.
+    """
+
+    _cache = _ObjectCache(int(os.getenv("ALPES_IO_CACHE_MAX_BYTES", str(256 * 1024 * 1024))))
+
+    def __init__(self, prefix: str = "io"):
+        self.prefix = prefix.strip("/")
+
+    def _object_name(self, context: InputContext | OutputContext) -> str:
+        asset_path = "/".join(context.asset_key.path)
+        partition = f"date={context.asset_partition_key}" if context.has_asset_partitions else "all"
+        return f"{self.prefix}/{asset_path}/{partition}/value"
+
+    def handle_output(self, context: OutputContext, obj: Any) -> None:
+        from alpes_water_monitor.utils.storage import put_bytes_to_minio
+
+        object_name = self._object_name(context)
+        data, content_type = serialize(obj)
+        etag = put_bytes_to_minio(data, object_name, content_type=content_type)
+        self._cache.put(object_name, etag, _read_only(obj), len(data))
+
+        context.add_output_metadata(
+            {"io_object": object_name, "io_format": content_type, "io_bytes": len(data)}
+        )
+
+    def load_input(self, context: InputContext) -> Any:
+        from alpes_water_monitor.utils.storage import get_bytes_from_minio, stat_minio_object
+
+        object_name = self._object_name(context)
+
+        stat = stat_minio_object(object_name)
+        if stat is None:
+            raise FileNotFoundError(f"No stored output for {object_name}")
+
+        cached = self._cache.get(object_name, stat.etag)
+        if cached is not None:
+            return cached
+
+        data = get_bytes_from_minio(object_name)
+        obj = deserialize(data, stat.content_type)
+        self._cache.put(object_name, stat.etag, obj, len(data))
+        return obj
+
+
+def _partition_object_name(asset_name: str, partition_key: str, prefix: str) -> str:
+    return f"{prefix}/{asset_name}/date={partition_key}/value"
+
+
+def stored_asset_partition_exists(asset_name: str, partition_key: str, prefix: str = "io") -> bool:
+    from alpes_water_monitor.utils.storage import stat_minio_object
+
+    return stat_minio_object(_partition_object_name(asset_name, partition_key, prefix)) is not None
+
+
+def store_asset_partition(asset_name: str, partition_key: str, obj: Any, prefix: str = "io") -> str:
+    """Write a partition's value the way handle_output does (used by bulk reprocessing)."""
+    from alpes_water_monitor.utils.storage import put_bytes_to_minio
+
+    data, content_type = serialize(obj)
+    return put_bytes_to_minio(data, _partition_object_name(asset_name, partition_key, prefix), content_type=content_type)
+
+
+def load_stored_asset_partition(asset_name: str, partition_key: str, prefix: str = "io") -> Any:
+    """Read another partition's stored output (e.g. yesterday's metrics) outside the asset graph."""
+    from alpes_water_monitor.utils.storage import get_bytes_from_minio, stat_minio_object
+
+    object_name = _partition_object_name(asset_name, partition_key, prefix)
+    stat = stat_minio_object(object_name)
+    if stat is None:
+        raise FileNotFoundError(object_name)
+    return deserialize(get_bytes_from_minio(object_name), stat.content_type)
+
+
+@io_manager
+def minio_arrow_io_manager(_):
+    return MinioArrowIOManager()
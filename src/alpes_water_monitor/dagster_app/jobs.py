@@ -0,0 +1,154 @@
+import datetime as dt
+import os
+from dagster import (
+    AssetMaterialization,
+    DefaultScheduleStatus,
+    Field,
+    Nothing,
+    OpExecutionContext,
+    Out,
+    Output,
+    ScheduleDefinition,
+    job,
+    op,
+)
+
+from alpes_water_monitor.dagster_app.instrumentation import with_timing_metadata
+
+
+@op(
+    config_schema={
+        "start": Field(str, is_required=False, description="First date (YYYY-MM-DD), inclusive."),
+        "end": Field(str, is_required=False, description="Last date (YYYY-MM-DD), inclusive."),
+        "workers": Field(int, default_value=8),
+        "chunk_dates": Field(int, default_value=16),
+        "include_downsampled": Field(
+            bool,
+            default_value=False,
+            description="Also recompute dates whose rasters retention down-sampled (adds raster_scale).",
+        ),
+    },
+    out=Out(Nothing),
+    description=(
+        "Recompute field_ndwi_daily for every archived raw_ndwi/date=*/ partition from "
+        "MinIO, all dates at once, with the same thresholds as the daily asset "
+        "(ALPES_WATER_THRESHOLD_*). No CDSE calls. Records one field_ndwi_daily "
+        "materialization per rewritten partition."
+    ),
+)
+@with_timing_metadata
+def reprocess_field_metrics_op(context: OpExecutionContext) -> Output:
+    from alpes_water_monitor.config.fields import default_st_cassien_config
+    from alpes_water_monitor.query.notify import notify_query_service
+    from alpes_water_monitor.services.field_metrics import MetricsConfig
+    from alpes_water_monitor.services.reprocess import ReprocessConfig, reprocess_field_metrics
+
+    cfg = context.op_config
+    reprocess_cfg = ReprocessConfig(
+        start=dt.date.fromisoformat(cfg["start"]) if cfg.get("start") else None,
+        end=dt.date.fromisoformat(cfg["end"]) if cfg.get("end") else None,
+        workers=cfg["workers"],
+        chunk_dates=cfg["chunk_dates"],
+        include_downsampled=cfg["include_downsampled"],
+    )
+    metrics_cfg = MetricsConfig.from_env()
+
+    df = reprocess_field_metrics(default_st_cassien_config(), metrics_cfg, reprocess_cfg)
+    rows_per_date = df.groupby("date").size().to_dict() if not df.empty else {}
+    dates = sorted(rows_per_date)
+
+    # The partitions are rewritten outside the asset graph: record them on the asset so
+    # their lineage shows the reprocess run, and reprocessed_metrics_sensor can request
+    # the downstream delta/summary partitions.
+    for day in dates:
+        object_name = f"field_ndwi_daily/date={day}/metrics.csv"
+        context.log_event(
+            AssetMaterialization(
+                asset_key="field_ndwi_daily",
+                partition=day,
+                metadata={
+                    "rows": int(rows_per_date[day]),
+                    "date": day,
+                    "minio_object": object_name,
+                    "reprocessed": True,
+                    "water_threshold_pos": metrics_cfg.water_threshold_pos,
+                    "water_threshold_strong": metrics_cfg.water_threshold_strong,
+                },
+            )
+        )
+
+    context.log.info(f"[reprocess_field_metrics] Rewrote {len(dates)} date(s), {len(df)} rows")
+    notify_query_service()
+
+    metadata = {
+        "dates": len(dates),
+        "rows": int(len(df)),
+        "first_date": dates[0] if dates else "",
+        "last_date": dates[-1] if dates else "",
+        "water_threshold_pos": metrics_cfg.water_threshold_pos,
+        "water_threshold_strong": metrics_cfg.water_threshold_strong,
+    }
+    return Output(None, metadata=metadata)
+
+
+@job(description="Bulk re-computation of per-field metrics from archived rasters.")
+def reprocess_field_metrics_job():
+    reprocess_field_metrics_op()
+
+
+@op(
+    config_schema={
+        "today": Field(str, is_required=False, description="Reference date (YYYY-MM-DD); default today."),
+        "downsample_after_days": Field(int, is_required=False, description="0 disables down-sampling."),
+        "downsample_factor": Field(int, is_required=False),
+        "delete_after_days": Field(int, is_required=False, description="0 disables deletion."),
+        "delete_decoded_after_days": Field(int, is_required=False, description="0 keeps decoded rasters."),
+        "delete_loose": Field(bool, default_value=True, description="Remove loose objects once packed."),
+    },
+    out=Out(Nothing),
+    description=(
+        "Pack each closed month of raw_ndwi/date=*/ PNGs and carried-forward references "
+        "into raw_ndwi_archive/month=YYYY-MM/ (one pack + byte-offset index), then "
+        "down-sample or delete months past the retention ages, and drop the decoded "
+        "io/raw_ndwi_daily values and fingerprint records of old months (ALPES_RAW_* env defaults)."
+    ),
+)
+@with_timing_metadata
+def maintain_raw_archive_op(context: OpExecutionContext) -> Output:
+    from alpes_water_monitor.services.archive import RetentionConfig, maintain_raw_archive
+
+    cfg = context.op_config
+    retention = RetentionConfig.from_env()
+    if "downsample_after_days" in cfg:
+        retention.downsample_after_days = cfg["downsample_after_days"] or None
+    if "downsample_factor" in cfg:
+        retention.downsample_factor = cfg["downsample_factor"]
+    if "delete_after_days" in cfg:
+        retention.delete_after_days = cfg["delete_after_days"] or None
+    if "delete_decoded_after_days" in cfg:
+        retention.delete_decoded_after_days = cfg["delete_decoded_after_days"] or None
+
+    report = maintain_raw_archive(
+        today=dt.date.fromisoformat(cfg["today"]) if cfg.get("today") else None,
+        retention=retention,
+        delete_loose=cfg["delete_loose"],
+    )
+    context.log.info(
+        f"[maintain_raw_archive] compacted={report.compacted} downsampled={report.downsampled} "
+        f"deleted={report.deleted} decoded_deleted={report.decoded_deleted} "
+        f"fingerprints_removed={report.fingerprints_removed}"
+    )
+    return Output(None, metadata=report.as_metadata())
+
+
+@job(description="Monthly compaction and retention of the raw raster archive in MinIO.")
+def raw_archive_maintenance_job():
+    maintain_raw_archive_op()
+
+
+raw_archive_monthly_schedule = ScheduleDefinition(
+    job=raw_archive_maintenance_job,
+    # Early on the 2nd: the previous month's last partition has landed by then.
+    cron_schedule=os.getenv("ALPES_RAW_ARCHIVE_CRON", "0 3 2 * *"),
+    default_status=DefaultScheduleStatus.RUNNING,
+)
@@ -0,0 +1,185 @@
+import os
+import json
+import hashlib
+import datetime as dt
+from dagster import (
+    AssetKey,
+    AssetSelection,
+    DagsterEventType,
+    DagsterRunStatus,
+    DefaultSensorStatus,
+    RunRequest,
+    RunStatusSensorContext,
+    SensorEvaluationContext,
+    SensorResult,
+    SkipReason,
+    define_asset_job,
+    in_process_executor,
+    run_status_sensor,
+    sensor,
+)
+
+from alpes_water_monitor.dagster_app.assets import field_ndwi_partitions
+from alpes_water_monitor.dagster_app.jobs import reprocess_field_metrics_job
+
+# Steps of a partition run share one process, so DataFrames/arrays written by the
+# IO manager are handed to downstream assets from memory instead of MinIO.
+daily_ndwi_job = define_asset_job(
+    "daily_ndwi_job",
+    selection=AssetSelection.all(),
+    executor_def=in_process_executor,
+)
+
+# Partitions downstream of field_ndwi_daily, re-run after bulk reprocessing.
+field_metrics_downstream_job = define_asset_job(
+    "field_metrics_downstream_job",
+    selection=AssetSelection.assets("field_ndwi_daily_delta", "st_cassien_daily_summary"),
+    executor_def=in_process_executor,
+)
+
+
+def _utcnow() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def _monitored_locations():
+    from alpes_water_monitor.config.fields import default_st_cassien_config
+
+    return [default_st_cassien_config()]
+
+
+@sensor(
+    job=daily_ndwi_job,
+    minimum_interval_seconds=int(os.getenv("ALPES_CATALOG_POLL_SECONDS", "3600")),
+    default_status=DefaultSensorStatus.RUNNING,
+    description=(
+        "Polls the CDSE catalog for new Sentinel-2 acquisitions over each monitored bbox "
+        "and requests the daily partitions of acquisition dates only. The cursor keeps the "
+        "acquisition ids already requested, per location. Runs are throttled to the shared "
+        "CDSE quota (monthly processing units, 429 back-off); deferred dates come back later."
+    ),
+)
+def new_acquisitions_sensor(context: SensorEvaluationContext) -> SensorResult:
+    from alpes_water_monitor.services.acquisitions import (
+        CatalogPollConfig,
+        lookback_start,
+        mark_seen,
+        new_acquisitions,
+        prune_seen,
+        search_acquisitions,
+    )
+    from alpes_water_monitor.utils.cdse_client import request_bands
+    from alpes_water_monitor.utils.ndwi import NDWIConfig
+    from alpes_water_monitor.utils.quota import estimate_processing_units, get_quota_coordinator, slots_for
+
+    poll_cfg = CatalogPollConfig(
+        lookback_days=int(os.getenv("ALPES_CATALOG_LOOKBACK_DAYS", "10")),
+        max_cloud_cover=float(os.environ["ALPES_MAX_CLOUD_COVER"]) if os.getenv("ALPES_MAX_CLOUD_COVER") else None,
+    )
+    now = _utcnow()
+    first_day = field_ndwi_partitions.start.date()
+
+    # {location_id: {acquisition_id: iso date}}
+    cursor = json.loads(context.cursor) if context.cursor else {}
+    new_by_date = {}
+    found_by_location = {}
+
+    for field_cfg in _monitored_locations():
+        seen = prune_seen(cursor.get(field_cfg.location_id, {}), lookback_start(now, poll_cfg))
+        found = search_acquisitions(field_cfg.bbox, now, poll_cfg)
+        # A daily partition exists only once its day has ended (UTC): today's acquisitions
+        # are left out of `found`, so they stay unseen and a later tick requests them.
+        found = {day: ids for day, ids in found.items() if first_day <= day < now.date()}
+
+        for day, ids in new_acquisitions(found, seen).items():
+            new_by_date.setdefault(day, set()).update(ids)
+        cursor[field_cfg.location_id] = seen
+        found_by_location[field_cfg.location_id] = found
+
+    # Throttle on the shared CDSE quota: newest dates first, the rest stay unseen
+    # and are requested on a later tick.
+    deferred = set()
+    quota = get_quota_coordinator()
+    if quota is not None and new_by_date:
+        ndwi_cfg = NDWIConfig()
+        pu_per_run = estimate_processing_units(
+            ndwi_cfg.width, ndwi_cfg.height, len(request_bands(ndwi_cfg.indices, ndwi_cfg.true_color))
+        )
+        usage = quota.usage()
+        budget = 0 if usage.blocked_until > now.timestamp() else slots_for(pu_per_run, usage)
+        budget = min(budget, int(os.getenv("ALPES_MAX_RUNS_PER_TICK", "50")))
+        deferred = set(sorted(new_by_date, reverse=True)[budget:])
+        if deferred:
+            context.log.warning(
+                f"[new_acquisitions_sensor] CDSE quota: deferring {len(deferred)} date(s) "
+                f"({usage.pu_month_remaining:.1f} PU left this month)"
+            )
+
+    for location_id, found in found_by_location.items():
+        cursor[location_id] = mark_seen(
+            cursor[location_id], {day: ids for day, ids in found.items() if day not in deferred}
+        )
+
+    run_requests = []
+    for day, ids in sorted(new_by_date.items()):
+        if day in deferred:
+            continue
+        ids_hash = hashlib.sha256(",".join(sorted(ids)).encode()).hexdigest()[:16]
+        run_requests.append(
+            RunRequest(
+                run_key=f"{day.isoformat()}:{ids_hash}",
+                partition_key=day.isoformat(),
+                tags={"alpes/trigger": "catalog", "alpes/acquisitions": str(len(ids))},
+            )
+        )
+
+    context.log.info(f"[new_acquisitions_sensor] {len(run_requests)} partition(s) with new acquisitions")
+
+    if run_requests:
+        skip_reason = None
+    elif deferred:
+        skip_reason = "CDSE quota exhausted or rate limited; new acquisitions deferred"
+    else:
+        skip_reason = "No new acquisitions"
+
+    return SensorResult(
+        run_requests=run_requests,
+        cursor=json.dumps(cursor, sort_keys=True),
+        skip_reason=skip_reason,
+    )
+
+
+@run_status_sensor(
+    run_status=DagsterRunStatus.SUCCESS,
+    monitored_jobs=[reprocess_field_metrics_job],
+    request_job=field_metrics_downstream_job,
+    default_status=DefaultSensorStatus.RUNNING,
+    description=(
+        "After a successful reprocess_field_metrics_job, requests field_ndwi_daily_delta "
+        "and st_cassien_daily_summary for every field_ndwi_daily partition it rewrote."
+    ),
+)
+def reprocessed_metrics_sensor(context: RunStatusSensorContext):
+    run_id = context.dagster_run.run_id
+    records = context.instance.get_records_for_run(
+        run_id, of_type=DagsterEventType.ASSET_MATERIALIZATION
+    ).records
+    partitions = sorted(
+        {
+            event.partition
+            for event in (record.event_log_entry.dagster_event for record in records)
+            if event.asset_key == AssetKey("field_ndwi_daily") and event.partition
+        }
+    )
+    if not partitions:
+        return SkipReason(f"Run {run_id} rewrote no field_ndwi_daily partitions")
+
+    context.log.info(f"[reprocessed_metrics_sensor] Requesting {len(partitions)} downstream partition(s)")
+    return [
+        RunRequest(
+            run_key=f"{run_id}:{partition}",
+            partition_key=partition,
+            tags={"alpes/trigger": "reprocess", "alpes/reprocess_run": run_id},
+        )
+        for partition in partitions
+    ]
@@ -0,0 +1,22 @@
+from __future__ import annotations
+from urllib.request import Request, urlopen
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def notify_query_service(timeout: float = 2.0) -> bool:
+    """
+    POST /invalidate to the query service at ALPES_QUERY_SERVICE_URL (if set) so it
+    re-lists the store now instead of at its next poll. Best effort: never raises.
+    """
+    base = os.getenv("ALPES_QUERY_SERVICE_URL")
+    if not base:
+        return False
+    try:
+        with urlopen(Request(f"{base.rstrip('/')}/invalidate", method="POST"), timeout=timeout) as resp:
+            return resp.status == 200
+    except OSError as e:
+        logger.warning("[query] Could not notify %s: %s", base, e)
+        return False
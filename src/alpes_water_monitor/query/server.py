@@ -0,0 +1,185 @@
+"""
+Read-only HTTP/JSON query service over the metrics CSVs in MinIO.
+
+    GET  /health
+    GET  /latest                                   newest date: per-field metrics + summary
+    GET  /fields/<field_id>/series?from=&to=       per-field daily metrics
+    GET  /locations/<location_id>/series?from=&to= location summaries
+    GET  /deltas?from=&to=&field_id=               day-over-day deltas
+    POST /invalidate                               re-list the store now (e.g. from a run hook)
+
+Responses carry an ETag derived from the store version and the body; a matching
+If-None-Match gets 304 without a body. Results are kept in an LRU keyed by store
+version, which is cleared whenever the version changes.
+"""
+from __future__ import annotations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import datetime as dt
+import hashlib
+import json
+import logging
+import threading
+
+from alpes_water_monitor.query.store import (
+    LRUCache,
+    MetricsStore,
+    QueryConfig,
+    deltas,
+    field_series,
+    latest_status,
+    location_series,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class QueryError(ValueError):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _date_param(params: Dict[str, list], name: str) -> Optional[dt.date]:
+    value = params.get(name, [None])[0]
+    if not value:
+        return None
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise QueryError(400, f"{name} must be YYYY-MM-DD, got {value!r}")
+
+
+class QueryService:
+    """Routing, result cache and ETags; independent of the HTTP server for testing."""
+
+    def __init__(self, store: MetricsStore, config: Optional[QueryConfig] = None):
+        self.store = store
+        self.config = config or store.config
+        self.cache = LRUCache(self.config.cache_size)
+        self._cache_version = store.version
+
+    def refresh(self) -> bool:
+        changed = self.store.refresh()
+        if changed or self._cache_version != self.store.version:
+            self.cache.clear()
+            self._cache_version = self.store.version
+        return changed
+
+    def _route(self, path: str, params: Dict[str, list]) -> Any:
+        parts = [p for p in path.split("/") if p]
+        start, end = _date_param(params, "from"), _date_param(params, "to")
+        if start and end and end < start:
+            raise QueryError(400, "to must not be before from")
+
+        if parts == ["latest"]:
+            return latest_status(self.store)
+        if len(parts) == 3 and parts[0] == "fields" and parts[2] == "series":
+            return {"field_id": parts[1], "rows": field_series(self.store, parts[1], start, end)}
+        if len(parts) == 3 and parts[0] == "locations" and parts[2] == "series":
+            return {"location_id": parts[1], "rows": location_series(self.store, parts[1], start, end)}
+        if parts == ["deltas"]:
+            field_id = params.get("field_id", [None])[0]
+            return {"rows": deltas(self.store, start, end, field_id)}
+        raise QueryError(404, f"No route for {path}")
+
+    def get(self, target: str) -> Tuple[int, bytes, str]:
+        """(status, JSON body, ETag) for a GET target ('/path?query')."""
+        url = urlparse(target)
+        if url.path.rstrip("/") == "/health":
+            body = {"status": "ok", "version": self.store.version, "cache_entries": len(self.cache),
+                    "cache_hits": self.cache.hits, "cache_misses": self.cache.misses}
+            return 200, json.dumps(body).encode(), ""
+
+        version = self.store.version
+        params = parse_qs(url.query)
+        key = (version, url.path.rstrip("/"), tuple(sorted((k, tuple(v)) for k, v in params.items())))
+
+        def compute() -> Tuple[bytes, str]:
+            body = json.dumps({"version": version, **self._route(url.path, params)}, default=str).encode()
+            return body, f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+
+        try:
+            body, etag = self.cache.get_or_compute(key, compute)
+        except QueryError as e:
+            return e.status, json.dumps({"error": str(e)}).encode(), ""
+        return 200, body, etag
+
+
+def _handler(service: QueryService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            logger.debug("[query] %s " + fmt, self.address_string(), *args)
+
+        def _send(self, status: int, body: bytes = b"", etag: str = "") -> None:
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", f"max-age={int(service.config.poll_seconds)}")
+            if status != 304:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            status, body, etag = service.get(self.path)
+            if etag and etag in (self.headers.get("If-None-Match") or ""):
+                self._send(304, etag=etag)
+            else:
+                self._send(status, body, etag)
+
+        def do_POST(self):
+            if urlparse(self.path).path.rstrip("/") != "/invalidate":
+                self._send(404, json.dumps({"error": f"No route for {self.path}"}).encode())
+                return
+            changed = service.refresh()
+            self._send(200, json.dumps({"changed": changed, "version": service.store.version}).encode())
+
+    return Handler
+
+
+class QueryServer:
+    """ThreadingHTTPServer plus a poller that refreshes the store every poll_seconds."""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8080, config: Optional[QueryConfig] = None):
+        self.config = config or QueryConfig.from_env()
+        self.service = QueryService(MetricsStore(self.config), self.config)
+        self.service.refresh()
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self.service))
+        self.httpd.daemon_threads = True
+        self._stop = threading.Event()
+        self._poller = threading.Thread(target=self._poll, name="query-poller", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.config.poll_seconds):
+            try:
+                self.service.refresh()
+            except Exception as e:  # keep serving the last good index
+                logger.warning("[query] Refresh failed: %s", e)
+
+    def start(self) -> "QueryServer":
+        self._poller.start()
+        threading.Thread(target=self.httpd.serve_forever, name="query-http", daemon=True).start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._poller.start()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
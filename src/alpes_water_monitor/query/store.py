@@ -0,0 +1,223 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import datetime as dt
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+
+import pandas as pd
+
+from alpes_water_monitor.utils.profiling import SpanThreadPool, span
+from alpes_water_monitor.utils.storage import get_bytes_from_minio, list_minio_object_etags
+
+logger = logging.getLogger(__name__)
+
+# Per-date CSVs written by the daily assets and bulk reprocessing (the data contract).
+DATASETS = {
+    "metrics": "field_ndwi_daily/",
+    "deltas": "field_ndwi_daily_delta/",
+    "summary": "st_cassien_daily_summary/",
+}
+_KEY = re.compile(r"^[^/]+/date=(\d{4}-\d{2}-\d{2})/[^/]+\.csv$")
+
+
+@dataclass
+class QueryConfig:
+    # Most recent dates of each dataset kept in memory; older ranges are read on demand.
+    hot_days: int = 90
+    # Seconds between listings of the store to pick up new partitions.
+    poll_seconds: float = 30.0
+    cache_size: int = 512
+    workers: int = 8
+
+    @classmethod
+    def from_env(cls) -> "QueryConfig":
+        default = cls()
+        return cls(
+            hot_days=int(os.getenv("ALPES_QUERY_HOT_DAYS", default.hot_days)),
+            poll_seconds=float(os.getenv("ALPES_QUERY_POLL_SECONDS", default.poll_seconds)),
+            cache_size=int(os.getenv("ALPES_QUERY_CACHE_SIZE", default.cache_size)),
+            workers=int(os.getenv("ALPES_QUERY_WORKERS", default.workers)),
+        )
+
+
+def _read_csv(object_name: str, day: dt.date) -> pd.DataFrame:
+    df = pd.read_csv(io.BytesIO(get_bytes_from_minio(object_name)))
+    if "date" not in df.columns:
+        # Delta CSVs carry their date only in the object key.
+        df.insert(0, "date", day.isoformat())
+    return df
+
+
+class MetricsStore:
+    """
+    In-memory index over the per-date metrics CSVs in MinIO. `refresh()` lists the
+    datasets (one LIST each) and reloads only objects whose ETag changed within the
+    hot window. `version` is a hash of every listed (name, ETag), so it changes
+    exactly when a partition is written and is the same on every replica.
+    """
+
+    def __init__(self, config: Optional[QueryConfig] = None):
+        self.config = config or QueryConfig()
+        self.version = ""
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        # dataset -> {date: (object name, etag)}
+        self._objects: Dict[str, Dict[dt.date, Tuple[str, str]]] = {name: {} for name in DATASETS}
+        # dataset -> {date: (etag, frame)}
+        self._hot: Dict[str, Dict[dt.date, Tuple[str, pd.DataFrame]]] = {name: {} for name in DATASETS}
+
+    def refresh(self) -> bool:
+        """Re-list the store; returns True when anything changed since the last refresh."""
+        with self._refresh_lock, span("query.refresh"):
+            listing: Dict[str, Dict[dt.date, Tuple[str, str]]] = {}
+            for dataset, prefix in DATASETS.items():
+                listing[dataset] = {}
+                for name, etag in list_minio_object_etags(prefix).items():
+                    match = _KEY.match(name)
+                    if match:
+                        listing[dataset][dt.date.fromisoformat(match.group(1))] = (name, etag)
+
+            digest = hashlib.sha1()
+            for dataset in sorted(listing):
+                for day, (name, etag) in sorted(listing[dataset].items()):
+                    digest.update(f"{name}:{etag}\n".encode())
+            version = digest.hexdigest()[:16]
+
+            if version == self.version:
+                return False
+            hot = {dataset: self._load_hot(dataset, objects) for dataset, objects in listing.items()}
+            with self._lock:
+                self._objects, self._hot, self.version = listing, hot, version
+            logger.info("[query] Store version %s (%s)", version, {d: len(o) for d, o in listing.items()})
+            return True
+
+    def _load_hot(
+        self, dataset: str, objects: Dict[dt.date, Tuple[str, str]]
+    ) -> Dict[dt.date, Tuple[str, pd.DataFrame]]:
+        if not objects:
+            return {}
+        cutoff = max(objects) - dt.timedelta(days=self.config.hot_days - 1)
+        current = self._hot.get(dataset, {})
+        hot, todo = {}, []
+        for day, (name, etag) in objects.items():
+            if day < cutoff:
+                continue
+            if day in current and current[day][0] == etag:
+                hot[day] = current[day]
+            else:
+                todo.append((day, name, etag))
+
+        def load(item):
+            day, name, etag = item
+            return day, (etag, _read_csv(name, day))
+
+        with SpanThreadPool(max_workers=self.config.workers) as pool:
+            hot.update(pool.map(load, todo))
+        return hot
+
+    def dates(self, dataset: str) -> List[dt.date]:
+        with self._lock:
+            return sorted(self._objects[dataset])
+
+    def frame(
+        self,
+        dataset: str,
+        start: Optional[dt.date] = None,
+        end: Optional[dt.date] = None,
+    ) -> pd.DataFrame:
+        """Rows of `dataset` for dates in [start, end]; cold dates are read from MinIO."""
+        with self._lock:
+            objects, hot = self._objects[dataset], self._hot[dataset]
+            wanted = [d for d in sorted(objects) if (not start or d >= start) and (not end or d <= end)]
+            frames = {d: hot[d][1] for d in wanted if d in hot}
+            cold = [(d, objects[d][0]) for d in wanted if d not in hot]
+        if cold:
+            with span("query.read_cold") as s, SpanThreadPool(max_workers=self.config.workers) as pool:
+                for (day, _), df in zip(cold, pool.map(lambda item: _read_csv(item[1], item[0]), cold)):
+                    frames[day] = df
+                    s.add_bytes(int(df.memory_usage().sum()))
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat([frames[d] for d in sorted(frames)], ignore_index=True)
+
+
+class LRUCache:
+    """Thread-safe LRU of query results, with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """JSON-ready rows (NaN -> None)."""
+    if df.empty:
+        return []
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def field_series(store: MetricsStore, field_id: str, start=None, end=None) -> List[Dict[str, Any]]:
+    df = store.frame("metrics", start, end)
+    return records(df[df["field_id"] == field_id]) if not df.empty else []
+
+
+def location_series(store: MetricsStore, location_id: str, start=None, end=None) -> List[Dict[str, Any]]:
+    df = store.frame("summary", start, end)
+    if df.empty or "location_id" not in df.columns:
+        return []
+    return records(df[df["location_id"] == location_id])
+
+
+def deltas(store: MetricsStore, start=None, end=None, field_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    df = store.frame("deltas", start, end)
+    if df.empty:
+        return []
+    if field_id is not None:
+        df = df[df["field_id"] == field_id]
+    return records(df)
+
+
+def latest_status(store: MetricsStore) -> Dict[str, Any]:
+    """The newest date's per-field metrics and location summary."""
+    dates = store.dates("metrics")
+    if not dates:
+        return {"date": None, "fields": [], "summary": []}
+    latest = dates[-1]
+    summary = store.frame("summary", latest, latest)
+    metrics = store.frame("metrics", latest, latest)
+    return {
+        "date": latest.isoformat(),
+        "fields": records(metrics),
+        "summary": records(summary),
+    }
@@ -0,0 +1,68 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List
+import datetime as dt
+
+from alpes_water_monitor.utils.cdse_client import CDSEClient, load_env_credentials
+from alpes_water_monitor.utils.models import BBox
+
+
+@dataclass
+class CatalogPollConfig:
+    # Acquisitions show up in the catalog with a delay, so every poll re-reads this
+    # many days back; ids already seen within the window are not reported again.
+    lookback_days: int = 10
+    max_cloud_cover: float | None = None
+
+
+def lookback_start(now: dt.datetime, config: CatalogPollConfig) -> dt.date:
+    return (now - dt.timedelta(days=config.lookback_days)).date()
+
+
+def acquisition_date(feature: Dict[str, Any]) -> dt.date:
+    return dt.datetime.fromisoformat(feature["properties"]["datetime"].replace("Z", "+00:00")).date()
+
+
+def group_by_date(features: Iterable[Dict[str, Any]], config: CatalogPollConfig) -> Dict[dt.date, List[str]]:
+    """{acquisition date: sorted acquisition ids}, dropping scenes above the cloud limit."""
+    by_date: Dict[dt.date, List[str]] = {}
+    for feature in features:
+        cloud = feature.get("properties", {}).get("eo:cloud_cover")
+        if config.max_cloud_cover is not None and cloud is not None and cloud > config.max_cloud_cover:
+            continue
+        by_date.setdefault(acquisition_date(feature), []).append(feature["id"])
+    return {day: sorted(ids) for day, ids in sorted(by_date.items())}
+
+
+def search_acquisitions(
+    bbox: BBox,
+    now: dt.datetime,
+    config: CatalogPollConfig,
+    client: CDSEClient | None = None,
+) -> Dict[dt.date, List[str]]:
+    """Sentinel-2 acquisitions over `bbox` in the last `lookback_days`, grouped by date."""
+    client = client or CDSEClient(load_env_credentials())
+    start = lookback_start(now, config)
+    time_range = (f"{start.isoformat()}T00:00:00Z", now.strftime("%Y-%m-%dT%H:%M:%SZ"))
+    return group_by_date(client.search_catalog(bbox, time_range), config)
+
+
+def new_acquisitions(
+    found: Dict[dt.date, List[str]],
+    seen: Dict[str, str],
+) -> Dict[dt.date, List[str]]:
+    """Dates with at least one acquisition id not in `seen` ({id: iso date})."""
+    return {day: ids for day, ids in found.items() if any(i not in seen for i in ids)}
+
+
+def prune_seen(seen: Dict[str, str], oldest: dt.date) -> Dict[str, str]:
+    """Forget ids older than the lookback window; they can no longer be returned by a poll."""
+    cutoff = oldest.isoformat()
+    return {acq_id: day for acq_id, day in seen.items() if day >= cutoff}
+
+
+def mark_seen(seen: Dict[str, str], found: Dict[dt.date, List[str]]) -> Dict[str, str]:
+    out = dict(seen)
+    for day, ids in found.items():
+        out.update({acq_id: day.isoformat() for acq_id in ids})
+    return out
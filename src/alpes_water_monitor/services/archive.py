@@ -0,0 +1,383 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import datetime as dt
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+
+import numpy as np
+from PIL import Image
+
+from alpes_water_monitor.utils.fingerprint import remove_fingerprint_records
+from alpes_water_monitor.utils.profiling import span
+from alpes_water_monitor.utils.storage import (
+    get_bytes_from_minio,
+    list_minio_object_etags,
+    list_minio_objects,
+    put_bytes_to_minio,
+    remove_minio_object,
+    stat_minio_object,
+)
+
+logger = logging.getLogger(__name__)
+
+RAW_PREFIX = "raw_ndwi/"
+ARCHIVE_PREFIX = "raw_ndwi_archive/"
+# IO manager values of raw_ndwi_daily: the decoded float32 rasters (NPZ, ~3 MB/day).
+DECODED_PREFIX = "io/raw_ndwi_daily/"
+ARCHIVE_VERSION = 1
+# Packed members: the index PNGs and carried-forward references. COGs (ndwi.tif)
+# stay loose, they are range-read by tile already.
+_PACKABLE = re.compile(r"^raw_ndwi/date=(\d{4}-\d{2})-\d{2}/([^/]+\.png|carried_forward\.json)$")
+_DATE = re.compile(r"^(?:raw_ndwi|io/raw_ndwi_daily)/date=(\d{4}-\d{2}-\d{2})/")
+
+
+@dataclass
+class RetentionConfig:
+    # Months older than this keep their rasters at 1/downsample_factor resolution. Lossy
+    # and irreversible, so off unless enabled (ALPES_RAW_DOWNSAMPLE_AFTER_DAYS).
+    downsample_after_days: Optional[int] = None
+    downsample_factor: int = 4
+    # Months older than this are deleted, archive and COGs (None: keep forever).
+    delete_after_days: Optional[int] = None
+    # Decoded rasters of months older than this are deleted, with the fingerprint records
+    # pointing at them; the archived PNGs remain the source for reprocessing (None: keep).
+    delete_decoded_after_days: Optional[int] = 31
+
+    @classmethod
+    def from_env(cls) -> "RetentionConfig":
+        def days(name: str, default: Optional[int]) -> Optional[int]:
+            value = os.getenv(name)
+            if value is None:
+                return default
+            return int(value) if value.strip() not in ("", "0", "none") else None
+
+        default = cls()
+        return cls(
+            downsample_after_days=days("ALPES_RAW_DOWNSAMPLE_AFTER_DAYS", default.downsample_after_days),
+            downsample_factor=int(os.getenv("ALPES_RAW_DOWNSAMPLE_FACTOR", default.downsample_factor)),
+            delete_after_days=days("ALPES_RAW_DELETE_AFTER_DAYS", default.delete_after_days),
+            delete_decoded_after_days=days(
+                "ALPES_RAW_DELETE_DECODED_AFTER_DAYS", default.delete_decoded_after_days
+            ),
+        )
+
+
+def month_of(object_name: str) -> Optional[str]:
+    match = _DATE.match(object_name)
+    return match.group(1)[:7] if match else None
+
+
+def index_object_name(month: str) -> str:
+    return f"{ARCHIVE_PREFIX}month={month}/index.json"
+
+
+def closed_months(today: dt.date, months: List[str]) -> List[str]:
+    """Months strictly before the month of `today` (no more partitions will land there)."""
+    current = today.strftime("%Y-%m")
+    return sorted(m for m in set(months) if m < current)
+
+
+def _month_end(month: str) -> dt.date:
+    year, mon = (int(v) for v in month.split("-"))
+    first_next = dt.date(year + mon // 12, mon % 12 + 1, 1)
+    return first_next - dt.timedelta(days=1)
+
+
+def _content_type(name: str) -> str:
+    return "image/png" if name.endswith(".png") else "application/json"
+
+
+def load_archive_index(month: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(get_bytes_from_minio(index_object_name(month)))
+    except FileNotFoundError:
+        return None
+
+
+def write_archive(month: str, members: Dict[str, Tuple[bytes, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Write `members` ({object name: (bytes, extra index fields)}) as one pack object
+    plus its index. The pack name carries a content hash, and the index is written
+    last, so readers never see an index pointing into a half-written or replaced pack.
+    """
+    previous = load_archive_index(month)
+    pack = io.BytesIO()
+    entries: Dict[str, Dict[str, Any]] = {}
+    digest = hashlib.sha256()
+    for name in sorted(members):
+        data, extra = members[name]
+        entries[name] = {
+            "offset": pack.tell(),
+            "length": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "content_type": _content_type(name),
+            **extra,
+        }
+        pack.write(data)
+        digest.update(data)
+
+    pack_object = f"{ARCHIVE_PREFIX}month={month}/raw_ndwi.{digest.hexdigest()[:16]}.pack"
+    index = {
+        "version": ARCHIVE_VERSION,
+        "month": month,
+        "pack": pack_object,
+        "pack_size": pack.tell(),
+        "created": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "entries": entries,
+    }
+    with span("archive.write_pack") as s:
+        put_bytes_to_minio(pack.getvalue(), pack_object)
+        put_bytes_to_minio(json.dumps(index, indent=1).encode(), index_object_name(month), "application/json")
+        s.add_bytes(pack.tell())
+    if previous and previous["pack"] != pack_object:
+        remove_minio_object(previous["pack"])
+    return index
+
+
+class ArchiveReader:
+    """
+    Reads raw_ndwi/date=D/<name> objects whether they are still loose or packed in
+    their monthly archive (one ranged GET into the pack). Month indexes are cached
+    for the reader's lifetime; create a new reader after compaction.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def index(self, month: str) -> Optional[Dict[str, Any]]:
+        if month not in self._indexes:
+            self._indexes[month] = load_archive_index(month)
+        return self._indexes[month]
+
+    def entry(self, object_name: str) -> Optional[Dict[str, Any]]:
+        month = month_of(object_name)
+        index = self.index(month) if month else None
+        return index["entries"].get(object_name) if index else None
+
+    def read(self, object_name: str) -> bytes:
+        try:
+            return get_bytes_from_minio(object_name)
+        except FileNotFoundError:
+            pass
+        entry = self.entry(object_name)
+        if entry is None:
+            raise FileNotFoundError(object_name)
+        pack = self.index(month_of(object_name))["pack"]
+        return get_bytes_from_minio(pack, offset=entry["offset"], length=entry["length"])
+
+    def scale(self, object_name: str) -> int:
+        """Down-sampling factor of the copy `read` returns (1: full resolution)."""
+        entry = self.entry(object_name)
+        if not entry or entry.get("scale", 1) == 1:
+            return 1
+        # A loose copy (late re-run) is read first and is full resolution.
+        return 1 if stat_minio_object(object_name) is not None else int(entry["scale"])
+
+    def read_array(self, object_name: str) -> np.ndarray:
+        """Decoded PNG; down-sampled archive members come back at their original shape."""
+        data = self.read(object_name)
+        with span("decode.archive_png") as s:
+            arr = np.array(Image.open(io.BytesIO(data)))
+            scale = self.scale(object_name)
+            if scale > 1:
+                arr = upsample(arr, scale, tuple(self.entry(object_name)["shape"]))
+            s.add_bytes(len(data))
+        return arr
+
+    def list(self, prefix: str = RAW_PREFIX) -> List[str]:
+        """Loose and archived object names under `prefix`."""
+        names = set(list_minio_objects(prefix))
+        for index_name in list_minio_objects(ARCHIVE_PREFIX):
+            if not index_name.endswith("/index.json"):
+                continue
+            month = index_name.split("month=", 1)[1].split("/", 1)[0]
+            index = self.index(month)
+            if index:
+                names.update(n for n in index["entries"] if n.startswith(prefix))
+        return sorted(names)
+
+
+def downsample(arr: np.ndarray, factor: int) -> np.ndarray:
+    """Block mean over factor x factor pixels (edge blocks padded by replication)."""
+    h, w = arr.shape[:2]
+    ph, pw = -h % factor, -w % factor
+    pad = ((0, ph), (0, pw)) + ((0, 0),) * (arr.ndim - 2)
+    padded = np.pad(arr, pad, mode="edge").astype(np.float32)
+    blocks = padded.reshape(
+        (h + ph) // factor, factor, (w + pw) // factor, factor, *arr.shape[2:]
+    )
+    return np.rint(blocks.mean(axis=(1, 3))).astype(arr.dtype)
+
+
+def upsample(arr: np.ndarray, factor: int, shape: Tuple[int, ...]) -> np.ndarray:
+    return np.repeat(np.repeat(arr, factor, axis=0), factor, axis=1)[: shape[0], : shape[1]]
+
+
+def _encode_png(arr: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def compact_month(month: str, delete_loose: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Pack the loose raw objects of `month` into its archive, merged with what is
+    already archived (loose copies win, e.g. after a re-run). Returns the new index,
+    or None when there was nothing loose to pack. A loose object rewritten after the
+    listing (its ETag changed) is kept and packed on the next run.
+    """
+    listed = {
+        name: etag
+        for name, etag in list_minio_object_etags(f"{RAW_PREFIX}date={month}-").items()
+        if _PACKABLE.match(name)
+    }
+    loose = sorted(listed)
+    if not loose:
+        return None
+
+    reader = ArchiveReader()
+    members: Dict[str, Tuple[bytes, Dict[str, Any]]] = {}
+    previous = reader.index(month)
+    for name, entry in (previous or {}).get("entries", {}).items():
+        extra = {k: entry[k] for k in ("scale", "shape") if k in entry}
+        members[name] = (reader.read(name), extra)
+    for name in loose:
+        members[name] = (get_bytes_from_minio(name), {})
+
+    index = write_archive(month, members)
+    # Read back the index before dropping the only other copy.
+    stored = load_archive_index(month)
+    if stored is None or set(stored["entries"]) != set(members):
+        raise RuntimeError(f"Archive index for {month} did not round-trip; keeping loose objects")
+    if delete_loose:
+        for name in loose:
+            current = stat_minio_object(name)
+            if current is None:
+                continue
+            if (current.etag or "").strip('"') != listed[name]:
+                logger.info("[archive] %s changed while packing %s; keeping it loose", name, month)
+                continue
+            remove_minio_object(name)
+    logger.info("[archive] Packed %d objects of %s (%d bytes)", len(loose), month, index["pack_size"])
+    return index
+
+
+def downsample_month(month: str, factor: int) -> int:
+    """Rewrite the PNG members of an archived month at 1/factor resolution; returns members changed."""
+    reader = ArchiveReader()
+    index = reader.index(month)
+    if index is None:
+        return 0
+    members: Dict[str, Tuple[bytes, Dict[str, Any]]] = {}
+    changed = 0
+    for name, entry in index["entries"].items():
+        data = reader.read(name)
+        extra = {k: entry[k] for k in ("scale", "shape") if k in entry}
+        if name.endswith(".png") and entry.get("scale", 1) < factor:
+            arr = reader.read_array(name)
+            data = _encode_png(downsample(arr, factor))
+            extra = {"scale": factor, "shape": list(arr.shape[:2])}
+            changed += 1
+        members[name] = (data, extra)
+    if changed:
+        write_archive(month, members)
+    return changed
+
+
+def delete_decoded_month(month: str) -> List[str]:
+    """Remove the decoded raw_ndwi_daily values of `month`; returns their partitions."""
+    names = list_minio_objects(f"{DECODED_PREFIX}date={month}-")
+    for name in names:
+        remove_minio_object(name)
+    return sorted({_DATE.match(n).group(1) for n in names if _DATE.match(n)})
+
+
+def delete_month(month: str) -> int:
+    """Remove every raw object of `month`: archive, loose PNGs/references, COGs and decoded values."""
+    names = list_minio_objects(f"{ARCHIVE_PREFIX}month={month}/") + list_minio_objects(
+        f"{RAW_PREFIX}date={month}-"
+    )
+    # Index first, so readers stop pointing into the pack before it goes.
+    names.sort(key=lambda n: not n.endswith("index.json"))
+    for name in names:
+        remove_minio_object(name)
+    return len(names) + len(delete_decoded_month(month))
+
+
+@dataclass
+class ArchiveReport:
+    compacted: List[str]
+    downsampled: List[str]
+    deleted: List[str]
+    decoded_deleted: List[str] = field(default_factory=list)
+    fingerprints_removed: int = 0
+
+    def as_metadata(self) -> Dict[str, Any]:
+        return {
+            "months_compacted": len(self.compacted),
+            "months_downsampled": len(self.downsampled),
+            "months_deleted": len(self.deleted),
+            "months_decoded_deleted": len(self.decoded_deleted),
+            "fingerprints_removed": self.fingerprints_removed,
+            "compacted": ", ".join(self.compacted),
+            "downsampled": ", ".join(self.downsampled),
+            "deleted": ", ".join(self.deleted),
+            "decoded_deleted": ", ".join(self.decoded_deleted),
+        }
+
+
+def maintain_raw_archive(
+    today: Optional[dt.date] = None,
+    retention: Optional[RetentionConfig] = None,
+    delete_loose: bool = True,
+) -> ArchiveReport:
+    """
+    Compact every closed month with loose objects, then apply the retention policy.
+    Fingerprint records of partitions whose decoded rasters are gone are removed, so
+    no new partition is carried forward from them.
+    """
+    today = today or dt.date.today()
+    retention = retention or RetentionConfig.from_env()
+
+    loose_months = [m for m in (month_of(n) for n in list_minio_objects(RAW_PREFIX)) if m]
+    archived_months = [
+        n.split("month=", 1)[1].split("/", 1)[0]
+        for n in list_minio_objects(ARCHIVE_PREFIX)
+        if n.endswith("/index.json")
+    ]
+    decoded_months = [m for m in (month_of(n) for n in list_minio_objects(DECODED_PREFIX)) if m]
+    compacted = [m for m in closed_months(today, loose_months) if compact_month(m, delete_loose)]
+
+    downsampled, deleted, decoded_deleted = [], [], []
+    gone_partitions: List[str] = []
+    for month in closed_months(today, loose_months + archived_months + decoded_months):
+        age = (today - _month_end(month)).days
+        if retention.delete_after_days is not None and age > retention.delete_after_days:
+            gone_partitions += delete_decoded_month(month)
+            delete_month(month)
+            deleted.append(month)
+            continue
+        if (
+            retention.downsample_after_days is not None
+            and age > retention.downsample_after_days
+            and retention.downsample_factor > 1
+            and downsample_month(month, retention.downsample_factor)
+        ):
+            downsampled.append(month)
+        if (
+            retention.delete_decoded_after_days is not None
+            and age > retention.delete_decoded_after_days
+            and month in decoded_months
+        ):
+            gone_partitions += delete_decoded_month(month)
+            decoded_deleted.append(month)
+
+    removed = remove_fingerprint_records(gone_partitions) if gone_partitions else 0
+    report = ArchiveReport(compacted, downsampled, deleted, decoded_deleted, removed)
+    logger.info("[archive] %s", report.as_metadata())
+    return report
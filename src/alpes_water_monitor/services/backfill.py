@@ -0,0 +1,182 @@
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, TextIO
+import datetime as dt
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+
+from alpes_water_monitor.services.field_metrics import MetricsConfig
+from alpes_water_monitor.utils.models import FieldConfig
+from alpes_water_monitor.utils.ndwi import NDWIConfig
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = "field_ndwi_daily"
+
+
+@dataclass
+class BackfillConfig:
+    start: dt.date
+    end: dt.date
+    out_dir: Path = Path("out")
+    # Concurrent CDSE requests (threads; the quota coordinator still paces them).
+    fetch_workers: int = 4
+    # Decode + metrics processes; 1 computes in a single background thread.
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    overwrite: bool = False
+    ndwi: NDWIConfig = field(default_factory=lambda: NDWIConfig(true_color=False, fingerprint_acquisitions=False))
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+
+
+@dataclass
+class BackfillResult:
+    written: Dict[dt.date, Path] = field(default_factory=dict)
+    skipped: List[dt.date] = field(default_factory=list)
+    failed: Dict[dt.date, str] = field(default_factory=dict)
+    elapsed_s: float = 0.0
+
+
+def metrics_path(out_dir: Path, date: dt.date) -> Path:
+    """Hive-style local layout matching the MinIO keys: field_ndwi_daily/date=D/metrics.parquet."""
+    return Path(out_dir) / METRICS_DIR / f"date={date.isoformat()}" / "metrics.parquet"
+
+
+def date_range(start: dt.date, end: dt.date) -> List[dt.date]:
+    if end < start:
+        raise ValueError(f"end {end} is before start {start}")
+    return [start + dt.timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+class BackfillProgress:
+    """One status line per finished date: done/total, throughput and ETA."""
+
+    def __init__(self, total: int, stream: Optional[TextIO] = None):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.stream = stream if stream is not None else sys.stderr
+        self.started = time.monotonic()
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta_s(self) -> Optional[float]:
+        rate = self.rate()
+        return (self.total - self.done) / rate if rate > 0 else None
+
+    def update(self, date: dt.date, ok: bool = True) -> str:
+        self.done += 1
+        self.failed += 0 if ok else 1
+        eta = self.eta_s()
+        line = (
+            f"[{self.done}/{self.total}] {date.isoformat()} {'ok' if ok else 'FAILED'}"
+            f"  {100.0 * self.done / max(self.total, 1):5.1f}%"
+            f"  {self.rate():.2f} dates/s"
+            f"  ETA {dt.timedelta(seconds=round(eta)) if eta is not None else '?'}"
+        )
+        if self.failed:
+            line += f"  ({self.failed} failed)"
+        print(line, file=self.stream, flush=True)
+        return line
+
+
+# Per-process state of the compute pool, set once by _init_worker.
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(field_config: FieldConfig, metrics_cfg: MetricsConfig, indices, out_dir: str) -> None:
+    _worker.update(field_config=field_config, metrics_cfg=metrics_cfg, indices=tuple(indices), out_dir=out_dir)
+
+
+def _compute_and_write(date: dt.date, parts: Dict[str, bytes]) -> str:
+    from alpes_water_monitor.services.field_metrics import compute_field_metrics_from_indices
+    from alpes_water_monitor.utils.cdse_client import decode_scene
+
+    scene = decode_scene(parts, _worker["indices"])
+    rows = compute_field_metrics_from_indices(scene.indices, _worker["field_config"], date, _worker["metrics_cfg"])
+    path = metrics_path(Path(_worker["out_dir"]), date)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    pd.DataFrame(rows).to_parquet(tmp, index=False)
+    tmp.replace(path)
+    return str(path)
+
+
+def _compute_pool(config: BackfillConfig, field_config: FieldConfig) -> Executor:
+    initargs = (field_config, config.metrics, config.ndwi.indices, str(config.out_dir))
+    if config.workers <= 1:
+        return ThreadPoolExecutor(max_workers=1, initializer=_init_worker, initargs=initargs)
+    # spawn: the parent runs fetch threads, which fork() does not copy safely.
+    return ProcessPoolExecutor(
+        max_workers=config.workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=initargs,
+    )
+
+
+def run_backfill(
+    field_config: FieldConfig,
+    config: BackfillConfig,
+    progress: Optional[BackfillProgress] = None,
+) -> BackfillResult:
+    """
+    Fetch and compute per-field metrics for every date in [start, end] outside
+    Dagster: CDSE fetches run in `fetch_workers` threads and feed a pool of
+    `workers` compute processes, which write local Parquet. Dates already on disk
+    are skipped unless `overwrite`; a failed date is reported and does not stop the run.
+    """
+    from alpes_water_monitor.utils import ndwi
+
+    started = time.monotonic()
+    result = BackfillResult()
+    todo = []
+    for day in date_range(config.start, config.end):
+        if not config.overwrite and metrics_path(config.out_dir, day).exists():
+            result.skipped.append(day)
+        else:
+            todo.append(day)
+    progress = progress or BackfillProgress(len(todo))
+
+    def fetch(day: dt.date) -> Dict[str, bytes]:
+        parts, _ = ndwi.fetch_index_parts_for_bbox(field_config.bbox, day, config.ndwi)
+        return parts
+
+    with ThreadPoolExecutor(max_workers=max(config.fetch_workers, 1)) as fetch_pool, _compute_pool(
+        config, field_config
+    ) as compute_pool:
+        pending: Dict[Future, tuple[str, dt.date]] = {fetch_pool.submit(fetch, day): ("fetch", day) for day in todo}
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, day = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as exc:
+                    logger.warning("[backfill] %s %s failed: %s", stage, day, exc)
+                    result.failed[day] = f"{stage}: {exc}"
+                    progress.update(day, ok=False)
+                    continue
+                if stage == "fetch":
+                    pending[compute_pool.submit(_compute_and_write, day, value)] = ("compute", day)
+                else:
+                    result.written[day] = Path(value)
+                    progress.update(day)
+
+    result.elapsed_s = time.monotonic() - started
+    logger.info(
+        "[backfill] %d written, %d skipped, %d failed in %.1fs",
+        len(result.written),
+        len(result.skipped),
+        len(result.failed),
+        result.elapsed_s,
+    )
+    return result
@@ -1,32 +1,118 @@
 from __future__ import annotations
 from typing import Dict, Any, List
 import datetime as dt
+import os
 from dataclasses import dataclass
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
-from alpes_water_monitor.utils.models import FieldConfig
-from alpes_water_monitor.utils.raster import rasterize_field_mask
+from alpes_water_monitor.utils.models import Field, FieldConfig
+from alpes_water_monitor.utils.raster import (
+    field_coverage_matrix,
+    field_union_coverage,
+    pixel_area_grid,
+    rasterize_field_mask,
+)
 from alpes_water_monitor.utils.ndwi import NDWIConfig, fetch_ndwi_for_bbox
 from alpes_water_monitor.utils.storage import load_ndwi_from_path
+from alpes_water_monitor.utils.profiling import timed
 
 @dataclass
 class MetricsConfig:
     water_threshold_pos: float = 0.0
     water_threshold_strong: float = 0.2
+    # "fractional": area-weighted stats from the sparse coverage matrix (overlap-safe).
+    # "mask": legacy binary mask per field, using all_touched.
+    coverage: str = "fractional"
     all_touched: bool = True
 
+    @classmethod
+    def from_env(cls) -> "MetricsConfig":
+        # The daily asset, bulk reprocessing and the local backfill all read the
+        # thresholds from here, so their outputs stay comparable.
+        default = cls()
+        return cls(
+            water_threshold_pos=float(os.getenv("ALPES_WATER_THRESHOLD_POS", default.water_threshold_pos)),
+            water_threshold_strong=float(os.getenv("ALPES_WATER_THRESHOLD_STRONG", default.water_threshold_strong)),
+            coverage=os.getenv("ALPES_METRICS_COVERAGE", default.coverage),
+        )
+
+
+M2_PER_HA = 10_000.0
+DELTA_COLUMNS = [
+    "field_id",
+    "field_name",
+    "delta_mean_ndwi",
+    "delta_water_fraction_pos",
+    "delta_water_fraction_strong",
+]
+
 
+def field_water_volume(field: Field, water_area_ha: float) -> float:
+    """Volume (hm³) from the field's own hypsometry table, NaN without one."""
+    if field.hypsometry is None:
+        return np.nan
+    return float(field.hypsometry.volume(water_area_ha))
+
+
+@timed("metrics.compute_field_metrics_from_ndwi")
 def compute_field_metrics_from_ndwi(
     ndwi_real: np.ndarray,
     field_config: FieldConfig,
     date: dt.date,
     metrics_cfg: MetricsConfig | None = None,
 ) -> List[Dict[str, Any]]:
-    
-    results: List[Dict[str, Any]] = []
+    return _index_metrics({"ndwi": ndwi_real}, field_config, date, metrics_cfg or MetricsConfig())
+
+
+@timed("metrics.compute_field_metrics_from_indices")
+def compute_field_metrics_from_indices(
+    indices: Dict[str, np.ndarray],
+    field_config: FieldConfig,
+    date: dt.date,
+    metrics_cfg: MetricsConfig | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Per-field stats for several co-registered index rasters (e.g. a SceneRasters'
+    ndwi/mndwi/ndvi) in one pass: a `mean_<index>` column per index, plus the NDWI
+    water fractions. Requires an "ndwi" entry.
+    """
+    metrics_cfg = metrics_cfg or MetricsConfig()
+    if "ndwi" not in indices:
+        raise ValueError(f"indices must include 'ndwi', got {sorted(indices)}")
+    return _index_metrics(indices, field_config, date, metrics_cfg)
+
+
+def _index_metrics(
+    indices: Dict[str, np.ndarray],
+    field_config: FieldConfig,
+    date: dt.date,
+    metrics_cfg: MetricsConfig,
+) -> List[Dict[str, Any]]:
+    if metrics_cfg.coverage == "fractional":
+        return _weighted_index_metrics(indices, field_config, date, metrics_cfg)
+    if metrics_cfg.coverage == "mask":
+        return _mask_index_metrics(indices, field_config, date, metrics_cfg)
+    raise ValueError(f"Unknown coverage mode {metrics_cfg.coverage!r}")
+
+
+def _mask_index_metrics(
+    indices: Dict[str, np.ndarray],
+    field_config: FieldConfig,
+    date: dt.date,
+    metrics_cfg: MetricsConfig,
+) -> List[Dict[str, Any]]:
+    ndwi_real = indices["ndwi"]
     height, width = ndwi_real.shape
+    for name, arr in indices.items():
+        if arr.shape != ndwi_real.shape:
+            raise ValueError(f"{name} shape {arr.shape} does not match ndwi {ndwi_real.shape}")
+    others = [name for name in indices if name != "ndwi"]
+    pixel_area = pixel_area_grid(field_config.bbox, width, height).reshape(height, width)
+    union = np.zeros((height, width), dtype=bool)
 
+    results: List[Dict[str, Any]] = []
     for field in field_config.fields:
         if date < field.monitoring_start:
             continue
@@ -42,19 +128,109 @@ def compute_field_metrics_from_ndwi(
         values = ndwi_real[mask]
         if values.size == 0:
             continue
+        union |= mask
+        areas = pixel_area[mask]
+        water_area_ha = float(areas[values > metrics_cfg.water_threshold_pos].sum()) / M2_PER_HA
+
+        record = {
+            "date": date.isoformat(),
+            "field_id": field.id,
+            "field_name": field.name,
+            "mean_ndwi": float(np.mean(values)),
+            "water_fraction_pos": float(np.mean(values > metrics_cfg.water_threshold_pos)),
+            "water_fraction_strong": float(np.mean(values > metrics_cfg.water_threshold_strong)),
+        }
+        for name in others:
+            record[f"mean_{name}"] = float(np.mean(indices[name][mask]))
+        record["field_area_ha"] = float(areas.sum()) / M2_PER_HA
+        record["water_area_ha"] = water_area_ha
+        record["water_volume_hm3"] = field_water_volume(field, water_area_ha)
+        results.append(record)
+
+    location_area_ha = float(pixel_area[union].sum()) / M2_PER_HA
+    union_water = union & (ndwi_real > metrics_cfg.water_threshold_pos)
+    location_water_area_ha = float(pixel_area[union_water].sum()) / M2_PER_HA
+    for record in results:
+        record["location_area_ha"] = location_area_ha
+        record["location_water_area_ha"] = location_water_area_ha
+    return results
 
-        results.append(
-            {
-                "date": date.isoformat(),
-                "field_id": field.id,
-                "field_name": field.name,
-                "mean_ndwi": float(np.mean(values)),
-                "water_fraction_pos": float(np.mean(values > metrics_cfg.water_threshold_pos)),
-                "water_fraction_strong": float(np.mean(values > metrics_cfg.water_threshold_strong)),
-            }
-        )
+
+def _weighted_index_metrics(
+    indices: Dict[str, np.ndarray],
+    field_config: FieldConfig,
+    date: dt.date,
+    metrics_cfg: MetricsConfig,
+) -> List[Dict[str, Any]]:
+    active = [i for i, field in enumerate(field_config.fields) if date >= field.monitoring_start]
+    if not active:
+        return []
+
+    ndwi_real = indices["ndwi"]
+    height, width = ndwi_real.shape
+    for name, arr in indices.items():
+        if arr.shape != ndwi_real.shape:
+            raise ValueError(f"{name} shape {arr.shape} does not match ndwi {ndwi_real.shape}")
+    weights = field_coverage_matrix(field_config.fields, field_config.bbox, width, height)[active]
+    # Last row: the union of the active fields, for the location's areas.
+    union = field_union_coverage([field_config.fields[i] for i in active], field_config.bbox, width, height)
+    weights = sparse.vstack([weights, union], format="csr")
+    pixel_area = pixel_area_grid(field_config.bbox, width, height)
+
+    flat = ndwi_real.reshape(-1).astype(np.float32, copy=False)
+    water = flat > metrics_cfg.water_threshold_pos
+    others = [name for name in indices if name != "ndwi"]
+    # One sparse product gives every field's weighted sums of each index, both NDWI
+    # threshold masks, and its covered and water areas (m²).
+    columns = np.stack(
+        [
+            flat,
+            water,
+            flat > metrics_cfg.water_threshold_strong,
+            *(indices[name].reshape(-1) for name in others),
+            pixel_area,
+            water * pixel_area,
+        ],
+        axis=1,
+    ).astype(np.float32)
+    sums = weights @ columns
+    total = np.asarray(weights.sum(axis=1)).ravel()
+
+    location_area_ha = float(sums[-1, -2]) / M2_PER_HA
+    location_water_area_ha = float(sums[-1, -1]) / M2_PER_HA
+
+    results: List[Dict[str, Any]] = []
+    for row, i in enumerate(active):
+        if total[row] <= 0:
+            continue
+        field = field_config.fields[i]
+        means = sums[row] / total[row]
+        water_area_ha = float(sums[row, -1]) / M2_PER_HA
+        record = {
+            "date": date.isoformat(),
+            "field_id": field.id,
+            "field_name": field.name,
+            "mean_ndwi": float(means[0]),
+            "water_fraction_pos": float(means[1]),
+            "water_fraction_strong": float(means[2]),
+        }
+        for k, name in enumerate(others):
+            record[f"mean_{name}"] = float(means[3 + k])
+        record["field_area_ha"] = float(sums[row, -2]) / M2_PER_HA
+        record["water_area_ha"] = water_area_ha
+        record["water_volume_hm3"] = field_water_volume(field, water_area_ha)
+        record["location_area_ha"] = location_area_ha
+        record["location_water_area_ha"] = location_water_area_ha
+        results.append(record)
 
     return results
+
+
+def same_active_fields(field_config: FieldConfig, date_a: dt.date, date_b: dt.date) -> bool:
+    """True if the same fields are monitored on both dates, so metrics can be carried over."""
+    return all((date_a >= f.monitoring_start) == (date_b >= f.monitoring_start) for f in field_config.fields)
+
+
 def compute_deltas(df_today: pd.DataFrame, df_yest: pd.DataFrame) -> pd.DataFrame:
     required = {"field_id", "field_name", "mean_ndwi", "water_fraction_pos", "water_fraction_strong"}
     missing_today = required - set(df_today.columns)
@@ -102,14 +278,31 @@ def compute_deltas(df_today: pd.DataFrame, df_yest: pd.DataFrame) -> pd.DataFram
         merged["water_fraction_strong_today"] - merged["water_fraction_strong_yest"]
     )
 
-    cols = [
-        "field_id",
-        "field_name",
-        "delta_mean_ndwi",
-        "delta_water_fraction_pos",
-        "delta_water_fraction_strong",
-    ]
-    return merged[cols]
+    return merged[DELTA_COLUMNS]
+
+def unchanged_deltas(df_today: pd.DataFrame) -> pd.DataFrame:
+    """Deltas against a partition with the same scene and fields: zero for every field."""
+    out = df_today[["field_id", "field_name"]].reset_index(drop=True)
+    for column in DELTA_COLUMNS[2:]:
+        out[column] = 0.0
+    return out[DELTA_COLUMNS]
+
+
+def _average_delta(df_delta: pd.DataFrame) -> float | None:
+    if df_delta.empty or "delta_mean_ndwi" not in df_delta.columns:
+        return None
+    return float(df_delta["delta_mean_ndwi"].mean())
+
+
+def _location_total(df: pd.DataFrame, union_column: str, field_column: str) -> float | None:
+    if df.empty:
+        return None
+    if union_column in df.columns and df[union_column].notna().any():
+        return float(df[union_column].dropna().iloc[0])
+    if field_column in df.columns:
+        return float(df[field_column].sum())
+    return None
+
 
 def summarize_today_and_delta(
     df_today: pd.DataFrame,
@@ -117,9 +310,15 @@ def summarize_today_and_delta(
     target_date: dt.date,
     field_config: FieldConfig,
 ):
-    avg_delta = (
-        float(df_delta["delta_mean_ndwi"].mean())
-        if not df_delta.empty and "delta_mean_ndwi" in df_delta.columns
+    avg_delta = _average_delta(df_delta)
+
+    # Fields may overlap, so the location totals come from the union coverage row
+    # (location_* columns); partitions written before those existed fall back to the sums.
+    field_area = _location_total(df_today, "location_area_ha", "field_area_ha")
+    water_area = _location_total(df_today, "location_water_area_ha", "water_area_ha")
+    volume = (
+        float(field_config.hypsometry.volume(water_area))
+        if water_area is not None and field_config.hypsometry is not None
         else None
     )
 
@@ -131,10 +330,41 @@ def summarize_today_and_delta(
             "total_fields": len(df_today),
             "avg_mean_ndwi": float(df_today["mean_ndwi"].mean()) if not df_today.empty else None,
             "avg_delta_mean_ndwi": avg_delta,
+            "total_field_area_ha": field_area,
+            "total_water_area_ha": water_area,
+            "water_volume_hm3": volume,
         }
     ]
 
 
+def carry_forward_summary(
+    previous: pd.DataFrame,
+    df_today: pd.DataFrame,
+    df_delta: pd.DataFrame,
+    target_date: dt.date,
+) -> List[Dict[str, Any]] | None:
+    """
+    The summary of the partition a scene was carried forward from, re-dated, with
+    today's average delta. None when it no longer matches df_today (e.g. the source
+    was reprocessed with other thresholds and its summary is not rewritten yet).
+    """
+    if len(previous) != 1 or df_today.empty:
+        return None
+    row = previous.iloc[0].to_dict()
+    expected = {
+        "total_fields": len(df_today),
+        "avg_mean_ndwi": float(df_today["mean_ndwi"].mean()),
+        "total_field_area_ha": _location_total(df_today, "location_area_ha", "field_area_ha"),
+        "total_water_area_ha": _location_total(df_today, "location_water_area_ha", "water_area_ha"),
+    }
+    for key, value in expected.items():
+        stored = row.get(key)
+        if value is None or stored is None or not np.isclose(float(stored), value, rtol=1e-6, atol=1e-9):
+            return None
+    row.update(date=target_date.isoformat(), avg_delta_mean_ndwi=_average_delta(df_delta))
+    return [row]
+
+
 def run_daily_ndwi_for_fields(
     date: dt.date,
     field_config: FieldConfig,
@@ -0,0 +1,331 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import datetime as dt
+import json
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from alpes_water_monitor.services.archive import ArchiveReader
+from alpes_water_monitor.services.field_metrics import (
+    M2_PER_HA,
+    MetricsConfig,
+    compute_field_metrics_from_indices,
+)
+from alpes_water_monitor.utils.cdse_client import index_from_uint8
+from alpes_water_monitor.utils.models import FieldConfig
+from alpes_water_monitor.utils.profiling import SpanThreadPool, span, timed
+from alpes_water_monitor.utils.raster import field_coverage_matrix, field_union_coverage, pixel_area_grid
+from alpes_water_monitor.utils.storage import put_bytes_to_minio
+
+logger = logging.getLogger(__name__)
+
+RAW_PREFIX = "raw_ndwi/"
+_RAW_KEY = re.compile(r"^raw_ndwi/date=(\d{4}-\d{2}-\d{2})/(ndwi\.png|carried_forward\.json)$")
+
+
+@dataclass
+class ReprocessConfig:
+    start: Optional[dt.date] = None
+    end: Optional[dt.date] = None
+    # Other archived index PNGs (raw_ndwi/date=D/<index>.png) to average per field.
+    extra_indices: Tuple[str, ...] = ("mndwi", "ndvi")
+    # Parallel MinIO downloads/decodes and uploads.
+    workers: int = 8
+    # Dates per sparse product; bounds the (pixels x 3*chunk) float32 work matrix.
+    chunk_dates: int = 16
+    # Dates whose archived rasters were down-sampled by retention are skipped (their
+    # full-resolution metrics stay). When included, a raster_scale column records it.
+    include_downsampled: bool = False
+
+
+def list_archived_scenes(config: ReprocessConfig, reader: Optional[ArchiveReader] = None) -> Dict[dt.date, str]:
+    """
+    {date: raw NDWI PNG object} for every archived partition in [start, end], loose
+    or packed in a monthly archive. Carried-forward dates point at their source's PNG;
+    those whose source was deleted by retention are skipped.
+    """
+    reader = reader or ArchiveReader()
+    scenes: Dict[dt.date, str] = {}
+    references: List[Tuple[dt.date, str]] = []
+    names = reader.list(RAW_PREFIX)
+    for name in names:
+        match = _RAW_KEY.match(name)
+        if not match:
+            continue
+        day = dt.date.fromisoformat(match.group(1))
+        if (config.start and day < config.start) or (config.end and day > config.end):
+            continue
+        if match.group(2) == "ndwi.png":
+            scenes[day] = name
+        else:
+            references.append((day, name))
+
+    sources = {name for name in names if name.endswith("/ndwi.png")}
+    for day, name in references:
+        if day in scenes:
+            continue
+        source = f"raw_ndwi/date={json.loads(reader.read(name))['source_partition']}/ndwi.png"
+        if source not in sources:
+            logger.warning("Skipping %s: carried forward from %s, which is no longer archived", day, source)
+            continue
+        scenes[day] = source
+    return dict(sorted(scenes.items()))
+
+
+def _decode_png(object_name: str, reader: ArchiveReader) -> np.ndarray:
+    arr = reader.read_array(object_name)
+    return arr[..., 0] if arr.ndim == 3 else arr
+
+
+@timed("reprocess.load_raw_stack")
+def load_raw_stack(
+    object_names: List[str],
+    workers: int = 8,
+    shape: Optional[Tuple[int, int]] = None,
+    missing_ok: bool = False,
+    reader: Optional[ArchiveReader] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Download and decode raw uint8 index PNGs (loose or archived) in parallel into a
+    (n x y x x) stack. Returns (stack, present); with `missing_ok`, absent objects
+    leave a zero row and present[i] = False instead of raising.
+    """
+    if not object_names:
+        return np.empty((0, 0, 0), dtype=np.uint8), np.zeros(0, dtype=bool)
+
+    reader = reader or ArchiveReader()
+    if shape is None:
+        first = _decode_png(object_names[0], reader)
+        shape = first.shape
+    stack = np.zeros((len(object_names), *shape), dtype=np.uint8)
+    present = np.ones(len(object_names), dtype=bool)
+
+    def load(i: int) -> None:
+        try:
+            raw = _decode_png(object_names[i], reader)
+        except FileNotFoundError:
+            if not missing_ok:
+                raise
+            present[i] = False
+            return
+        if raw.shape != tuple(shape):
+            raise ValueError(f"{object_names[i]} has shape {raw.shape}, expected {tuple(shape)}")
+        stack[i] = raw
+
+    with SpanThreadPool(max_workers=workers) as pool:
+        list(pool.map(load, range(len(object_names))))
+    return stack, present
+
+
+def _above_lut(ndwi_threshold: float) -> np.ndarray:
+    # Decided per uint8 value with the same float32 decode as the daily asset, so
+    # values on the threshold land on the same side.
+    return index_from_uint8(np.arange(256, dtype=np.uint8)) > ndwi_threshold
+
+
+@timed("reprocess.compute_metrics_stack")
+def compute_metrics_stack(
+    stack: np.ndarray,
+    dates: List[dt.date],
+    field_config: FieldConfig,
+    metrics_cfg: MetricsConfig | None = None,
+    chunk_dates: int = 16,
+    rows: Optional[List[int]] = None,
+    extra: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None,
+) -> pd.DataFrame:
+    """
+    Per-field metrics for every date of a raw uint8 NDWI stack, with the same columns
+    as compute_field_metrics_from_indices. One weight matrix for all rasters; each
+    chunk of rasters is a single sparse product over (pixels x 3*rasters) columns.
+    `rows[j]` is the stack row of dates[j] (default: one row per date, in order).
+    `extra` maps other index names to (stack, present) aligned with `stack`; they
+    give mean_<index> columns (NaN where the raster is missing).
+    With coverage="mask" each date goes through compute_field_metrics_from_indices
+    instead, so reprocessed metrics match the daily asset's.
+    """
+    metrics_cfg = metrics_cfg or MetricsConfig()
+    n_rasters, height, width = stack.shape
+    rows = list(range(len(dates))) if rows is None else rows
+    if len(rows) != len(dates) or (rows and max(rows) >= n_rasters):
+        raise ValueError(f"{n_rasters} rasters do not cover {len(dates)} dates")
+    if not dates:
+        return pd.DataFrame()
+    if metrics_cfg.coverage != "fractional":
+        return _metrics_per_raster(stack, dates, rows, field_config, metrics_cfg, extra or {})
+
+    weights = field_coverage_matrix(field_config.fields, field_config.bbox, width, height)
+    n_fields = weights.shape[0]
+    total = np.asarray(weights.sum(axis=1)).ravel()
+    pixel_area = pixel_area_grid(field_config.bbox, width, height)
+    field_area_ha = (weights @ pixel_area.astype(np.float64)) / M2_PER_HA
+
+    # One union coverage row per distinct set of active fields (monitoring_start),
+    # appended to the weights, for the location's areas with overlaps counted once.
+    starts = np.array([np.datetime64(f.monitoring_start) for f in field_config.fields])
+    days = np.array([np.datetime64(d) for d in dates])
+    active = days[None, :] >= starts[:, None]
+    active_sets: Dict[Tuple[bool, ...], int] = {}
+    set_of_date = np.array(
+        [active_sets.setdefault(tuple(active[:, j]), len(active_sets)) for j in range(len(dates))]
+    )
+    unions = [
+        field_union_coverage(
+            [field_config.fields[i] for i in np.flatnonzero(key)], field_config.bbox, width, height
+        )
+        for key in active_sets
+    ]
+    weights = sparse.vstack([weights, *unions], format="csr")
+    location_area_ha = (weights[n_fields:] @ pixel_area.astype(np.float64)) / M2_PER_HA
+    location_water_ha = np.full((len(unions), n_rasters), np.nan)
+    above_pos = _above_lut(metrics_cfg.water_threshold_pos)
+    above_strong = _above_lut(metrics_cfg.water_threshold_strong)
+
+    means = np.empty((len(field_config.fields), n_rasters), dtype=np.float64)
+    frac_pos = np.empty_like(means)
+    frac_strong = np.empty_like(means)
+    water_area_ha = np.empty_like(means)
+
+    extra = extra or {}
+    extra_means = {name: np.full_like(means, np.nan) for name in extra}
+
+    for start in range(0, n_rasters, chunk_dates):
+        raw = stack[start : start + chunk_dates].reshape(-1, height * width).T
+        k = raw.shape[1]
+        n_cols = 4 + len(extra)
+        columns = np.empty((height * width, n_cols * k), dtype=np.float32)
+        columns[:, :k] = raw
+        columns[:, k : 2 * k] = above_pos[raw]
+        columns[:, 2 * k : 3 * k] = above_strong[raw]
+        for e, (extra_stack, _) in enumerate(extra.values()):
+            columns[:, (3 + e) * k : (4 + e) * k] = extra_stack[start : start + k].reshape(k, -1).T
+        columns[:, (n_cols - 1) * k :] = above_pos[raw] * pixel_area[:, None]
+        products = weights @ columns
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sums = products[:n_fields] / total[:, None]
+        means[:, start : start + k] = sums[:, :k] / 255.0 * 2.0 - 1.0
+        frac_pos[:, start : start + k] = sums[:, k : 2 * k]
+        frac_strong[:, start : start + k] = sums[:, 2 * k : 3 * k]
+        water_area_ha[:, start : start + k] = products[:n_fields, (n_cols - 1) * k :] / M2_PER_HA
+        location_water_ha[:, start : start + k] = products[n_fields:, (n_cols - 1) * k :] / M2_PER_HA
+        for e, (name, (_, present)) in enumerate(extra.items()):
+            block = sums[:, (3 + e) * k : (4 + e) * k] / 255.0 * 2.0 - 1.0
+            extra_means[name][:, start : start + k] = np.where(present[start : start + k], block, np.nan)
+
+    keep = active & (total[:, None] > 0)
+    date_idx, field_idx = np.nonzero(keep.T)
+    raster_idx = np.asarray(rows)[date_idx]
+
+    columns_out = {
+        "date": [dates[j].isoformat() for j in date_idx],
+        "field_id": [field_config.fields[i].id for i in field_idx],
+        "field_name": [field_config.fields[i].name for i in field_idx],
+        "mean_ndwi": means[field_idx, raster_idx],
+        "water_fraction_pos": frac_pos[field_idx, raster_idx],
+        "water_fraction_strong": frac_strong[field_idx, raster_idx],
+    }
+    for name, values in extra_means.items():
+        columns_out[f"mean_{name}"] = values[field_idx, raster_idx]
+    water = water_area_ha[field_idx, raster_idx]
+    volume = np.full_like(water, np.nan)
+    for i, field in enumerate(field_config.fields):
+        if field.hypsometry is not None:
+            volume[field_idx == i] = field.hypsometry.volume(water[field_idx == i])
+    columns_out["field_area_ha"] = field_area_ha[field_idx]
+    columns_out["water_area_ha"] = water
+    columns_out["water_volume_hm3"] = volume
+    columns_out["location_area_ha"] = location_area_ha[set_of_date[date_idx]]
+    columns_out["location_water_area_ha"] = location_water_ha[set_of_date[date_idx], raster_idx]
+    return pd.DataFrame(columns_out)
+
+
+def _metrics_per_raster(
+    stack: np.ndarray,
+    dates: List[dt.date],
+    rows: List[int],
+    field_config: FieldConfig,
+    metrics_cfg: MetricsConfig,
+    extra: Dict[str, Tuple[np.ndarray, np.ndarray]],
+) -> pd.DataFrame:
+    records = []
+    for day, row in zip(dates, rows):
+        indices = {"ndwi": index_from_uint8(stack[row])}
+        for name, (extra_stack, present) in extra.items():
+            # A missing raster gives NaN means, as in the sparse path.
+            indices[name] = index_from_uint8(extra_stack[row]) if present[row] else np.full(stack.shape[1:], np.nan)
+        records.extend(compute_field_metrics_from_indices(indices, field_config, day, metrics_cfg))
+    return pd.DataFrame(records)
+
+
+def write_metrics_bulk(df: pd.DataFrame, workers: int = 8) -> List[str]:
+    """
+    Write one field_ndwi_daily/date=D/metrics.csv per date (the daily asset's
+    contract) plus the IO manager value, so downstream assets see the new metrics.
+    """
+    from alpes_water_monitor.dagster_app.io_manager import store_asset_partition
+
+    groups = list(df.groupby("date", sort=True))
+
+    def write(item) -> str:
+        day, frame = item
+        frame = frame.reset_index(drop=True)
+        object_name = f"field_ndwi_daily/date={day}/metrics.csv"
+        put_bytes_to_minio(frame.to_csv(index=False).encode(), object_name, content_type="text/csv")
+        store_asset_partition("field_ndwi_daily", day, frame)
+        return object_name
+
+    with span("reprocess.write_metrics_bulk"), SpanThreadPool(max_workers=workers) as pool:
+        return list(pool.map(write, groups))
+
+
+def reprocess_field_metrics(
+    field_config: FieldConfig,
+    metrics_cfg: MetricsConfig | None = None,
+    config: ReprocessConfig | None = None,
+) -> pd.DataFrame:
+    """Recompute field_ndwi_daily for all archived dates from MinIO, without calling CDSE."""
+    config = config or ReprocessConfig()
+    reader = ArchiveReader()
+    scenes = list_archived_scenes(config, reader)
+    scales = {name: reader.scale(name) for name in set(scenes.values())}
+    if not config.include_downsampled:
+        downsampled = [d for d, name in scenes.items() if scales[name] > 1]
+        if downsampled:
+            logger.warning(
+                "Skipping %d date(s) with down-sampled rasters (%s..%s); set include_downsampled to recompute them",
+                len(downsampled),
+                downsampled[0],
+                downsampled[-1],
+            )
+            scenes = {d: name for d, name in scenes.items() if scales[name] == 1}
+    if not scenes:
+        logger.warning("No archived raw NDWI found for %s..%s", config.start, config.end)
+        return pd.DataFrame()
+
+    # Carried-forward dates share their source's raster: load each object once.
+    objects = sorted(set(scenes.values()))
+    stack, _ = load_raw_stack(objects, config.workers, reader=reader)
+    extra = {
+        name: load_raw_stack(
+            [o.replace("/ndwi.png", f"/{name}.png") for o in objects],
+            config.workers,
+            shape=stack.shape[1:],
+            missing_ok=True,
+            reader=reader,
+        )
+        for name in config.extra_indices
+    }
+    row_of = {name: i for i, name in enumerate(objects)}
+    dates = list(scenes)
+    rows = [row_of[scenes[d]] for d in dates]
+
+    df = compute_metrics_stack(stack, dates, field_config, metrics_cfg, config.chunk_dates, rows, extra)
+    if config.include_downsampled:
+        df["raster_scale"] = df["date"].map({d.isoformat(): scales[scenes[d]] for d in dates})
+    write_metrics_bulk(df, config.workers)
+    logger.info("Reprocessed %d dates (%d rasters), %d rows", len(dates), len(objects), len(df))
+    return df
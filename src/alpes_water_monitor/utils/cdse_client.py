@@ -1,16 +1,26 @@
 import os
 import io
 import logging
+import tarfile
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime
-from typing import Tuple, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any, List, Sequence
 
 import numpy as np
 import requests
 from PIL import Image
 from requests.adapters import HTTPAdapter, Retry
 
+from alpes_water_monitor.utils.models import SceneRasters
+from alpes_water_monitor.utils.profiling import span
+from alpes_water_monitor.utils.quota import (
+    QuotaCoordinator,
+    estimate_body_processing_units,
+    get_quota_coordinator,
+    retry_after_seconds,
+)
 
 
 
@@ -21,11 +31,16 @@ TOKEN_URL = (
 
 PROCESS_URL = "https://sh.dataspace.copernicus.eu/api/v1/process"
 
+CATALOG_URL = "https://sh.dataspace.copernicus.eu/api/v1/catalog/1.0.0/search"
+
 CDSE_CRS = "http://www.opengis.net/def/crs/OGC/1.3/CRS84"
 DEFAULT_DATASET = "sentinel-2-l2a"
 
 DEFAULT_TIMEOUT = 60
 
+# 429s are retried here (not by urllib3) so every pod backs off through the quota DB.
+RATE_LIMIT_ATTEMPTS = 5
+
 
 log = logging.getLogger(__name__)
 
@@ -58,6 +73,59 @@ function evaluatePixel(s) {
 """
 
 
+# Normalized-difference indices: name -> (band_a, band_b), index = (a - b) / (a + b).
+SPECTRAL_INDICES: Dict[str, Tuple[str, str]] = {
+    "ndwi": ("B03", "B08"),
+    "mndwi": ("B03", "B11"),
+    "ndvi": ("B08", "B04"),
+}
+
+TRUE_COLOR_ID = "true_color"
+
+
+def request_bands(indices: Sequence[str], true_color: bool = True) -> List[str]:
+    """Input bands a multi-index request reads (drives its processing-unit cost)."""
+    bands = {b for name in indices for b in SPECTRAL_INDICES[name]}
+    if true_color:
+        bands |= {"B02", "B03", "B04"}
+    return sorted(bands)
+
+
+def build_multi_index_evalscript(indices: Sequence[str], true_color: bool = True) -> str:
+    """
+    One evalscript with one output per index (uint8, (index + 1) / 2 like NDWI_EVALSCRIPT)
+    plus an optional RGB quicklook, so a single Process API call returns all of them.
+    """
+    unknown = set(indices) - set(SPECTRAL_INDICES)
+    if unknown:
+        raise ValueError(f"Unknown spectral indices: {sorted(unknown)}")
+
+    bands = request_bands(indices, true_color)
+    outputs = [f'{{ id: "{name}", bands: 1, sampleType: "AUTO" }}' for name in indices]
+    values = [
+        f"{name}: [(nd(s.{a}, s.{b}) + 1) / 2]"
+        for name, (a, b) in ((n, SPECTRAL_INDICES[n]) for n in indices)
+    ]
+    if true_color:
+        outputs.append(f'{{ id: "{TRUE_COLOR_ID}", bands: 3, sampleType: "AUTO" }}')
+        values.append(f"{TRUE_COLOR_ID}: [2.5 * s.B04, 2.5 * s.B03, 2.5 * s.B02]")
+
+    band_list = ", ".join(f'"{b}"' for b in bands)
+    return (
+        "//VERSION=3\n"
+        "function setup() {\n"
+        "  return {\n"
+        f"    input: [{band_list}],\n"
+        "    output: [\n      " + ",\n      ".join(outputs) + "\n    ]\n"
+        "  };\n"
+        "}\n"
+        "function nd(a, b) { return (a - b) / (a + b + 1e-6); }\n"
+        "function evaluatePixel(s) {\n"
+        "  return {\n    " + ",\n    ".join(values) + "\n  };\n"
+        "}\n"
+    )
+
+
 @dataclass(frozen=True)
 class CDSECredentials:
     client_id: str
@@ -82,16 +150,19 @@ class CDSEClient:
     A client to interact with CDSE Process API
     - Handles authentication
     - Retries on transient failures
+    - Reserves each request with the shared quota coordinator (rate + processing units)
     """
 
-    def __init__(self, credentials: CDSECredentials):
+    def __init__(self, credentials: CDSECredentials, quota: Optional[QuotaCoordinator] = None):
         self.credentials = credentials
         self.token: Optional[str] = None
+        self.quota = quota if quota is not None else get_quota_coordinator()
+        self.processing_units = 0.0
 
         retry_strategy = Retry(
             total=3,
             backoff_factor=1.5,
-            status_forcelist=[429, 500, 502, 503, 504]
+            status_forcelist=[500, 502, 503, 504]
         )
         adapter = HTTPAdapter(max_retries=retry_strategy)
 
@@ -102,15 +173,17 @@ class CDSEClient:
     def authenticate(self) -> str:
         log.info("Authenticating with CDSE...")
 
-        resp = self.session.post(
-            TOKEN_URL,
-            data={
-                "grant_type": "client_credentials",
-                "client_id": self.credentials.client_id,
-                "client_secret": self.credentials.client_secret,
-            },
-            timeout=DEFAULT_TIMEOUT,
-        )
+        with span("cdse.authenticate") as s:
+            resp = self.session.post(
+                TOKEN_URL,
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.credentials.client_id,
+                    "client_secret": self.credentials.client_secret,
+                },
+                timeout=DEFAULT_TIMEOUT,
+            )
+            s.add_bytes(len(resp.content))
 
         if resp.status_code != 200:
             raise RuntimeError(
@@ -125,22 +198,25 @@ class CDSEClient:
         return token
 
 
-    def run_process(self, body: Dict[str, Any]) -> bytes:
+    def run_process(self, body: Dict[str, Any], accept: str = "image/png") -> bytes:
         """Call CDSE Process API"""
         if not self.token:
             self.authenticate()
 
         log.debug("Sending Process API request...")
 
-        resp = self.session.post(
+        pu = estimate_body_processing_units(body)
+        resp = self._post_with_quota(
+            "cdse.run_process",
             PROCESS_URL,
+            "process",
+            pu,
             json=body,
             headers={
                 "Authorization": f"Bearer {self.token}",
                 "Content-Type": "application/json",
-                "Accept": "image/png",
+                "Accept": accept,
             },
-            timeout=DEFAULT_TIMEOUT,
         )
 
         if resp.status_code != 200:
@@ -148,15 +224,87 @@ class CDSEClient:
                 f"Process API error [{resp.status_code}]: {resp.text}"
             )
 
+        self.processing_units += pu
         return resp.content
 
 
+    def _post_with_quota(self, span_name: str, url: str, kind: str, pu: float, **kwargs) -> requests.Response:
+        for attempt in range(1, RATE_LIMIT_ATTEMPTS + 1):
+            reservation = self.quota.acquire(pu, kind=kind) if self.quota is not None else None
+            try:
+                with span(span_name) as s:
+                    resp = self.session.post(url, timeout=DEFAULT_TIMEOUT, **kwargs)
+                    s.add_bytes(len(resp.content))
+            except Exception:
+                if reservation is not None and pu:
+                    self.quota.refund(reservation)
+                raise
+            # Only successful requests consume processing units; the others still
+            # count against the request rate.
+            if reservation is not None and pu and resp.status_code != 200:
+                self.quota.refund(reservation)
+            if resp.status_code != 429 or attempt == RATE_LIMIT_ATTEMPTS:
+                return resp
+
+            wait = retry_after_seconds(resp.headers.get("Retry-After"))
+            log.warning("CDSE rate limit hit (attempt %d), backing off %.0fs", attempt, wait)
+            if self.quota is not None:
+                self.quota.note_rate_limited(wait)
+            else:
+                time.sleep(wait)
+        return resp
+
+
+    def search_catalog(
+        self,
+        bbox: Tuple[float, float, float, float],
+        time_range: Tuple[str, str],
+        collection: str = DEFAULT_DATASET,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """STAC search of the CDSE catalog; returns every matching feature (all pages)."""
+        if not self.token:
+            self.authenticate()
+
+        body: Dict[str, Any] = {
+            "bbox": list(bbox),
+            "datetime": f"{time_range[0]}/{time_range[1]}",
+            "collections": [collection],
+            "limit": limit,
+            "fields": {"include": ["id", "properties.datetime", "properties.eo:cloud_cover"]},
+        }
+
+        features: List[Dict[str, Any]] = []
+        while True:
+            resp = self._post_with_quota(
+                "cdse.search_catalog",
+                CATALOG_URL,
+                "catalog",
+                0.0,
+                json=body,
+                headers={"Authorization": f"Bearer {self.token}"},
+            )
+
+            if resp.status_code != 200:
+                raise RuntimeError(
+                    f"Catalog API error [{resp.status_code}]: {resp.text}"
+                )
+
+            page = resp.json()
+            features.extend(page.get("features", []))
+            next_token = page.get("context", {}).get("next")
+            if next_token is None:
+                return features
+            body["next"] = next_token
+
+
 def build_body(
     bbox: Tuple[float, float, float, float],
     time_range: Tuple[str, str],
     width: int,
     height: int,
     evalscript: str,
+    identifiers: Sequence[str] = ("default",),
 ) -> Dict[str, Any]:
 
     min_lon, min_lat, max_lon, max_lat = bbox
@@ -175,17 +323,38 @@ def build_body(
         "output": {
             "width": width,
             "height": height,
-            "responses": [{
-                "identifier": "default",
-                "format": {"type": "image/png"},
-            }],
+            "responses": [
+                {"identifier": identifier, "format": {"type": "image/png"}}
+                for identifier in identifiers
+            ],
         },
         "evalscript": evalscript,
     }
 
 
 def load_png_array(data: bytes) -> np.ndarray:
-    return np.array(Image.open(io.BytesIO(data)))
+    with span("decode.load_png_array") as s:
+        s.add_bytes(len(data))
+        return np.array(Image.open(io.BytesIO(data)))
+
+
+def index_from_uint8(raw: np.ndarray) -> np.ndarray:
+    """uint8 (index + 1) / 2 * 255 encoding -> float32 index in [-1, 1]."""
+    if raw.ndim == 3:
+        raw = raw[..., 0]
+    return (raw.astype(np.float32) / 255.0 * 2.0 - 1.0).astype(np.float32)
+
+
+def parse_multipart_tar(data: bytes) -> Dict[str, bytes]:
+    """Split a multi-response (application/x-tar) payload into {identifier: file bytes}."""
+    parts: Dict[str, bytes] = {}
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:") as tar:
+        for member in tar.getmembers():
+            if not member.isfile():
+                continue
+            identifier = Path(member.name).stem
+            parts[identifier] = tar.extractfile(member).read()
+    return parts
 
 
 def ensure_dir(path: str) -> Path:
@@ -215,6 +384,66 @@ def fetch_true_color(
     return out_path
 
 
+def fetch_multi_index(
+    client: CDSEClient,
+    bbox: Tuple[float, float, float, float],
+    time_range: Tuple[str, str],
+    size: Tuple[int, int] = (512, 512),
+    indices: Sequence[str] = ("ndwi", "mndwi", "ndvi"),
+    true_color: bool = True,
+    out_dir: str = "data",
+) -> Tuple[Dict[str, Path], SceneRasters]:
+    """
+    Fetch all `indices` (and an RGB quicklook) with a single Process API call.
+
+    The PNG parts are written verbatim (no re-encode) and decoded once into arrays.
+    Returns ({identifier: png path}, SceneRasters with float32 indices in [-1, 1]).
+    """
+    parts = request_multi_index(client, bbox, time_range, size, indices, true_color)
+    return save_parts(parts, out_dir), decode_scene(parts, indices)
+
+
+def request_multi_index(
+    client: CDSEClient,
+    bbox: Tuple[float, float, float, float],
+    time_range: Tuple[str, str],
+    size: Tuple[int, int] = (512, 512),
+    indices: Sequence[str] = ("ndwi", "mndwi", "ndvi"),
+    true_color: bool = True,
+) -> Dict[str, bytes]:
+    """The raw PNG bytes of every part of one multi-response request, by identifier."""
+    identifiers = list(indices) + ([TRUE_COLOR_ID] if true_color else [])
+    evalscript = build_multi_index_evalscript(indices, true_color)
+    body = build_body(bbox, time_range, size[0], size[1], evalscript, identifiers=identifiers)
+
+    if len(identifiers) == 1:
+        parts = {identifiers[0]: client.run_process(body)}
+    else:
+        parts = parse_multipart_tar(client.run_process(body, accept="application/tar"))
+
+    missing = set(identifiers) - set(parts)
+    if missing:
+        raise RuntimeError(f"Process API response is missing parts: {sorted(missing)}")
+    return {identifier: parts[identifier] for identifier in identifiers}
+
+
+def save_parts(parts: Dict[str, bytes], out_dir: str = "data") -> Dict[str, Path]:
+    out = ensure_dir(out_dir)
+    stamp = timestamp()
+    paths: Dict[str, Path] = {}
+    for identifier, data in parts.items():
+        path = out / f"{identifier}_raw_{stamp}.png"
+        path.write_bytes(data)
+        paths[identifier] = path
+    return paths
+
+
+def decode_scene(parts: Dict[str, bytes], indices: Sequence[str]) -> SceneRasters:
+    return SceneRasters(
+        indices={name: index_from_uint8(load_png_array(parts[name])) for name in indices},
+    )
+
+
 def fetch_ndwi(
     client: CDSEClient,
     bbox: Tuple[float, float, float, float],
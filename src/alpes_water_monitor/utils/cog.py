@@ -0,0 +1,146 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+import logging
+
+import numpy as np
+from PIL import Image
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as rio_copy
+from rasterio.windows import from_bounds
+
+from alpes_water_monitor.utils.models import BBox
+from alpes_water_monitor.utils.raster import bbox_to_affine
+from alpes_water_monitor.utils.storage import get_minio_client, split_s3_uri
+
+logger = logging.getLogger(__name__)
+
+# Raw NDWI is stored as uint8 with ndwi = raw * NDWI_SCALE + NDWI_OFFSET,
+# the same encoding as the PNG returned by the Process API.
+NDWI_SCALE = 2.0 / 255.0
+NDWI_OFFSET = -1.0
+
+# GDAL settings for remote reads: no sidecar probing, merged range requests.
+REMOTE_READ_ENV = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "VSI_CACHE": "TRUE",
+}
+
+
+@dataclass
+class COGConfig:
+    blocksize: int = 256
+    compress: str = "DEFLATE"  # or "ZSTD"
+    level: int = 6
+    overview_resampling: str = "average"
+    crs: str = "EPSG:4326"
+
+
+def write_ndwi_cog(
+    raw_uint8: np.ndarray,
+    bbox: BBox,
+    out_path: Path,
+    config: COGConfig | None = None,
+) -> Path:
+    """
+    Write a raw (uint8-encoded) NDWI raster as a Cloud-Optimized GeoTIFF:
+    internal tiles, compression, overviews, CRS/transform and scale/offset tags.
+    """
+    config = config or COGConfig()
+    if raw_uint8.ndim != 2:
+        raise ValueError(f"Expected 2D NDWI array, got shape {raw_uint8.shape}")
+
+    height, width = raw_uint8.shape
+    profile = {
+        "driver": "GTiff",
+        "width": width,
+        "height": height,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": config.crs,
+        "transform": bbox_to_affine(bbox, width, height),
+    }
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with MemoryFile() as mem:
+        with mem.open(**profile) as tmp:
+            tmp.write(raw_uint8.astype(np.uint8), 1)
+            tmp.scales = (NDWI_SCALE,)
+            tmp.offsets = (NDWI_OFFSET,)
+            tmp.update_tags(1, index="ndwi", encoding="ndwi = raw * scale + offset")
+        with mem.open() as src:
+            rio_copy(
+                src,
+                str(out_path),
+                driver="COG",
+                BLOCKSIZE=config.blocksize,
+                COMPRESS=config.compress,
+                LEVEL=config.level,
+                PREDICTOR="YES",
+                OVERVIEWS="AUTO",
+                OVERVIEW_RESAMPLING=config.overview_resampling,
+            )
+
+    return out_path
+
+
+def png_to_ndwi_cog(
+    png_path: Path,
+    bbox: BBox,
+    out_path: Path | None = None,
+    config: COGConfig | None = None,
+) -> Path:
+    img = Image.open(png_path)
+    if img.mode != "L":
+        img = img.convert("L")
+    raw = np.array(img, dtype=np.uint8)
+    out_path = out_path or Path(png_path).with_suffix(".tif")
+    return write_ndwi_cog(raw, bbox, out_path, config)
+
+
+def cog_http_url(s3_uri: str, expires: timedelta = timedelta(hours=1)) -> str:
+    """Presigned HTTP URL for an s3:// COG, usable for GDAL /vsicurl/ range reads."""
+    client = get_minio_client()
+    if client is None:
+        raise RuntimeError(f"[minio] endpoint not set, cannot presign {s3_uri}")
+    bucket_name, object_name = split_s3_uri(s3_uri)
+    return client.presigned_get_object(bucket_name, object_name, expires=expires)
+
+
+def read_ndwi_cog(
+    path_or_uri: str,
+    *,
+    bbox: Optional[BBox] = None,
+    overview_level: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Read NDWI (float32 in [-1,1]) from a local COG or s3://bucket/object.
+
+    Only the tiles intersecting `bbox` are fetched (HTTP range requests for s3).
+    `overview_level` selects a reduced-resolution overview (0 = first overview).
+    """
+    src_path = cog_http_url(path_or_uri) if path_or_uri.startswith("s3://") else str(path_or_uri)
+    open_kwargs = {} if overview_level is None else {"overview_level": overview_level}
+
+    with rasterio.Env(**REMOTE_READ_ENV):
+        with rasterio.open(src_path, **open_kwargs) as src:
+            window = None
+            if bbox is not None:
+                window = (
+                    from_bounds(*bbox, transform=src.transform)
+                    .round_offsets()
+                    .round_lengths()
+                )
+            raw = src.read(1, window=window, boundless=False)
+            scale = src.scales[0] if src.scales else NDWI_SCALE
+            offset = src.offsets[0] if src.offsets else NDWI_OFFSET
+
+    logger.debug("Read COG %s window=%s overview=%s -> %s", path_or_uri, window, overview_level, raw.shape)
+    return (raw.astype(np.float32) * np.float32(scale) + np.float32(offset)).astype(np.float32)
@@ -0,0 +1,267 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+import datetime as dt
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import zarr
+from zarr.codecs import BloscCodec, BloscShuffle
+from zarr.errors import ContainsArrayError, ContainsGroupError
+from zarr.storage import FsspecStore, LocalStore
+
+from alpes_water_monitor.utils.models import BBox
+
+logger = logging.getLogger(__name__)
+
+NDWI_ARRAY = "ndwi"
+TIME_ARRAY = "time"
+# NDWI is stored as the uint8 code of the raw CDSE PNGs: ndwi = code * SCALE + OFFSET.
+SCALE = 2.0 / 255.0
+OFFSET = -1.0
+
+
+@dataclass
+class DatacubeConfig:
+    # Time index 0 == start_date; keep in sync with the daily partitions start.
+    start_date: dt.date = dt.date(2024, 4, 1)
+    chunk_yx: int = 256
+    # Time extent, created once with the cube (about ten years of daily partitions).
+    # It is never resized, so concurrent partition writers only ever write their own
+    # chunks; unwritten days cost nothing in the store.
+    days: int = 3660
+    clevel: int = 5
+
+
+def datacube_uri(location_id: str) -> str:
+    """Where the NDWI cube of a location lives: MinIO if configured, else a local directory."""
+    name = f"datacube/ndwi_{location_id}.zarr"
+    if os.getenv("ALPES_MINIO_ENDPOINT"):
+        bucket_name = os.getenv("ALPES_MINIO_BUCKET", "alpes-water-monitor")
+        return f"s3://{bucket_name}/{name}"
+    return str(Path(os.getenv("ALPES_DATACUBE_DIR", "data")) / name)
+
+
+def _open_store(uri: str, read_only: bool):
+    if not uri.startswith("s3://"):
+        return LocalStore(uri, read_only=read_only)
+
+    endpoint = os.getenv("ALPES_MINIO_ENDPOINT", "http://minio:9000")
+    if "://" not in endpoint:
+        endpoint = f"http://{endpoint}"
+    storage_options = {
+        "endpoint_url": endpoint,
+        "key": os.getenv("ALPES_MINIO_ACCESS_KEY", "minioadmin"),
+        "secret": os.getenv("ALPES_MINIO_SECRET_KEY", "minioadmin"),
+    }
+    return FsspecStore.from_url(uri, storage_options=storage_options, read_only=read_only)
+
+
+def _time_index(date: dt.date, config: DatacubeConfig) -> int:
+    idx = (date - config.start_date).days
+    if idx < 0:
+        raise ValueError(f"{date} is before datacube start {config.start_date}")
+    return idx
+
+
+def encode_ndwi(ndwi_real: np.ndarray) -> np.ndarray:
+    """float NDWI in [-1, 1] -> uint8 code; lossless for rasters decoded from the raw PNGs."""
+    codes = np.rint((np.nan_to_num(ndwi_real, nan=OFFSET) - OFFSET) / SCALE)
+    return np.clip(codes, 0, 255).astype(np.uint8)
+
+
+def decode_ndwi(codes: np.ndarray) -> np.ndarray:
+    # Same arithmetic as cdse_client.index_from_uint8, so values match the daily asset's bit for bit.
+    return (codes.astype(np.float32) / 255.0 * 2.0 - 1.0).astype(np.float32)
+
+
+def _create_array_if_missing(group: zarr.Group, name: str, **kwargs) -> None:
+    try:
+        group.create_array(name, **kwargs)
+    except ContainsArrayError:
+        pass  # created by a concurrent partition, with the same metadata
+
+
+def _create_cube(group: zarr.Group, shape_yx: Tuple[int, int], bbox: BBox, config: DatacubeConfig):
+    height, width = shape_yx
+    chunk = min(config.chunk_yx, height, width)
+    compressor = BloscCodec(cname="zstd", clevel=config.clevel, shuffle=BloscShuffle.bitshuffle)
+
+    # Everything here is a function of (shape, bbox, config), so two partitions that
+    # both find the cube missing write identical metadata and neither loses data.
+    group.attrs.update(
+        {
+            "bbox": list(bbox),
+            "crs": "EPSG:4326",
+            "start_date": config.start_date.isoformat(),
+            "index": NDWI_ARRAY,
+        }
+    )
+    # Days since epoch for each filled slot; 0 marks an empty slot.
+    _create_array_if_missing(
+        group,
+        TIME_ARRAY,
+        shape=(config.days,),
+        chunks=(1,),
+        dtype="int32",
+        fill_value=0,
+        dimension_names=("time",),
+    )
+    # Created last: once it exists the cube is complete. One chunk per day, so
+    # appending a date only writes that day's chunks.
+    _create_array_if_missing(
+        group,
+        NDWI_ARRAY,
+        shape=(config.days, height, width),
+        chunks=(1, chunk, chunk),
+        dtype="uint8",
+        fill_value=0,
+        compressors=compressor,
+        dimension_names=("time", "y", "x"),
+        attributes={"scale_factor": SCALE, "add_offset": OFFSET},
+    )
+
+
+def append_ndwi_to_cube(
+    uri: str,
+    ndwi_real: np.ndarray,
+    date: dt.date,
+    bbox: BBox,
+    config: DatacubeConfig | None = None,
+) -> int:
+    """
+    Write one day's NDWI into the (time x y x x) cube at `uri`, creating it if needed.
+
+    Idempotent per date and independent of append order; earlier days' chunks are
+    never rewritten. The cube is created for its full time extent and never resized,
+    so concurrent partitions only write their own chunks. Returns the time index written.
+    """
+    config = config or DatacubeConfig()
+    if ndwi_real.ndim != 2:
+        raise ValueError(f"Expected 2D NDWI array, got shape {ndwi_real.shape}")
+
+    try:
+        group = zarr.open_group(store=_open_store(uri, read_only=False), mode="a")
+    except ContainsGroupError:
+        # Created by a concurrent partition between open_group's check and its create.
+        group = zarr.open_group(store=_open_store(uri, read_only=False), mode="r+")
+    if NDWI_ARRAY not in group:
+        _create_cube(group, ndwi_real.shape, bbox, config)
+
+    cube = group[NDWI_ARRAY]
+    times = group[TIME_ARRAY]
+    if cube.shape[1:] != ndwi_real.shape:
+        raise ValueError(f"NDWI shape {ndwi_real.shape} does not match cube {cube.shape[1:]}")
+
+    idx = _time_index(date, config)
+    if idx >= cube.shape[0]:
+        raise ValueError(
+            f"{date} is past the cube's time extent ({cube.shape[0]} days from {config.start_date}); "
+            "rebuild it with a larger DatacubeConfig.days"
+        )
+
+    cube[idx] = encode_ndwi(ndwi_real)
+    times[idx] = (date - dt.date(1970, 1, 1)).days
+
+    logger.info("[datacube] Wrote %s at time index %d in %s", date, idx, uri)
+    return idx
+
+
+def clear_cube_date(uri: str, date: dt.date, config: DatacubeConfig | None = None) -> bool:
+    """
+    Drop `date`'s slice (e.g. a scene replaced by a carried-forward re-run); returns
+    False when the cube or the slot was empty. Only that day's chunks are written.
+    """
+    config = config or DatacubeConfig()
+    try:
+        group = zarr.open_group(store=_open_store(uri, read_only=False), mode="r+")
+    except FileNotFoundError:
+        return False
+    if NDWI_ARRAY not in group:
+        return False
+    idx = _time_index(date, config)
+    times = group[TIME_ARRAY]
+    if idx >= times.shape[0] or not times[idx]:
+        return False
+    times[idx] = 0
+    group[NDWI_ARRAY][idx] = 0
+    logger.info("[datacube] Cleared %s (time index %d) in %s", date, idx, uri)
+    return True
+
+
+class NDWICube:
+    """
+    Lazy reader over an NDWI datacube. Only the chunks touched by a query are read;
+    values come back as float32 NDWI, NaN for days that were never written.
+    """
+
+    def __init__(self, uri: str):
+        self.uri = uri
+        self._group = zarr.open_group(store=_open_store(uri, read_only=True), mode="r")
+        self._cube = self._group[NDWI_ARRAY]
+        self._times = self._group[TIME_ARRAY]
+        self.start_date = dt.date.fromisoformat(self._group.attrs["start_date"])
+        self.bbox: BBox = tuple(self._group.attrs["bbox"])
+        self._filled_days: Optional[np.ndarray] = None
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self._cube.shape
+
+    def _index(self, date: dt.date) -> int:
+        return (date - self.start_date).days
+
+    def _filled(self) -> np.ndarray:
+        if self._filled_days is None:
+            self._filled_days = self._times[:]
+        return self._filled_days
+
+    def dates(self) -> List[dt.date]:
+        days = self._filled()
+        return [dt.date(1970, 1, 1) + dt.timedelta(days=int(d)) for d in days if d != 0]
+
+    def time_slice(
+        self,
+        date: dt.date,
+        rows: Optional[slice] = None,
+        cols: Optional[slice] = None,
+    ) -> np.ndarray:
+        """NDWI for one date (optionally a row/col window); all-NaN if the day is missing."""
+        idx = self._index(date)
+        rows = rows or slice(None)
+        cols = cols or slice(None)
+        if not 0 <= idx < self._cube.shape[0]:
+            raise KeyError(f"{date} outside cube time range")
+        window = decode_ndwi(self._cube[idx, rows, cols])
+        if self._times[idx] == 0:
+            window[:] = np.nan
+        return window
+
+    def pixel_series(
+        self,
+        row: int,
+        col: int,
+        start: Optional[dt.date] = None,
+        end: Optional[dt.date] = None,
+    ) -> pd.Series:
+        """NDWI time series of one pixel, indexed by date; missing days are dropped."""
+        t0 = max(self._index(start), 0) if start else 0
+        t1 = min(self._index(end) + 1, self._cube.shape[0]) if end else self._cube.shape[0]
+        if t1 <= t0:
+            return pd.Series([], dtype="float32", name="ndwi")
+
+        days = self._filled()[t0:t1]
+        filled = np.flatnonzero(days != 0)
+        if filled.size == 0:
+            return pd.Series([], dtype="float32", name="ndwi")
+        # Only the filled days' chunks are read.
+        values = decode_ndwi(self._cube.get_orthogonal_selection((t0 + filled, row, col)))
+        index = pd.to_datetime(days[filled], unit="D").date
+        return pd.Series(values, index=index, name="ndwi")
+
+
+def open_ndwi_cube(uri: str) -> NDWICube:
+    return NDWICube(uri)
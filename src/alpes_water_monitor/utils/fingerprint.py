@@ -0,0 +1,103 @@
+from __future__ import annotations
+from typing import Any, Collection, Dict, Optional, Sequence
+import hashlib
+import json
+
+from alpes_water_monitor.utils.storage import get_bytes_from_minio, put_bytes_to_minio, remove_minio_object
+
+FINGERPRINT_PREFIX = "fingerprints"
+# fingerprints/<fp>.json names the partition holding that scene; this reverse index
+# gives each partition's fingerprint (and its source when carried forward).
+PARTITION_PREFIX = f"{FINGERPRINT_PREFIX}/partitions"
+
+
+def scene_fingerprint(parts: Dict[str, bytes]) -> str:
+    """
+    sha256 over every raw response part (by identifier). Only the content counts:
+    the ±window mosaic of consecutive partitions is often the same even though the
+    window's acquisition list shifts.
+    """
+    h = hashlib.sha256()
+    for identifier in sorted(parts):
+        h.update(identifier.encode())
+        h.update(hashlib.sha256(parts[identifier]).digest())
+    return h.hexdigest()
+
+
+def _object_name(fingerprint: str) -> str:
+    return f"{FINGERPRINT_PREFIX}/{fingerprint}.json"
+
+
+def _partition_object_name(partition_key: str) -> str:
+    return f"{PARTITION_PREFIX}/{partition_key}.json"
+
+
+def _read(object_name: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(get_bytes_from_minio(object_name))
+    except FileNotFoundError:
+        return None
+
+
+def lookup_fingerprint(fingerprint: str) -> Optional[Dict[str, Any]]:
+    """The record of the partition that holds this scene, or None."""
+    return _read(_object_name(fingerprint))
+
+
+def partition_record(partition_key: str) -> Optional[Dict[str, Any]]:
+    """{fingerprint, partition, source} of a materialized partition, or None."""
+    return _read(_partition_object_name(partition_key))
+
+
+def _drop_scene_record(fingerprint: str, partition_key: str) -> bool:
+    record = lookup_fingerprint(fingerprint)
+    if record is None or record.get("partition") != partition_key:
+        return False
+    remove_minio_object(_object_name(fingerprint))
+    return True
+
+
+def record_fingerprint(
+    fingerprint: str,
+    partition_key: str,
+    acquisition_ids: Sequence[str] = (),
+    source: Optional[str] = None,
+) -> str:
+    """
+    Record `partition_key`'s scene. Without `source` the partition holds the scene and
+    later identical responses are carried forward from it. If the partition held a
+    different scene before (a re-run), that scene's record is dropped, so nothing is
+    carried forward from content the partition no longer has.
+    """
+    previous = partition_record(partition_key)
+    if previous and previous.get("fingerprint") != fingerprint:
+        _drop_scene_record(previous["fingerprint"], partition_key)
+
+    reverse = {"fingerprint": fingerprint, "partition": partition_key, "source": source or partition_key}
+    put_bytes_to_minio(
+        json.dumps(reverse).encode(), _partition_object_name(partition_key), content_type="application/json"
+    )
+    object_name = _object_name(fingerprint)
+    if source is None:
+        record = {
+            "fingerprint": fingerprint,
+            "partition": partition_key,
+            "acquisition_ids": sorted(acquisition_ids),
+        }
+        put_bytes_to_minio(json.dumps(record).encode(), object_name, content_type="application/json")
+    return object_name
+
+
+def remove_fingerprint_records(partitions: Collection[str]) -> int:
+    """
+    Delete the scene records held by any of `partitions` (e.g. after retention) and
+    their reverse entries; returns the number of scene records removed.
+    """
+    removed = 0
+    for partition_key in partitions:
+        reverse = partition_record(partition_key)
+        if reverse is None:
+            continue
+        removed += _drop_scene_record(reverse["fingerprint"], partition_key)
+        remove_minio_object(_partition_object_name(partition_key))
+    return removed
@@ -1,7 +1,8 @@
-from dataclasses import dataclass
-from typing import Tuple, List
+from dataclasses import dataclass, field
+from typing import Tuple, List, Dict, Optional
 from datetime import date
 from shapely.geometry import Polygon
+import numpy as np
 
 
 BBox = Tuple[float, float, float, float] # (min_lon, min_lat, max_lon, max_lat)
@@ -14,12 +15,24 @@ class Location:
     bbox: BBox
     monitoring_start: date
 
+@dataclass(frozen=True)
+class Hypsometry:
+    # Area -> volume lookup table of a reservoir, sorted by area.
+    area_ha: Tuple[float, ...]
+    volume_hm3: Tuple[float, ...]
+
+    def volume(self, area_ha):
+        """Linear interpolation (clamped to the table's range); works on arrays."""
+        return np.interp(area_ha, self.area_ha, self.volume_hm3)
+
 @dataclass
 class Field:
     id: str
     name: str
     polygon: Polygon
     monitoring_start: date   
+    # Own area -> volume table when the field is a whole water body.
+    hypsometry: Optional[Hypsometry] = None
 
 @dataclass
 class FieldConfig:
@@ -27,3 +40,22 @@ class FieldConfig:
     location_name: str    
     bbox: BBox
     fields: List[Field]
+    # Area -> volume table of the location's reservoir (total water area of its fields).
+    hypsometry: Optional[Hypsometry] = None
+
+@dataclass
+class SceneRasters:
+    # Spectral index name (ndwi, mndwi, ndvi ...) -> float32 array in [-1, 1].
+    indices: Dict[str, np.ndarray] = field(default_factory=dict)
+    # Content hash of the raw response parts (see utils/fingerprint).
+    fingerprint: Optional[str] = None
+    # Partition key whose identical scene this one reuses; indices are then empty.
+    carried_forward_from: Optional[str] = None
+
+    @property
+    def ndwi(self) -> np.ndarray:
+        return self.indices["ndwi"]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return next(iter(self.indices.values())).shape
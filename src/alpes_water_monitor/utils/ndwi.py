@@ -1,12 +1,17 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 import datetime as dt
 import logging
 import numpy as np
 
-from alpes_water_monitor.utils.cdse_client import load_env_credentials, CDSEClient, fetch_ndwi
+from alpes_water_monitor.utils.cdse_client import (
+    load_env_credentials,
+    CDSEClient,
+    fetch_ndwi,
+    request_multi_index,
+)
 from alpes_water_monitor.utils.models import BBox
 
 logger = logging.getLogger(__name__)
@@ -18,6 +23,12 @@ class NDWIConfig:
     window_days: int = 5
     out_dir: Path = Path("data")
     file_prefix: str = "ndwi"
+    # Indices fetched together by fetch_index_parts_for_bbox (one Process API call).
+    indices: Tuple[str, ...] = ("ndwi", "mndwi", "ndvi")
+    true_color: bool = True
+    # Look up the catalog's acquisition ids of the time window; they are recorded with
+    # the scene's fingerprint record, not hashed into it.
+    fingerprint_acquisitions: bool = True
 
 def build_time_interval(date: dt.date, window_days: int) -> Tuple[str, str]:
     start = (date - dt.timedelta(days=window_days)).isoformat() + "T00:00:00Z"
@@ -36,3 +47,29 @@ def fetch_ndwi_for_bbox(bbox: BBox, date: dt.date, config: NDWIConfig) -> Path:
         out_dir=str(config.out_dir),
     )
     return raw_path
+
+def fetch_index_parts_for_bbox(bbox: BBox, date: dt.date, config: NDWIConfig) -> Tuple[Dict[str, bytes], List[str]]:
+    """
+    Raw PNG parts of the multi-index request (not decoded) plus the ids of the
+    acquisitions inside the time window, for the fingerprint record.
+    """
+    creds = load_env_credentials()
+    client = CDSEClient(creds)
+    time_interval = build_time_interval(date, config.window_days)
+    parts = request_multi_index(
+        client,
+        bbox=bbox,
+        time_range=time_interval,
+        size=(config.width, config.height),
+        indices=config.indices,
+        true_color=config.true_color,
+    )
+
+    acquisition_ids: List[str] = []
+    if config.fingerprint_acquisitions:
+        try:
+            acquisition_ids = sorted(f["id"] for f in client.search_catalog(bbox, time_interval))
+        except (RuntimeError, OSError, ValueError) as exc:
+            # Informational only: the content hash identifies the scene.
+            logger.warning("Catalog search failed, recording no acquisition ids: %s", exc)
+    return parts, acquisition_ids
@@ -0,0 +1,220 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpanStats:
+    calls: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    bytes: int = 0
+
+
+@dataclass
+class Span:
+    name: str
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    bytes: int = 0
+
+    def add_bytes(self, n: int) -> None:
+        self.bytes += int(n)
+
+
+class SpanRecorder:
+    """
+    Aggregates spans by name (calls, wall time, thread CPU time, bytes). Spans from
+    worker threads (SpanThreadPool) add up, so wall_s can exceed the elapsed time.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, SpanStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, wall_s: float, cpu_s: float, nbytes: int) -> None:
+        with self._lock:
+            st = self.stats.setdefault(name, SpanStats())
+            st.calls += 1
+            st.wall_s += wall_s
+            st.cpu_s += cpu_s
+            st.bytes += nbytes
+
+    def as_metadata(self, prefix: str = "timing") -> Dict[str, float | int]:
+        out: Dict[str, float | int] = {}
+        for name, st in sorted(self.stats.items()):
+            key = f"{prefix}.{name}"
+            out[f"{key}.wall_s"] = round(st.wall_s, 6)
+            out[f"{key}.cpu_s"] = round(st.cpu_s, 6)
+            if st.calls > 1:
+                out[f"{key}.calls"] = st.calls
+            if st.bytes:
+                out[f"{key}.bytes"] = st.bytes
+        return out
+
+
+_recorder: ContextVar[Optional[SpanRecorder]] = ContextVar("alpes_span_recorder", default=None)
+
+
+@contextmanager
+def record_spans() -> Iterator[SpanRecorder]:
+    """Collect every span opened in this context into a fresh recorder."""
+    recorder = SpanRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Time a block (wall + thread CPU). Cheap when nothing is recording; results go to
+    the active `record_spans()` recorder and, if enabled, OpenTelemetry/Prometheus.
+    """
+    s = Span(name=name, attrs=attrs)
+    otel_cm = _otel_span(name, attrs)
+    otel_span = otel_cm.__enter__() if otel_cm is not None else None
+    t0 = time.perf_counter()
+    c0 = time.thread_time()
+    try:
+        yield s
+    finally:
+        wall = time.perf_counter() - t0
+        cpu = time.thread_time() - c0
+
+        recorder = _recorder.get()
+        if recorder is not None:
+            recorder.record(name, wall, cpu, s.bytes)
+        if otel_span is not None:
+            otel_span.set_attribute("bytes", s.bytes)
+            otel_span.set_attribute("cpu_s", cpu)
+            otel_cm.__exit__(None, None, None)
+        _prometheus_observe(name, wall, s.bytes)
+
+
+class SpanThreadPool(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor whose tasks run in a copy of the submitting thread's context,
+    so their spans reach its `record_spans()` recorder (plain pool threads start
+    with an empty context and their spans are dropped).
+    """
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        return super().submit(copy_context().run, fn, *args, **kwargs)
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of `span` for functions without a natural byte count."""
+
+    def deco(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+# Optional exporters -------------------------------------------------------------
+
+_tracer = None
+_prom: Optional[Dict[str, Any]] = None
+_unavailable: set = set()
+
+
+def _enabled(env_var: str) -> bool:
+    return env_var not in _unavailable and os.getenv(env_var, "").lower() in ("1", "true", "yes")
+
+
+def _otel_span(name: str, attrs: Dict[str, Any]):
+    global _tracer
+    if not _enabled("ALPES_OTEL_ENABLED"):
+        return None
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            logger.warning("ALPES_OTEL_ENABLED is set but opentelemetry is not installed")
+            _unavailable.add("ALPES_OTEL_ENABLED")
+            return None
+        _tracer = trace.get_tracer("alpes_water_monitor")
+    return _tracer.start_as_current_span(name, attributes={k: str(v) for k, v in attrs.items()})
+
+
+def _prometheus_observe(name: str, wall_s: float, nbytes: int) -> None:
+    global _prom
+    if not _enabled("ALPES_PROMETHEUS_ENABLED"):
+        return
+    if _prom is None:
+        try:
+            from prometheus_client import Counter, Histogram
+        except ImportError:
+            logger.warning("ALPES_PROMETHEUS_ENABLED is set but prometheus_client is not installed")
+            _unavailable.add("ALPES_PROMETHEUS_ENABLED")
+            return
+        _prom = {
+            "seconds": Histogram("alpes_span_seconds", "Span wall time", ["span"]),
+            "bytes": Counter("alpes_span_bytes_total", "Bytes processed per span", ["span"]),
+        }
+    _prom["seconds"].labels(span=name).observe(wall_s)
+    if nbytes:
+        _prom["bytes"].labels(span=name).inc(nbytes)
+
+
+# Opt-in profiler dumps ------------------------------------------------------------
+
+@contextmanager
+def profile_to_file(label: str) -> Iterator[Dict[str, str]]:
+    """
+    If ALPES_PROFILE is "cprofile" or "pyinstrument", profile the block and write the
+    result under ALPES_PROFILE_DIR (default ./profiles). Yields a dict that receives
+    "profile_path" once the dump is written.
+    """
+    mode = os.getenv("ALPES_PROFILE", "").lower()
+    info: Dict[str, str] = {}
+    if mode not in ("cprofile", "pyinstrument"):
+        yield info
+        return
+
+    out_dir = os.getenv("ALPES_PROFILE_DIR", "profiles")
+    os.makedirs(out_dir, exist_ok=True)
+    safe_label = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
+
+    if mode == "cprofile":
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield info
+        finally:
+            profiler.disable()
+            path = os.path.join(out_dir, f"{safe_label}.prof")
+            profiler.dump_stats(path)
+            info["profile_path"] = path
+    else:
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield info
+        finally:
+            profiler.stop()
+            path = os.path.join(out_dir, f"{safe_label}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            info["profile_path"] = path
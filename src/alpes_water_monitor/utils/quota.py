@@ -0,0 +1,277 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import datetime as dt
+import logging
+import math
+import os
+import re
+import time
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+WINDOW_S = 60.0
+
+
+class CDSEQuotaExceeded(RuntimeError):
+    """The monthly processing-unit budget is used up, or no slot freed up in time."""
+
+
+@dataclass
+class QuotaConfig:
+    # CDSE Process API limits of the account; every client in every run pod shares them.
+    requests_per_minute: int = 300
+    pu_per_minute: float = 300.0
+    monthly_pu: float = 10_000.0
+    # How long a request may wait for a slot before giving up.
+    max_wait_s: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "QuotaConfig":
+        default = cls()
+        return cls(
+            requests_per_minute=int(os.getenv("ALPES_QUOTA_REQUESTS_PER_MINUTE", default.requests_per_minute)),
+            pu_per_minute=float(os.getenv("ALPES_QUOTA_PU_PER_MINUTE", default.pu_per_minute)),
+            monthly_pu=float(os.getenv("ALPES_QUOTA_MONTHLY_PU", default.monthly_pu)),
+            max_wait_s=float(os.getenv("ALPES_QUOTA_MAX_WAIT_S", default.max_wait_s)),
+        )
+
+
+@dataclass
+class QuotaUsage:
+    requests_last_minute: int
+    pu_last_minute: float
+    pu_month: float
+    config: QuotaConfig
+    blocked_until: float = 0.0
+
+    @property
+    def pu_month_remaining(self) -> float:
+        return max(self.config.monthly_pu - self.pu_month, 0.0)
+
+    def as_metadata(self, prefix: str = "cdse_quota") -> Dict[str, float | int]:
+        return {
+            f"{prefix}.requests_last_minute": self.requests_last_minute,
+            f"{prefix}.pu_last_minute": round(self.pu_last_minute, 3),
+            f"{prefix}.pu_month": round(self.pu_month, 3),
+            f"{prefix}.pu_month_remaining": round(self.pu_month_remaining, 3),
+            f"{prefix}.monthly_pu": self.config.monthly_pu,
+        }
+
+
+def estimate_processing_units(
+    width: int,
+    height: int,
+    n_input_bands: int,
+    n_samples: int = 1,
+    float32: bool = False,
+) -> float:
+    """
+    Processing units of one Process API request, following the CDSE rules: 1 PU is
+    512x512 px of 3 input bands; x2 for FLOAT32 output; x samples; minimum 0.005.
+    """
+    pu = (width * height) / (512 * 512) * (n_input_bands / 3) * max(n_samples, 1)
+    if float32:
+        pu *= 2
+    return max(pu, 0.005)
+
+
+_INPUT_BANDS = re.compile(r"input\s*:\s*\[([^\]]*)\]")
+
+
+def estimate_body_processing_units(body: Dict[str, Any]) -> float:
+    """PU estimate for a `build_body` payload (bands read from the evalscript's setup)."""
+    match = _INPUT_BANDS.search(body.get("evalscript", ""))
+    n_bands = len(re.findall(r"B\d\w", match.group(1))) if match else 3
+    out = body.get("output", {})
+    return estimate_processing_units(out.get("width", 512), out.get("height", 512), n_bands or 3)
+
+
+def default_quota_db_url() -> str:
+    """ALPES_QUOTA_DB_URL, else a SQLite file next to the Dagster instance storage."""
+    url = os.getenv("ALPES_QUOTA_DB_URL")
+    if url:
+        return url
+    base = (Path(os.getenv("DAGSTER_HOME", "data")) / "storage").resolve()
+    base.mkdir(parents=True, exist_ok=True)
+    return f"sqlite:///{base / 'cdse_quota.db'}"
+
+
+_metadata = sa.MetaData()
+
+_usage = sa.Table(
+    "cdse_quota_usage",
+    _metadata,
+    sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+    sa.Column("ts", sa.Float, nullable=False, index=True),
+    sa.Column("kind", sa.String(32), nullable=False),
+    sa.Column("pu", sa.Float, nullable=False),
+)
+
+# Single-row table: a 429 seen by any pod blocks every pod until `blocked_until`.
+_state = sa.Table(
+    "cdse_quota_state",
+    _metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("blocked_until", sa.Float, nullable=False),
+)
+
+
+class QuotaCoordinator:
+    """
+    Rate and processing-unit budget shared by all CDSE clients through one SQL
+    database (Postgres in production, SQLite on the shared Dagster volume locally).
+    Each request reserves its slot in a serialized transaction before it is sent.
+    """
+
+    def __init__(self, url: Optional[str] = None, config: Optional[QuotaConfig] = None):
+        self.url = url or default_quota_db_url()
+        self.config = config or QuotaConfig.from_env()
+        self.engine = sa.create_engine(self.url)
+        if self.engine.dialect.name == "sqlite":
+            self._serialize_sqlite_transactions()
+        _metadata.create_all(self.engine)
+
+    def _serialize_sqlite_transactions(self) -> None:
+        # pysqlite defers BEGIN; take the write lock up front so check + insert is atomic.
+        @sa.event.listens_for(self.engine, "connect")
+        def _connect(dbapi_connection, _record):
+            dbapi_connection.isolation_level = None
+            dbapi_connection.execute("PRAGMA busy_timeout = 30000")
+
+        @sa.event.listens_for(self.engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    def _lock(self, conn) -> None:
+        if self.engine.dialect.name == "postgresql":
+            conn.execute(sa.text("SELECT pg_advisory_xact_lock(hashtext('alpes_cdse_quota'))"))
+
+    def _usage(self, conn, now: float) -> QuotaUsage:
+        minute = conn.execute(
+            sa.select(sa.func.count(), sa.func.coalesce(sa.func.sum(_usage.c.pu), 0.0)).where(
+                _usage.c.ts > now - WINDOW_S
+            )
+        ).one()
+        month_start = dt.datetime.fromtimestamp(now, dt.timezone.utc).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        pu_month = conn.execute(
+            sa.select(sa.func.coalesce(sa.func.sum(_usage.c.pu), 0.0)).where(
+                _usage.c.ts >= month_start.timestamp()
+            )
+        ).scalar_one()
+        blocked_until = conn.execute(sa.select(_state.c.blocked_until).where(_state.c.id == 1)).scalar()
+        return QuotaUsage(
+            requests_last_minute=int(minute[0]),
+            pu_last_minute=float(minute[1]),
+            pu_month=float(pu_month),
+            config=self.config,
+            blocked_until=float(blocked_until or 0.0),
+        )
+
+    def usage(self, now: Optional[float] = None) -> QuotaUsage:
+        with self.engine.connect() as conn:
+            return self._usage(conn, now or time.time())
+
+    def _try_reserve(self, pu: float, kind: str) -> Tuple[float, Optional[int]]:
+        """Reserve a slot; returns (0, reservation id) on success, else (seconds to wait, None)."""
+        now = time.time()
+        with self.engine.begin() as conn:
+            self._lock(conn)
+            usage = self._usage(conn, now)
+
+            if usage.pu_month + pu > self.config.monthly_pu:
+                raise CDSEQuotaExceeded(
+                    f"Monthly CDSE budget exhausted: {usage.pu_month:.1f} + {pu:.2f} PU "
+                    f"> {self.config.monthly_pu:.0f} PU"
+                )
+            if usage.blocked_until > now:
+                return usage.blocked_until - now, None
+            if (
+                usage.requests_last_minute + 1 > self.config.requests_per_minute
+                or usage.pu_last_minute + pu > self.config.pu_per_minute
+            ):
+                oldest = conn.execute(
+                    sa.select(sa.func.min(_usage.c.ts)).where(_usage.c.ts > now - WINDOW_S)
+                ).scalar()
+                return max((oldest or now) + WINDOW_S - now, 0.05), None
+
+            result = conn.execute(_usage.insert().values(ts=now, kind=kind, pu=pu))
+            return 0.0, result.inserted_primary_key[0]
+
+    def acquire(self, pu: float = 0.0, kind: str = "process") -> int:
+        """
+        Block until the request fits every limit and record it. Returns the reservation
+        id, for `refund` when the request turns out not to consume its processing units.
+        """
+        start = time.monotonic()
+        while True:
+            wait, reservation = self._try_reserve(pu, kind)
+            if reservation is not None:
+                waited = time.monotonic() - start
+                if waited > 0.5:
+                    logger.info("[quota] Waited %.1fs for a CDSE %s slot", waited, kind)
+                return reservation
+            if time.monotonic() - start + wait > self.config.max_wait_s:
+                raise CDSEQuotaExceeded(f"No CDSE {kind} slot within {self.config.max_wait_s:.0f}s")
+            time.sleep(min(wait, 5.0))
+
+    def refund(self, reservation: int) -> None:
+        """Keep the request in the rate window but charge it 0 PU (429s and failed requests)."""
+        with self.engine.begin() as conn:
+            conn.execute(_usage.update().where(_usage.c.id == reservation).values(pu=0.0))
+
+    def note_rate_limited(self, retry_after_s: float) -> None:
+        """A 429 was returned: make every client back off for `retry_after_s`."""
+        until = time.time() + max(retry_after_s, 1.0)
+        with self.engine.begin() as conn:
+            self._lock(conn)
+            current = conn.execute(sa.select(_state.c.blocked_until).where(_state.c.id == 1)).scalar()
+            if current is None:
+                conn.execute(_state.insert().values(id=1, blocked_until=until))
+            elif current < until:
+                conn.execute(_state.update().where(_state.c.id == 1).values(blocked_until=until))
+
+    def prune(self, older_than_days: int = 62) -> int:
+        cutoff = time.time() - older_than_days * 86400
+        with self.engine.begin() as conn:
+            return conn.execute(_usage.delete().where(_usage.c.ts < cutoff)).rowcount
+
+
+@lru_cache(maxsize=4)
+def _coordinator(url: str) -> QuotaCoordinator:
+    return QuotaCoordinator(url)
+
+
+def get_quota_coordinator() -> Optional[QuotaCoordinator]:
+    """The process-wide coordinator, or None when ALPES_QUOTA_ENABLED is false."""
+    if os.getenv("ALPES_QUOTA_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return _coordinator(default_quota_db_url())
+
+
+def retry_after_seconds(header: Optional[str], default: float = 10.0) -> float:
+    if not header:
+        return default
+    try:
+        return max(float(header), 0.0)
+    except ValueError:
+        return default
+
+
+def slots_for(pu_per_run: float, usage: QuotaUsage) -> int:
+    """How many more runs of `pu_per_run` fit in the remaining monthly budget."""
+    if pu_per_run <= 0:
+        return 10**6
+    return int(math.floor(usage.pu_month_remaining / pu_per_run))
+
+
+def quota_metadata() -> Dict[str, float | int]:
+    """Current shared usage as asset metadata ({} when the coordinator is disabled)."""
+    coordinator = get_quota_coordinator()
+    return coordinator.usage().as_metadata() if coordinator is not None else {}
@@ -1,9 +1,14 @@
 from __future__ import annotations
-from typing import Tuple
+from functools import lru_cache
+from typing import Sequence, Tuple
+import math
 import numpy as np
+import shapely
 from rasterio.transform import Affine
 from rasterio.features import rasterize
+from scipy import sparse
 from alpes_water_monitor.utils.models import Field, BBox
+from alpes_water_monitor.utils.profiling import span
 
 
 def bbox_to_affine(bbox: BBox, width: int, height: int) -> Affine:
@@ -21,13 +26,178 @@ def rasterize_field_mask(
     *,
     all_touched: bool = True,
 ) -> np.ndarray:
-    transform = bbox_to_affine(bbox, width, height)
-    mask = rasterize(
-        [(field.polygon, 1)],
-        out_shape=(height, width),
-        transform=transform,
-        fill=0,
-        all_touched=all_touched,
-        dtype="uint8",
+    with span("raster.rasterize_field_mask") as s:
+        transform = bbox_to_affine(bbox, width, height)
+        mask = rasterize(
+            [(field.polygon, 1)],
+            out_shape=(height, width),
+            transform=transform,
+            fill=0,
+            all_touched=all_touched,
+            dtype="uint8",
+        )
+        s.add_bytes(mask.nbytes)
+        return mask.astype(bool)
+
+
+def _polygon_coverage(
+    polygon,
+    bbox: BBox,
+    width: int,
+    height: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact fraction of each pixel covered by `polygon`, as (flat pixel index, weight).
+
+    Pixels crossed by the boundary get their exact intersection area (shapely);
+    pixels strictly inside get 1.0 from a windowed rasterization, so the cost
+    scales with the perimeter rather than the area of the field.
+    """
+    minx, miny, maxx, maxy = bbox
+    pw = (maxx - minx) / width
+    ph = (maxy - miny) / height
+
+    fminx, fminy, fmaxx, fmaxy = polygon.bounds
+    c0 = max(int(math.floor((fminx - minx) / pw)), 0)
+    c1 = min(int(math.ceil((fmaxx - minx) / pw)), width)
+    r0 = max(int(math.floor((maxy - fmaxy) / ph)), 0)
+    r1 = min(int(math.ceil((maxy - fminy) / ph)), height)
+    if c1 <= c0 or r1 <= r0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    shape = (r1 - r0, c1 - c0)
+    win_transform = bbox_to_affine(bbox, width, height) * Affine.translation(c0, r0)
+    edge = rasterize(
+        [(polygon.boundary, 1)], out_shape=shape, transform=win_transform,
+        fill=0, all_touched=True, dtype="uint8",
+    ).astype(bool)
+    inner = rasterize(
+        [(polygon, 1)], out_shape=shape, transform=win_transform,
+        fill=0, all_touched=False, dtype="uint8",
+    ).astype(bool) & ~edge
+
+    er, ec = np.nonzero(edge)
+    boxes = shapely.box(
+        minx + (ec + c0) * pw,
+        maxy - (er + r0 + 1) * ph,
+        minx + (ec + c0 + 1) * pw,
+        maxy - (er + r0) * ph,
     )
-    return mask.astype(bool)
+    edge_w = shapely.area(shapely.intersection(boxes, polygon)) / (pw * ph)
+
+    ir, ic = np.nonzero(inner)
+    rows = np.concatenate([ir, er]) + r0
+    cols = np.concatenate([ic, ec]) + c0
+    weights = np.concatenate([np.ones(ir.size), edge_w]).astype(np.float32)
+
+    keep = weights > 0
+    return (rows[keep].astype(np.int64) * width + cols[keep]), np.minimum(weights[keep], 1.0)
+
+
+@lru_cache(maxsize=8)
+def _coverage_matrix_cached(
+    bbox: BBox,
+    width: int,
+    height: int,
+    polygons_wkb: Tuple[bytes, ...],
+) -> sparse.csr_matrix:
+    polygons = shapely.from_wkb(np.array(polygons_wkb, dtype=object))
+    indptr = [0]
+    indices = []
+    data = []
+    for polygon in polygons:
+        idx, w = _polygon_coverage(polygon, bbox, width, height)
+        indices.append(idx)
+        data.append(w)
+        indptr.append(indptr[-1] + idx.size)
+
+    matrix = sparse.csr_matrix(
+        (
+            np.concatenate(data) if data else np.empty(0, dtype=np.float32),
+            np.concatenate(indices) if indices else np.empty(0, dtype=np.int64),
+            np.asarray(indptr, dtype=np.int64),
+        ),
+        shape=(len(polygons), width * height),
+    )
+    matrix.sort_indices()
+    return matrix
+
+
+@lru_cache(maxsize=8)
+def _pixel_area_grid_cached(bbox: BBox, width: int, height: int) -> np.ndarray:
+    from pyproj import Geod
+
+    geod = Geod(ellps="WGS84")
+    minx, miny, maxx, maxy = bbox
+    pw = (maxx - minx) / width
+    ph = (maxy - miny) / height
+    # A lat/lon cell's area depends only on its row: one geodesic polygon per row.
+    areas = np.empty(height, dtype=np.float64)
+    for r in range(height):
+        top = maxy - r * ph
+        area, _ = geod.polygon_area_perimeter(
+            [minx, minx + pw, minx + pw, minx], [top, top, top - ph, top - ph]
+        )
+        areas[r] = abs(area)
+    grid = np.repeat(areas.astype(np.float32), width)
+    grid.setflags(write=False)
+    return grid
+
+
+def pixel_area_grid(bbox: BBox, width: int, height: int) -> np.ndarray:
+    """
+    Geodesic area (m², WGS84) of each pixel of the EPSG:4326 grid, flattened in
+    row-major order like the coverage matrix columns. Cached per (bbox, size), read-only.
+    """
+    return _pixel_area_grid_cached(tuple(float(v) for v in bbox), width, height)
+
+
+def field_coverage_matrix(
+    fields: Sequence[Field],
+    bbox: BBox,
+    width: int,
+    height: int,
+) -> sparse.csr_matrix:
+    """
+    Sparse (n_fields x height*width) CSR matrix of fractional pixel coverage, one row
+    per field in order. Rows are independent, so overlapping fields are handled.
+    Cached per (bbox, size, geometry set).
+    """
+    with span("raster.field_coverage_matrix") as s:
+        key = tuple(field.polygon.wkb for field in fields)
+        matrix = _coverage_matrix_cached(tuple(float(v) for v in bbox), width, height, key)
+        s.add_bytes(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+        return matrix
+
+
+@lru_cache(maxsize=32)
+def _union_coverage_cached(
+    bbox: BBox,
+    width: int,
+    height: int,
+    polygons_wkb: Tuple[bytes, ...],
+) -> sparse.csr_matrix:
+    if not polygons_wkb:
+        return sparse.csr_matrix((1, width * height), dtype=np.float32)
+    union = shapely.union_all(shapely.from_wkb(np.array(polygons_wkb, dtype=object)))
+    idx, w = _polygon_coverage(union, bbox, width, height)
+    order = np.argsort(idx)
+    return sparse.csr_matrix(
+        (w[order], idx[order], np.array([0, idx.size], dtype=np.int64)), shape=(1, width * height)
+    )
+
+
+def field_union_coverage(
+    fields: Sequence[Field],
+    bbox: BBox,
+    width: int,
+    height: int,
+) -> sparse.csr_matrix:
+    """
+    1 x height*width coverage row of the union of `fields`' polygons (exact, like
+    the field rows): overlaps count once and pixels shared by adjacent fields add up.
+    Cached per (bbox, size, geometry set).
+    """
+    with span("raster.field_union_coverage"):
+        key = tuple(field.polygon.wkb for field in fields)
+        return _union_coverage_cached(tuple(float(v) for v in bbox), width, height, key)
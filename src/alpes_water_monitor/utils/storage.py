@@ -1,17 +1,28 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Optional
+import datetime as dt
+import io
+import logging
 import os
 import tempfile
 from urllib.parse import urlparse
 
 from dagster import AssetExecutionContext
 from minio import Minio
+from minio.error import S3Error
 import numpy as np
 from PIL import Image
 import pandas as pd
 
+from alpes_water_monitor.utils.profiling import span
 
+logger = logging.getLogger(__name__)
+
+
+def _log(context: Optional[AssetExecutionContext]):
+    # Helpers are also used outside Dagster (CLI, scripts), where there is no context.
+    return context.log if context is not None else logger
 
 
 def get_minio_client() -> Optional[Minio]:
@@ -35,6 +46,16 @@ def get_minio_client() -> Optional[Minio]:
     )
 
 
+def split_s3_uri(s3_uri: str) -> tuple[str, str]:
+    if not s3_uri.startswith("s3://"):
+        raise ValueError(f"Expected s3:// URI, got {s3_uri}")
+    _, _, rest = s3_uri.partition("s3://")
+    parts = rest.split("/", 1)
+    if len(parts) != 2:
+        raise ValueError(f"Invalid s3 URI: {s3_uri}")
+    return parts[0], parts[1]
+
+
 def upload_file_to_minio(context: AssetExecutionContext, local_path: Path, object_name: str):
     client = get_minio_client()
     if client is None:
@@ -45,51 +66,52 @@ def upload_file_to_minio(context: AssetExecutionContext, local_path: Path, objec
     if not client.bucket_exists(bucket_name):
         client.make_bucket(bucket_name)
 
-    client.fput_object(
-        bucket_name=bucket_name,
-        object_name=object_name,
-        file_path=str(local_path),
-    )
+    with span("minio.upload") as s:
+        client.fput_object(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            file_path=str(local_path),
+        )
+        s.add_bytes(Path(local_path).stat().st_size)
     context.log.info("[minio] Uploaded %s to s3://%s/%s", local_path, bucket_name, object_name)
     return f"s3://{bucket_name}/{object_name}"
 
 
 def download_file_from_minio(
-    context: AssetExecutionContext,
+    context: Optional[AssetExecutionContext],
     object_name: str,
     dest_path: Path,
     bucket_name: str | None = None,
 ) -> Optional[Path]:
     client = get_minio_client()
     if client is None:
-        context.log.warning("[minio] endpoint not set, cannot download %s", object_name)
+        _log(context).warning("[minio] endpoint not set, cannot download %s", object_name)
         return None
 
     bucket_name = bucket_name or os.getenv("ALPES_MINIO_BUCKET", "alpes-water-monitor")
 
     try:
         dest_path.parent.mkdir(parents=True, exist_ok=True)
-        client.fget_object(bucket_name=bucket_name, object_name=object_name, file_path=str(dest_path))
-        context.log.info("[minio] Downloaded s3://%s/%s to %s", bucket_name, object_name, dest_path)
+        with span("minio.download") as s:
+            client.fget_object(bucket_name=bucket_name, object_name=object_name, file_path=str(dest_path))
+            s.add_bytes(dest_path.stat().st_size)
+        _log(context).info("[minio] Downloaded s3://%s/%s to %s", bucket_name, object_name, dest_path)
         return dest_path
     except Exception as e:
-        context.log.warning("[minio] Failed to download s3://%s/%s: %s", bucket_name, object_name, e)
+        _log(context).warning("[minio] Failed to download s3://%s/%s: %s", bucket_name, object_name, e)
         return None
 
 
 def load_ndwi_from_path(
-    context: AssetExecutionContext,
-    path_or_object: str,
+    context: Optional[AssetExecutionContext],
+    path_or_object: str | Path,
 ) -> np.ndarray:
     """
     Load NDWI PNG from local path or s3://bucket/object and return float32 array in [-1,1].
     """
+    path_or_object = str(path_or_object)
     if path_or_object.startswith("s3://"):
-        _, _, rest = path_or_object.partition("s3://")
-        bucket_and_key = rest.split("/", 1)
-        if len(bucket_and_key) != 2:
-            raise ValueError(f"Invalid s3 URI: {path_or_object}")
-        bucket_name, object_name = bucket_and_key
+        bucket_name, object_name = split_s3_uri(path_or_object)
         tmp = Path(tempfile.mkdtemp()) / "ndwi.png"
         downloaded = download_file_from_minio(context, object_name, tmp, bucket_name=bucket_name)
         if downloaded is None:
@@ -101,24 +123,20 @@ def load_ndwi_from_path(
     if not local_path.exists():
         raise FileNotFoundError(f"NDWI file not found at {local_path}")
 
-    img = Image.open(local_path)
-    if img.mode != "L":
-        img = img.convert("L")
-    arr = np.array(img, dtype=np.float32) / 255.0
-    if arr.ndim != 2:
-        raise ValueError(f"Expected 2D NDWI array, got shape {arr.shape}")
-    ndwi_real = arr * 2.0 - 1.0
-    return ndwi_real.astype(np.float32)
+    with span("decode.load_ndwi_png") as s:
+        s.add_bytes(local_path.stat().st_size)
+        img = Image.open(local_path)
+        if img.mode != "L":
+            img = img.convert("L")
+        arr = np.array(img, dtype=np.float32) / 255.0
+        if arr.ndim != 2:
+            raise ValueError(f"Expected 2D NDWI array, got shape {arr.shape}")
+        ndwi_real = arr * 2.0 - 1.0
+        return ndwi_real.astype(np.float32)
 
 
 def read_csv_from_s3_uri(context: AssetExecutionContext, s3_uri: str) -> pd.DataFrame:
-    if not s3_uri.startswith("s3://"):
-        raise ValueError(f"Expected s3:// URI, got {s3_uri}")
-    _, _, rest = s3_uri.partition("s3://")
-    parts = rest.split("/", 1)
-    if len(parts) != 2:
-        raise ValueError(f"Invalid s3 URI: {s3_uri}")
-    bucket_name, object_name = parts
+    bucket_name, object_name = split_s3_uri(s3_uri)
     tmp = Path(tempfile.mkdtemp()) / "tmp.csv"
     downloaded = download_file_from_minio(context, object_name, tmp, bucket_name=bucket_name)
     if downloaded is None:
@@ -134,3 +152,129 @@ def write_df_to_minio_csv(
     tmp = Path(tempfile.mkdtemp()) / "tmp.csv"
     df.to_csv(tmp, index=False)
     return upload_file_to_minio(context, tmp, object_name)
+
+
+def minio_bucket_name() -> str:
+    return os.getenv("ALPES_MINIO_BUCKET", "alpes-water-monitor")
+
+
+def _require_minio_client(action: str) -> Minio:
+    client = get_minio_client()
+    if client is None:
+        raise RuntimeError(f"[minio] endpoint not set, cannot {action}")
+    return client
+
+
+def put_bytes_to_minio(
+    data: bytes,
+    object_name: str,
+    content_type: str = "application/octet-stream",
+    bucket_name: str | None = None,
+) -> str:
+    """Upload an in-memory payload; returns the object's ETag."""
+    client = _require_minio_client(f"upload {object_name}")
+    bucket_name = bucket_name or minio_bucket_name()
+
+    if not client.bucket_exists(bucket_name):
+        client.make_bucket(bucket_name)
+
+    with span("minio.upload") as s:
+        result = client.put_object(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type=content_type,
+        )
+        s.add_bytes(len(data))
+    return result.etag
+
+
+def get_bytes_from_minio(
+    object_name: str,
+    bucket_name: str | None = None,
+    offset: int = 0,
+    length: int = 0,
+) -> bytes:
+    """Download an object (or the byte range offset..offset+length) into memory."""
+    client = _require_minio_client(f"download {object_name}")
+    bucket_name = bucket_name or minio_bucket_name()
+
+    with span("minio.download") as s:
+        try:
+            resp = client.get_object(bucket_name, object_name, offset=offset, length=length)
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                raise FileNotFoundError(f"s3://{bucket_name}/{object_name}") from e
+            raise
+        try:
+            data = resp.read()
+        finally:
+            resp.close()
+            resp.release_conn()
+        s.add_bytes(len(data))
+    return data
+
+
+def stat_minio_object(object_name: str, bucket_name: str | None = None):
+    """Object info (etag, size, content_type...) or None if the object does not exist."""
+    client = _require_minio_client(f"stat {object_name}")
+    bucket_name = bucket_name or minio_bucket_name()
+    try:
+        return client.stat_object(bucket_name, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return None
+        raise
+
+
+def remove_minio_object(object_name: str, bucket_name: str | None = None) -> None:
+    """Delete an object; deleting a missing object is not an error (S3 semantics)."""
+    client = _require_minio_client(f"remove {object_name}")
+    client.remove_object(bucket_name or minio_bucket_name(), object_name)
+
+
+def list_minio_objects(prefix: str, bucket_name: str | None = None, recursive: bool = True) -> list[str]:
+    """Object names under `prefix` (directories are skipped)."""
+    client = _require_minio_client(f"list {prefix}")
+    bucket_name = bucket_name or minio_bucket_name()
+    return [
+        obj.object_name
+        for obj in client.list_objects(bucket_name, prefix=prefix, recursive=recursive)
+        if not obj.is_dir
+    ]
+
+
+def list_minio_object_etags(prefix: str, bucket_name: str | None = None) -> dict[str, str]:
+    """{object name: ETag} under `prefix`, recursively; one LIST, no per-object HEAD."""
+    client = _require_minio_client(f"list {prefix}")
+    bucket_name = bucket_name or minio_bucket_name()
+    return {
+        obj.object_name: (obj.etag or "").strip('"')
+        for obj in client.list_objects(bucket_name, prefix=prefix, recursive=True)
+        if not obj.is_dir
+    }
+
+
+def latest_partition_date_before(
+    prefix: str,
+    before: dt.date,
+    max_gap_days: int = 31,
+    bucket_name: str | None = None,
+) -> Optional[dt.date]:
+    """
+    Newest D < `before` (within `max_gap_days`) with an object under `{prefix}date=D/`.
+    Lists one `date=YYYY-MM` prefix per month of the window, not the whole history.
+    """
+    oldest = before - dt.timedelta(days=max_gap_days)
+    months = sorted({(oldest + dt.timedelta(days=i)).strftime("%Y-%m") for i in range(max_gap_days + 1)})
+    dates = set()
+    for month in months:
+        for name in list_minio_objects(f"{prefix}date={month}", bucket_name=bucket_name):
+            try:
+                day = dt.date.fromisoformat(name[len(prefix) + len("date="):].split("/", 1)[0])
+            except ValueError:
+                continue
+            if oldest <= day < before:
+                dates.add(day)
+    return max(dates) if dates else None
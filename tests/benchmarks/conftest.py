@@ -0,0 +1,69 @@
+import json
+import os
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+THRESHOLDS_PATH = Path(__file__).with_name("thresholds.json")
+
+# ALPES_BENCH_SCALE=full runs the large grid (up to 100k fields / 10k^2 pixels).
+SCALES = {
+    "small": {"fields": [10, 100], "pixels": [512]},
+    "full": {"fields": [10, 1_000, 100_000], "pixels": [512, 2_048, 10_000]},
+}
+
+
+def bench_scale() -> dict:
+    return SCALES[os.getenv("ALPES_BENCH_SCALE", "small")]
+
+
+def pytest_generate_tests(metafunc):
+    scale = bench_scale()
+    if "n_fields" in metafunc.fixturenames:
+        metafunc.parametrize("n_fields", scale["fields"], ids=lambda n: f"fields={n}")
+    if "n_pixels" in metafunc.fixturenames:
+        metafunc.parametrize("n_pixels", scale["pixels"], ids=lambda n: f"px={n}")
+
+
+def peak_memory_mb(fn, *args, **kwargs) -> float:
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1e6
+
+
+@pytest.fixture
+def run_benchmark(benchmark, request):
+    """
+    Benchmark `fn`, record peak memory and throughput in extra_info and enforce
+    the regression thresholds from thresholds.json for this test id.
+    """
+    thresholds = json.loads(THRESHOLDS_PATH.read_text())
+
+    def _run(fn, *args, items: int | None = None, nbytes: int | None = None, **kwargs):
+        peak_mb = peak_memory_mb(fn, *args, **kwargs)
+        result = benchmark(fn, *args, **kwargs)
+
+        benchmark.extra_info["peak_mb"] = round(peak_mb, 3)
+        stats = benchmark.stats.stats if benchmark.stats else None
+        if stats is not None and stats.mean > 0:
+            if items:
+                benchmark.extra_info["items_per_s"] = items / stats.mean
+            if nbytes:
+                benchmark.extra_info["mb_per_s"] = nbytes / 1e6 / stats.mean
+
+        callspec = getattr(request.node, "callspec", None)
+        limit = thresholds.get(request.node.originalname, {}).get(callspec.id if callspec else "")
+        if limit:
+            assert peak_mb <= limit["max_peak_mb"], f"peak memory {peak_mb:.1f} MB > {limit['max_peak_mb']} MB"
+            if stats is not None:
+                assert stats.mean <= limit["max_mean_s"], f"mean {stats.mean:.4f}s > {limit['max_mean_s']}s"
+        return result
+
+    return _run
@@ -0,0 +1,39 @@
+"""Synthetic rasters and field sets for the benchmark suite."""
+import datetime as dt
+
+import numpy as np
+import shapely.geometry as geom
+
+from alpes_water_monitor.utils.models import Field, FieldConfig
+
+BBOX = (6.80, 43.585, 6.82, 43.60)
+
+
+def synthetic_ndwi(size: int, seed: int = 0) -> np.ndarray:
+    """float32 NDWI in [-1, 1]: a smooth lake plus noise."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    lake = 1.0 - 4.0 * ((xx - 0.5) ** 2 + (yy - 0.5) ** 2)
+    noise = rng.normal(0.0, 0.05, size=(size, size)).astype(np.float32)
+    return np.clip(lake - 0.3 + noise, -1.0, 1.0).astype(np.float32)
+
+
+def synthetic_field_config(n_fields: int) -> FieldConfig:
+    """n_fields square polygons laid out on a regular grid inside BBOX."""
+    minx, miny, maxx, maxy = BBOX
+    per_row = int(np.ceil(np.sqrt(n_fields)))
+    dx = (maxx - minx) / per_row
+    dy = (maxy - miny) / per_row
+    fields = []
+    for i in range(n_fields):
+        r, c = divmod(i, per_row)
+        x0, y0 = minx + c * dx, miny + r * dy
+        fields.append(
+            Field(
+                id=f"f{i}",
+                name=f"Field {i}",
+                polygon=geom.box(x0 + 0.1 * dx, y0 + 0.1 * dy, x0 + 0.9 * dx, y0 + 0.9 * dy),
+                monitoring_start=dt.date(2024, 1, 1),
+            )
+        )
+    return FieldConfig(location_id="bench", location_name="Benchmark", bbox=BBOX, fields=fields)
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+HEAVY_MODULES = {"pandas", "numpy", "rasterio", "shapely", "PIL", "minio", "requests", "zarr", "s3fs"}
+THRESHOLDS = json.loads(Path(__file__).with_name("thresholds.json").read_text())
+
+
+def _import_times(module: str) -> dict:
+    """Cumulative import time (seconds) per top-level package, via `python -X importtime`."""
+    # dagster is imported first so its own (unavoidable) cost is not attributed to us.
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import dagster; import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parents[2] / "src")},
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative.isdigit():
+            times[name] = int(cumulative) / 1e6
+    return times
+
+
+MODULE = "alpes_water_monitor.dagster_app.definitions"
+
+
+def test_definitions_import_is_lazy():
+    times = _import_times(MODULE)
+
+    loaded_heavy = {name for name in times if name.split(".")[0] in HEAVY_MODULES}
+    assert not loaded_heavy, f"heavy modules imported at definitions load: {sorted(loaded_heavy)}"
+
+
+@pytest.mark.benchmark
+def test_definitions_import_time():
+    times = _import_times(MODULE)
+    limit = THRESHOLDS["test_import_time"]["definitions"]["max_cumulative_s"]
+    assert times[MODULE] <= limit, f"{MODULE} import took {times[MODULE]:.3f}s > {limit}s"
@@ -0,0 +1,94 @@
+import datetime as dt
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+from alpes_water_monitor.services.field_metrics import (
+    MetricsConfig,
+    compute_deltas,
+    compute_field_metrics_from_ndwi,
+)
+from alpes_water_monitor.utils.cdse_client import CDSEClient, CDSECredentials, fetch_ndwi
+from alpes_water_monitor.utils.storage import load_ndwi_from_path, write_df_to_minio_csv
+
+from synthetic import BBOX, synthetic_ndwi, synthetic_field_config
+
+pytestmark = pytest.mark.benchmark
+
+DAY = dt.date(2024, 5, 1)
+
+
+def _metrics_frame(n_fields: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "date": DAY.isoformat(),
+            "field_id": [f"f{i}" for i in range(n_fields)],
+            "field_name": [f"Field {i}" for i in range(n_fields)],
+            "mean_ndwi": rng.uniform(-1, 1, n_fields),
+            "water_fraction_pos": rng.uniform(0, 1, n_fields),
+            "water_fraction_strong": rng.uniform(0, 1, n_fields),
+        }
+    )
+
+
+def test_bench_fetch(run_benchmark, stub_process_api, tmp_path, n_pixels):
+    client = CDSEClient(CDSECredentials("stub", "stub"))
+    time_range = ("2024-04-26T00:00:00Z", "2024-05-06T23:59:59Z")
+
+    run_benchmark(
+        fetch_ndwi,
+        client,
+        bbox=BBOX,
+        time_range=time_range,
+        size=(n_pixels, n_pixels),
+        out_dir=str(tmp_path),
+        items=n_pixels * n_pixels,
+    )
+
+
+def test_bench_decode(run_benchmark, tmp_path, n_pixels):
+    raw = ((synthetic_ndwi(n_pixels) + 1.0) / 2.0 * 255).astype(np.uint8)
+    path = tmp_path / "ndwi.png"
+    Image.fromarray(raw).save(path)
+
+    ndwi = run_benchmark(
+        load_ndwi_from_path, None, str(path), items=n_pixels * n_pixels, nbytes=path.stat().st_size
+    )
+    assert ndwi.shape == (n_pixels, n_pixels)
+
+
+def test_bench_metrics(run_benchmark, n_fields, n_pixels):
+    ndwi = synthetic_ndwi(n_pixels)
+    cfg = synthetic_field_config(n_fields)
+
+    results = run_benchmark(
+        compute_field_metrics_from_ndwi, ndwi, cfg, DAY, MetricsConfig(), items=n_fields
+    )
+    assert len(results) == n_fields
+
+
+def test_bench_delta(run_benchmark, n_fields):
+    today, yest = _metrics_frame(n_fields, 1), _metrics_frame(n_fields, 2)
+
+    merged = run_benchmark(compute_deltas, today, yest, items=n_fields)
+    assert len(merged) == n_fields
+
+
+def test_bench_upload(run_benchmark, fake_minio, log_context, n_fields):
+    df = _metrics_frame(n_fields, 3)
+    buf = io.StringIO()
+    df.to_csv(buf, index=False)
+
+    uri = run_benchmark(
+        write_df_to_minio_csv,
+        log_context,
+        df,
+        f"field_ndwi_daily/date={DAY.isoformat()}/metrics.csv",
+        items=n_fields,
+        nbytes=len(buf.getvalue()),
+    )
+    assert uri.startswith("s3://")
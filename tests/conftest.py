@@ -0,0 +1,277 @@
+import hashlib
+import io
+import json
+import logging
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from minio.error import S3Error
+from PIL import Image
+
+from alpes_water_monitor.utils import cdse_client, storage
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: timing/memory benchmark with absolute thresholds; run with -m benchmark"
+    )
+
+
+def _selects_benchmarks(markexpr: str) -> bool:
+    """True if `-m markexpr` asks for benchmarks: it matches the `benchmark` marker alone but not no marker."""
+    from _pytest.mark.expression import Expression
+
+    if not markexpr:
+        return False
+    expression = Expression.compile(markexpr)
+    return expression.evaluate(lambda name, **_: name == "benchmark") and not expression.evaluate(
+        lambda name, **_: False
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    # Wall-time thresholds depend on the machine: keep them out of every run that does
+    # not ask for them (`-m benchmark`), including other -m filters such as "not slow".
+    if _selects_benchmarks(config.getoption("markexpr")):
+        return
+    deselected = [item for item in items if item.get_closest_marker("benchmark")]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = [item for item in items if not item.get_closest_marker("benchmark")]
+
+
+class _FakeResponse(io.BytesIO):
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    """In-process stand-in for the subset of `minio.Minio` used by the pipeline."""
+
+    def __init__(self):
+        self.buckets = set()
+        self.objects = {}
+        self.content_types = {}
+
+    def _missing(self, bucket_name, object_name):
+        return S3Error(
+            response=None,
+            code="NoSuchKey",
+            message="Object does not exist",
+            resource=f"/{bucket_name}/{object_name}",
+            request_id="",
+            host_id="",
+            bucket_name=bucket_name,
+            object_name=object_name,
+        )
+
+    def _get(self, bucket_name, object_name):
+        try:
+            return self.objects[(bucket_name, object_name)]
+        except KeyError:
+            raise self._missing(bucket_name, object_name) from None
+
+    def bucket_exists(self, bucket_name):
+        return bucket_name in self.buckets
+
+    def make_bucket(self, bucket_name):
+        self.buckets.add(bucket_name)
+
+    def put_object(self, bucket_name, object_name, data, length, content_type="application/octet-stream", **_):
+        payload = data.read(length) if length >= 0 else data.read()
+        self.buckets.add(bucket_name)
+        self.objects[(bucket_name, object_name)] = payload
+        self.content_types[(bucket_name, object_name)] = content_type
+        return SimpleNamespace(bucket_name=bucket_name, object_name=object_name, etag=_etag(payload))
+
+    def fput_object(self, bucket_name, object_name, file_path, **kwargs):
+        data = Path(file_path).read_bytes()
+        return self.put_object(bucket_name, object_name, io.BytesIO(data), len(data), **kwargs)
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0, **_):
+        data = self._get(bucket_name, object_name)
+        end = offset + length if length else len(data)
+        return _FakeResponse(data[offset:end])
+
+    def fget_object(self, bucket_name, object_name, file_path, **_):
+        data = self._get(bucket_name, object_name)
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(file_path).write_bytes(data)
+
+    def stat_object(self, bucket_name, object_name, **_):
+        data = self._get(bucket_name, object_name)
+        return SimpleNamespace(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            size=len(data),
+            etag=_etag(data),
+            content_type=self.content_types.get((bucket_name, object_name)),
+        )
+
+    def list_objects(self, bucket_name, prefix=None, recursive=False, **_):
+        prefix = prefix or ""
+        seen = set()
+        for bucket, name in sorted(self.objects):
+            if bucket != bucket_name or not name.startswith(prefix):
+                continue
+            rest = name[len(prefix):]
+            if not recursive and "/" in rest:
+                sub = prefix + rest.split("/", 1)[0] + "/"
+                if sub not in seen:
+                    seen.add(sub)
+                    yield SimpleNamespace(object_name=sub, is_dir=True, size=0)
+                continue
+            data = self.objects[(bucket, name)]
+            yield SimpleNamespace(object_name=name, is_dir=False, size=len(data), etag=_etag(data))
+
+    def remove_object(self, bucket_name, object_name, **_):
+        self.objects.pop((bucket_name, object_name), None)
+        self.content_types.pop((bucket_name, object_name), None)
+
+
+def _etag(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+@pytest.fixture
+def fake_minio(monkeypatch):
+    client = FakeMinio()
+    monkeypatch.setenv("ALPES_MINIO_BUCKET", "alpes-water-monitor")
+    monkeypatch.setattr(storage, "get_minio_client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def log_context():
+    """Minimal stand-in for the Dagster context used by storage helpers."""
+    return SimpleNamespace(log=logging.getLogger("alpes-tests"))
+
+
+def synthetic_ndwi_png(width: int, height: int) -> bytes:
+    """NDWI-encoded PNG ((ndwi + 1) / 2 * 255) with a smooth 'lake' in the middle."""
+    yy, xx = np.mgrid[0:height, 0:width]
+    r2 = ((xx - width / 2) / (width / 2)) ** 2 + ((yy - height / 2) / (height / 2)) ** 2
+    raw = np.clip(255 * (1.0 - r2 / 2), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(raw).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def make_ndwi_png():
+    return synthetic_ndwi_png
+
+
+@pytest.fixture
+def fake_index_fetch(monkeypatch):
+    """
+    Replace the CDSE multi-index fetch used by raw_ndwi_daily. Each date returns the
+    64 px synthetic scene shifted by `scenes[date]` pixels (default 0), so equal
+    shifts mean an identical response. NDVI is the inverse of NDWI.
+    """
+    from alpes_water_monitor.utils import ndwi
+
+    scenes = {}
+
+    def _png(arr):
+        buf = io.BytesIO()
+        Image.fromarray(arr).save(buf, format="PNG")
+        return buf.getvalue()
+
+    def fetch(bbox, date, config):
+        shift = scenes.get(date.isoformat(), 0)
+        raw = np.roll(np.array(Image.open(io.BytesIO(synthetic_ndwi_png(64, 64)))), shift, axis=1)
+        parts = {"ndwi": _png(raw), "mndwi": _png(raw), "ndvi": _png(255 - raw)}
+        return {name: parts[name] for name in config.indices}, [f"S2_{shift}"]
+
+    monkeypatch.setattr(ndwi, "fetch_index_parts_for_bbox", fetch)
+    return scenes
+
+
+class _StubProcessAPIHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = self.rfile.read(length)
+        self.server.requests.append((self.path, payload))
+
+        if self.path == "/token":
+            self._send(200, json.dumps({"access_token": "stub-token"}).encode(), "application/json")
+        elif self.path == "/process" and self.server.rate_limited > 0:
+            self.server.rate_limited -= 1
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/process":
+            body = json.loads(payload)
+            out = body["output"]
+            identifiers = [r["identifier"] for r in out["responses"]]
+            if len(identifiers) == 1:
+                self._send(200, synthetic_ndwi_png(out["width"], out["height"]), "image/png")
+            else:
+                self._send(200, _stub_tar(identifiers, out["width"], out["height"]), "application/x-tar")
+        elif self.path == "/catalog":
+            body = json.loads(payload)
+            start = body.get("next", 0)
+            page = self.server.catalog_features[start : start + body["limit"]]
+            context = {"next": start + len(page)} if start + len(page) < len(self.server.catalog_features) else {}
+            self._send(200, json.dumps({"features": page, "context": context}).encode(), "application/json")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+
+def _stub_tar(identifiers, width, height) -> bytes:
+    """Multi-response payload: one PNG per identifier; the quicklook is RGB."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as tar:
+        for identifier in identifiers:
+            png = synthetic_ndwi_png(width, height)
+            if identifier == cdse_client.TRUE_COLOR_ID:
+                rgb = Image.open(io.BytesIO(png)).convert("RGB")
+                out = io.BytesIO()
+                rgb.save(out, format="PNG")
+                png = out.getvalue()
+            info = tarfile.TarInfo(f"{identifier}.png")
+            info.size = len(png)
+            tar.addfile(info, io.BytesIO(png))
+    return buf.getvalue()
+
+
+@pytest.fixture
+def stub_process_api(monkeypatch, tmp_path):
+    """Local HTTP stand-in for the CDSE token endpoint, Process API and catalog search."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubProcessAPIHandler)
+    server.requests = []
+    server.catalog_features = []
+    # Number of upcoming /process calls to answer with 429 (Retry-After: 0).
+    server.rate_limited = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(cdse_client, "TOKEN_URL", f"{base}/token")
+    monkeypatch.setattr(cdse_client, "PROCESS_URL", f"{base}/process")
+    monkeypatch.setattr(cdse_client, "CATALOG_URL", f"{base}/catalog")
+    monkeypatch.setenv("CDSE_CLIENT_ID", "stub")
+    monkeypatch.setenv("ALPES_QUOTA_DB_URL", f"sqlite:///{tmp_path / 'cdse_quota.db'}")
+    monkeypatch.setenv("CDSE_CLIENT_SECRET", "stub")
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
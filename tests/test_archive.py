@@ -0,0 +1,194 @@
+import datetime as dt
+import io
+import json
+
+import numpy as np
+import pandas as pd
+from dagster import materialize
+from PIL import Image
+
+from alpes_water_monitor.config.fields import default_st_cassien_config
+from alpes_water_monitor.dagster_app import assets
+from alpes_water_monitor.dagster_app.io_manager import minio_arrow_io_manager
+from alpes_water_monitor.services.archive import (
+    ArchiveReader,
+    RetentionConfig,
+    index_object_name,
+    maintain_raw_archive,
+)
+from alpes_water_monitor.services.reprocess import ReprocessConfig, reprocess_field_metrics
+from alpes_water_monitor.utils.fingerprint import lookup_fingerprint, record_fingerprint
+from alpes_water_monitor.utils.storage import put_bytes_to_minio
+
+BUCKET = "alpes-water-monitor"
+KEEP = RetentionConfig(downsample_after_days=None, delete_after_days=None, delete_decoded_after_days=None)
+
+
+def _png(value: int, size: int = 16) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray((np.arange(size * size) // 2 + value).astype(np.uint8).reshape(size, size)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _put_days(*days):
+    for day in days:
+        put_bytes_to_minio(_png(day.day), f"raw_ndwi/date={day}/ndwi.png", "image/png")
+        put_bytes_to_minio(b"tif", f"raw_ndwi/date={day}/ndwi.tif", "image/tiff")
+
+
+def test_compaction_packs_closed_months_and_range_reads(fake_minio):
+    days = [dt.date(2024, 4, 30), dt.date(2024, 5, 1), dt.date(2024, 5, 31), dt.date(2024, 6, 1)]
+    _put_days(*days)
+    put_bytes_to_minio(b'{"source_partition": "2024-05-01"}', "raw_ndwi/date=2024-05-02/carried_forward.json")
+
+    report = maintain_raw_archive(today=dt.date(2024, 6, 5), retention=KEEP)
+
+    assert report.compacted == ["2024-04", "2024-05"]
+    names = {name for bucket, name in fake_minio.objects}
+    # Current month and COGs stay loose; packed PNGs are gone.
+    assert "raw_ndwi/date=2024-06-01/ndwi.png" in names
+    assert "raw_ndwi/date=2024-05-01/ndwi.tif" in names
+    assert "raw_ndwi/date=2024-05-01/ndwi.png" not in names
+
+    index = json.loads(fake_minio.objects[(BUCKET, index_object_name("2024-05"))])
+    assert set(index["entries"]) == {
+        "raw_ndwi/date=2024-05-01/ndwi.png",
+        "raw_ndwi/date=2024-05-02/carried_forward.json",
+        "raw_ndwi/date=2024-05-31/ndwi.png",
+    }
+    reader = ArchiveReader()
+    assert reader.read("raw_ndwi/date=2024-05-31/ndwi.png") == _png(31)
+    assert "raw_ndwi/date=2024-04-30/ndwi.png" in reader.list("raw_ndwi/date=2024-04")
+
+    # A late re-run lands loose again and is merged into the existing pack.
+    put_bytes_to_minio(_png(99), "raw_ndwi/date=2024-05-01/ndwi.png", "image/png")
+    assert maintain_raw_archive(today=dt.date(2024, 6, 6), retention=KEEP).compacted == ["2024-05"]
+    assert ArchiveReader().read("raw_ndwi/date=2024-05-01/ndwi.png") == _png(99)
+    assert ArchiveReader().read("raw_ndwi/date=2024-05-31/ndwi.png") == _png(31)
+    packs = [n for _, n in fake_minio.objects if n.startswith("raw_ndwi_archive/month=2024-05/") and n.endswith(".pack")]
+    assert len(packs) == 1
+
+
+def test_compaction_keeps_objects_rewritten_while_packing(fake_minio, monkeypatch):
+    from alpes_water_monitor.services import archive
+
+    _put_days(dt.date(2024, 5, 1), dt.date(2024, 5, 2))
+    name = "raw_ndwi/date=2024-05-02/ndwi.png"
+    read = archive.get_bytes_from_minio
+
+    def read_then_rerun(object_name):
+        data = read(object_name)
+        if object_name == name:
+            # The partition is re-run between the read and the delete.
+            put_bytes_to_minio(_png(77), name, "image/png")
+        return data
+
+    monkeypatch.setattr(archive, "get_bytes_from_minio", read_then_rerun)
+    assert maintain_raw_archive(today=dt.date(2024, 6, 5), retention=KEEP).compacted == ["2024-05"]
+    names = {n for _, n in fake_minio.objects}
+    assert "raw_ndwi/date=2024-05-01/ndwi.png" not in names
+    assert fake_minio.objects[(BUCKET, name)] == _png(77)
+
+    monkeypatch.setattr(archive, "get_bytes_from_minio", read)
+    maintain_raw_archive(today=dt.date(2024, 6, 6), retention=KEEP)
+    assert (BUCKET, name) not in fake_minio.objects
+    assert ArchiveReader().read(name) == _png(77)
+
+
+def test_downsampling_is_opt_in(fake_minio, monkeypatch):
+    monkeypatch.delenv("ALPES_RAW_DOWNSAMPLE_AFTER_DAYS", raising=False)
+    assert RetentionConfig().downsample_after_days is None
+    assert RetentionConfig.from_env().downsample_after_days is None
+    monkeypatch.setenv("ALPES_RAW_DOWNSAMPLE_AFTER_DAYS", "365")
+    assert RetentionConfig.from_env().downsample_after_days == 365
+
+    _put_days(dt.date(2023, 1, 1))
+    report = maintain_raw_archive(today=dt.date(2024, 6, 5), retention=RetentionConfig(delete_decoded_after_days=None))
+    assert report.compacted == ["2023-01"] and report.downsampled == []
+
+
+def test_retention_downsamples_then_deletes(fake_minio):
+    _put_days(dt.date(2024, 4, 30), dt.date(2024, 5, 1))
+    maintain_raw_archive(today=dt.date(2024, 6, 5), retention=KEEP)
+
+    report = maintain_raw_archive(
+        today=dt.date(2024, 6, 5), retention=RetentionConfig(downsample_after_days=30, downsample_factor=4)
+    )
+    assert report.downsampled == ["2024-04"]
+    restored = ArchiveReader().read_array("raw_ndwi/date=2024-04-30/ndwi.png")
+    original = np.array(Image.open(io.BytesIO(_png(30))))
+    assert restored.shape == original.shape
+    assert np.abs(restored.astype(int) - original).max() <= 32  # 4x4 block means of a ramp
+
+    report = maintain_raw_archive(today=dt.date(2024, 6, 5), retention=RetentionConfig(delete_after_days=30))
+    assert report.deleted == ["2024-04"]
+    assert not [n for _, n in fake_minio.objects if "2024-04" in n]
+
+
+def test_retention_drops_decoded_values_and_their_fingerprints(fake_minio):
+    _put_days(dt.date(2024, 4, 30), dt.date(2024, 5, 1))
+    for day in ("2024-04-30", "2024-05-01"):
+        put_bytes_to_minio(b"npz", f"io/raw_ndwi_daily/date={day}/value", "application/x-npz")
+        record_fingerprint(f"fp-{day}", day)
+
+    report = maintain_raw_archive(
+        today=dt.date(2024, 6, 5), retention=RetentionConfig(downsample_after_days=None, delete_decoded_after_days=30)
+    )
+
+    assert report.decoded_deleted == ["2024-04"] and report.fingerprints_removed == 1
+    names = {name for _, name in fake_minio.objects}
+    assert "io/raw_ndwi_daily/date=2024-04-30/value" not in names
+    assert "io/raw_ndwi_daily/date=2024-05-01/value" in names
+    # A new partition with the same scene is no longer carried forward from April...
+    assert lookup_fingerprint("fp-2024-04-30") is None
+    assert lookup_fingerprint("fp-2024-05-01")["partition"] == "2024-05-01"
+    # ...while the archived PNGs stay for reprocessing.
+    assert ArchiveReader().read("raw_ndwi/date=2024-04-30/ndwi.png") == _png(30)
+
+
+def test_reprocess_reads_packed_months(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    fake_index_fetch["2024-05-03"] = 9
+    for day in ("2024-05-01", "2024-05-02", "2024-05-03"):
+        result = materialize(
+            [assets.raw_ndwi_daily], partition_key=day, resources={"io_manager": minio_arrow_io_manager}
+        )
+        assert result.success
+
+    config = ReprocessConfig(workers=2)
+    before = reprocess_field_metrics(default_st_cassien_config(), config=config)
+    assert maintain_raw_archive(today=dt.date(2024, 6, 1), retention=KEEP).compacted == ["2024-05"]
+    after = reprocess_field_metrics(default_st_cassien_config(), config=config)
+
+    pd.testing.assert_frame_equal(before, after)
+    assert set(after["date"]) == {"2024-05-01", "2024-05-02", "2024-05-03"}
+
+
+def test_reprocess_skips_downsampled_dates_unless_included(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    fake_index_fetch["2024-05-01"] = 9  # a new scene, not carried forward from April
+    for day in ("2024-04-30", "2024-05-01"):
+        result = materialize(
+            [assets.raw_ndwi_daily], partition_key=day, resources={"io_manager": minio_arrow_io_manager}
+        )
+        assert result.success
+    maintain_raw_archive(today=dt.date(2024, 5, 15), retention=KEEP)
+    assert maintain_raw_archive(
+        today=dt.date(2024, 5, 15), retention=RetentionConfig(downsample_after_days=10, downsample_factor=4)
+    ).downsampled == ["2024-04"]
+
+    full = reprocess_field_metrics(default_st_cassien_config(), config=ReprocessConfig(workers=2))
+    assert set(full["date"]) == {"2024-05-01"} and "raster_scale" not in full.columns
+
+    both = reprocess_field_metrics(
+        default_st_cassien_config(), config=ReprocessConfig(workers=2, include_downsampled=True)
+    )
+    assert both.groupby("date")["raster_scale"].first().to_dict() == {"2024-04-30": 4, "2024-05-01": 1}
+
+    # A late full-resolution re-run of a down-sampled date is read as such.
+    reader = ArchiveReader()
+    packed = reader.read_array("raw_ndwi/date=2024-04-30/ndwi.png")
+    put_bytes_to_minio(_png(7, size=packed.shape[0]), "raw_ndwi/date=2024-04-30/ndwi.png", "image/png")
+    assert reader.scale("raw_ndwi/date=2024-04-30/ndwi.png") == 1
+    expected = np.array(Image.open(io.BytesIO(_png(7, size=packed.shape[0]))))
+    np.testing.assert_array_equal(reader.read_array("raw_ndwi/date=2024-04-30/ndwi.png"), expected)
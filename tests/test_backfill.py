@@ -0,0 +1,79 @@
+import datetime as dt
+import io
+
+import pandas as pd
+import pytest
+
+from alpes_water_monitor.cli import main
+from alpes_water_monitor.config.fields import default_st_cassien_config, resolve_location_config
+from alpes_water_monitor.services.backfill import BackfillConfig, BackfillProgress, metrics_path, run_backfill
+from alpes_water_monitor.services.field_metrics import run_daily_ndwi_for_fields
+from alpes_water_monitor.utils import ndwi
+
+START, END = dt.date(2024, 5, 1), dt.date(2024, 5, 3)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_backfill_writes_parquet_per_date(fake_index_fetch, tmp_path, workers):
+    fake_index_fetch["2024-05-02"] = 7
+    stream = io.StringIO()
+    config = BackfillConfig(START, END, out_dir=tmp_path, fetch_workers=2, workers=workers)
+
+    result = run_backfill(default_st_cassien_config(), config, BackfillProgress(3, stream))
+
+    assert sorted(result.written) == [START, START + dt.timedelta(days=1), END] and not result.failed
+    df = pd.read_parquet(metrics_path(tmp_path, END))
+    assert set(df["date"]) == {END.isoformat()}
+    assert {"mean_ndwi", "water_fraction_pos", "mean_mndwi", "mean_ndvi"} <= set(df.columns)
+    shifted = pd.read_parquet(metrics_path(tmp_path, START + dt.timedelta(days=1)))
+    assert not shifted["mean_ndwi"].equals(df["mean_ndwi"])
+
+    lines = stream.getvalue().splitlines()
+    assert lines[-1].startswith("[3/3]") and "dates/s" in lines[-1] and "ETA" in lines[-1]
+
+
+def test_backfill_skips_existing_and_reports_failures(fake_index_fetch, monkeypatch, tmp_path):
+    config = BackfillConfig(START, START, out_dir=tmp_path, workers=1)
+    run_backfill(default_st_cassien_config(), config, BackfillProgress(1, io.StringIO()))
+
+    fetch = ndwi.fetch_index_parts_for_bbox
+
+    def flaky(bbox, date, cfg):
+        if date == END:
+            raise RuntimeError("no scene")
+        return fetch(bbox, date, cfg)
+
+    monkeypatch.setattr(ndwi, "fetch_index_parts_for_bbox", flaky)
+    config = BackfillConfig(START, END, out_dir=tmp_path, workers=1)
+    result = run_backfill(default_st_cassien_config(), config, BackfillProgress(2, io.StringIO()))
+
+    assert result.skipped == [START]
+    assert list(result.written) == [START + dt.timedelta(days=1)]
+    assert "no scene" in result.failed[END]
+
+
+def test_cli_backfill(fake_index_fetch, tmp_path, capsys):
+    location = default_st_cassien_config().location_id
+    code = main(
+        ["backfill", "--from", "2024-05-01", "--to", "2024-05-02", "--location", location,
+         "--workers", "1", "--out", str(tmp_path)]
+    )
+    assert code == 0
+    assert metrics_path(tmp_path, dt.date(2024, 5, 2)).exists()
+    assert "2 written" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        main(["backfill", "--from", "2024-05-02", "--to", "2024-05-01"])
+    with pytest.raises(ValueError, match="Unknown location"):
+        resolve_location_config("nowhere")
+
+
+def test_run_daily_ndwi_for_fields_local(stub_process_api, tmp_path):
+    from alpes_water_monitor.utils.ndwi import NDWIConfig
+
+    rows = run_daily_ndwi_for_fields(
+        dt.date(2024, 5, 1),
+        default_st_cassien_config(),
+        ndwi_cfg=NDWIConfig(width=32, height=32, out_dir=tmp_path),
+    )
+    assert rows and {"field_id", "mean_ndwi"} <= set(rows[0])
@@ -0,0 +1,70 @@
+import datetime as dt
+import json
+
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+from alpes_water_monitor.services.field_metrics import (
+    MetricsConfig,
+    compute_field_metrics_from_indices,
+    compute_field_metrics_from_ndwi,
+)
+from alpes_water_monitor.utils.cdse_client import (
+    CDSEClient,
+    CDSECredentials,
+    build_multi_index_evalscript,
+    fetch_multi_index,
+)
+from alpes_water_monitor.utils.models import Field, FieldConfig
+
+BBOX = (6.0, 43.0, 6.1, 43.1)
+
+
+def test_multi_index_evalscript_declares_one_output_per_part():
+    script = build_multi_index_evalscript(["ndwi", "mndwi"], true_color=True)
+    assert 'id: "ndwi"' in script and 'id: "mndwi"' in script and 'id: "true_color"' in script
+    assert '"B11"' in script
+
+    with pytest.raises(ValueError):
+        build_multi_index_evalscript(["evi"])
+
+
+def test_fetch_multi_index_single_call(stub_process_api, tmp_path):
+    client = CDSEClient(CDSECredentials("stub", "stub"))
+    paths, scene = fetch_multi_index(
+        client,
+        bbox=BBOX,
+        time_range=("2024-04-26T00:00:00Z", "2024-05-06T23:59:59Z"),
+        size=(32, 24),
+        out_dir=str(tmp_path),
+    )
+
+    process_calls = [body for path, body in stub_process_api.requests if path == "/process"]
+    assert len(process_calls) == 1
+    responses = json.loads(process_calls[0])["output"]["responses"]
+    assert [r["identifier"] for r in responses] == ["ndwi", "mndwi", "ndvi", "true_color"]
+
+    assert set(paths) == {"ndwi", "mndwi", "ndvi", "true_color"}
+    assert all(p.exists() for p in paths.values())
+    assert set(scene.indices) == {"ndwi", "mndwi", "ndvi"}
+    assert scene.shape == (24, 32)
+    assert scene.ndwi.dtype == np.float32
+    assert -1.0 <= scene.ndwi.min() and scene.ndwi.max() <= 1.0
+
+
+def test_metrics_from_indices_adds_mean_per_index():
+    ndwi = np.linspace(-1, 1, 16 * 16, dtype=np.float32).reshape(16, 16)
+    cfg = FieldConfig(
+        location_id="loc",
+        location_name="Loc",
+        bbox=(0.0, 0.0, 1.0, 1.0),
+        fields=[Field("a", "A", box(0.1, 0.1, 0.6, 0.9), dt.date(2024, 1, 1))],
+    )
+    day = dt.date(2024, 5, 1)
+
+    (row,) = compute_field_metrics_from_indices({"ndwi": ndwi, "ndvi": -ndwi}, cfg, day)
+    (ndwi_only,) = compute_field_metrics_from_ndwi(ndwi, cfg, day, MetricsConfig())
+
+    assert row["mean_ndvi"] == pytest.approx(-row["mean_ndwi"], abs=1e-6)
+    assert {k: row[k] for k in ndwi_only} == ndwi_only
@@ -0,0 +1,46 @@
+import numpy as np
+import rasterio
+import pytest
+
+from alpes_water_monitor.utils.cog import COGConfig, read_ndwi_cog, write_ndwi_cog
+
+
+BBOX = (6.80, 43.585, 6.82, 43.60)
+
+
+def _raw(height=1024, width=1024):
+    rows = np.arange(height, dtype=np.uint16)[:, None]
+    cols = np.arange(width, dtype=np.uint16)[None, :]
+    return ((rows + cols) % 256).astype(np.uint8)
+
+
+def test_write_ndwi_cog_layout(tmp_path):
+    path = write_ndwi_cog(_raw(), BBOX, tmp_path / "ndwi.tif", COGConfig(blocksize=256))
+
+    with rasterio.open(path) as src:
+        assert src.crs.to_epsg() == 4326
+        assert src.bounds.left == pytest.approx(BBOX[0])
+        assert src.bounds.top == pytest.approx(BBOX[3])
+        assert src.block_shapes[0] == (256, 256)
+        assert src.overviews(1) == [2, 4]
+        assert src.compression is not None
+        assert src.scales[0] == pytest.approx(2.0 / 255.0)
+
+
+def test_read_ndwi_cog_window_and_overview(tmp_path):
+    raw = _raw()
+    path = write_ndwi_cog(raw, BBOX, tmp_path / "ndwi.tif")
+
+    full = read_ndwi_cog(str(path))
+    assert full.dtype == np.float32
+    np.testing.assert_allclose(full, raw.astype(np.float32) * 2.0 / 255.0 - 1.0, atol=1e-6)
+
+    # Upper-left quarter of the bbox -> upper-left 512x512 block of pixels.
+    minx, miny, maxx, maxy = BBOX
+    window_bbox = (minx, (miny + maxy) / 2, (minx + maxx) / 2, maxy)
+    part = read_ndwi_cog(str(path), bbox=window_bbox)
+    assert part.shape == (512, 512)
+    np.testing.assert_allclose(part, full[:512, :512])
+
+    overview = read_ndwi_cog(str(path), overview_level=1)
+    assert overview.shape == (256, 256)
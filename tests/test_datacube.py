@@ -0,0 +1,65 @@
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import zarr
+
+from alpes_water_monitor.utils.cdse_client import index_from_uint8
+from alpes_water_monitor.utils.datacube import DatacubeConfig, append_ndwi_to_cube, open_ndwi_cube
+
+
+BBOX = (6.80, 43.585, 6.82, 43.60)
+
+
+def _ndwi(code: int, shape=(8, 8)) -> np.ndarray:
+    # Rasters decoded from the raw uint8 PNGs, as the asset passes them.
+    return index_from_uint8(np.full(shape, code, dtype=np.uint8))
+
+
+def test_append_and_query_cube(tmp_path):
+    uri = str(tmp_path / "ndwi.zarr")
+    cfg = DatacubeConfig(start_date=dt.date(2024, 4, 1), chunk_yx=4, days=12)
+
+    day1, day2, day9 = dt.date(2024, 4, 1), dt.date(2024, 4, 2), dt.date(2024, 4, 9)
+    append_ndwi_to_cube(uri, _ndwi(140), day2, BBOX, cfg)
+    append_ndwi_to_cube(uri, _ndwi(64), day1, BBOX, cfg)
+
+    chunk_files = {p: p.read_bytes() for p in (tmp_path / "ndwi.zarr" / "ndwi").rglob("c/*/*/*")}
+    assert chunk_files
+
+    # Later days never rewrite earlier chunks.
+    idx = append_ndwi_to_cube(uri, _ndwi(217), day9, BBOX, cfg)
+    assert idx == 8
+    assert all(p.read_bytes() == data for p, data in chunk_files.items())
+    with pytest.raises(ValueError, match="time extent"):
+        append_ndwi_to_cube(uri, _ndwi(217), dt.date(2024, 4, 13), BBOX, cfg)
+
+    assert zarr.open_group(uri, mode="r")["ndwi"].dtype == np.uint8
+    cube = open_ndwi_cube(uri)
+    assert cube.shape == (12, 8, 8)
+    assert cube.dates() == [day1, day2, day9]
+    np.testing.assert_array_equal(cube.time_slice(day2), _ndwi(140))  # lossless
+    assert cube.time_slice(day1, rows=slice(0, 2), cols=slice(0, 3)).shape == (2, 3)
+    assert np.isnan(cube.time_slice(dt.date(2024, 4, 5))).all()
+
+    series = cube.pixel_series(3, 5)
+    assert list(series.index) == [day1, day2, day9]
+    np.testing.assert_allclose(series.to_numpy(), [_ndwi(c)[0, 0] for c in (64, 140, 217)])
+
+    assert list(cube.pixel_series(3, 5, start=day2, end=day2).index) == [day2]
+
+
+def test_concurrent_first_appends_keep_every_day(tmp_path):
+    uri = str(tmp_path / "ndwi.zarr")
+    cfg = DatacubeConfig(start_date=dt.date(2024, 4, 1), chunk_yx=4, days=40)
+    days = [dt.date(2024, 4, 1) + dt.timedelta(days=i) for i in range(0, 40, 3)]
+
+    # Every writer may find the cube missing and create it.
+    with ThreadPoolExecutor(max_workers=len(days)) as pool:
+        list(pool.map(lambda i: append_ndwi_to_cube(uri, _ndwi(10 + i), days[i], BBOX, cfg), range(len(days))))
+
+    cube = open_ndwi_cube(uri)
+    assert cube.dates() == days
+    for i, day in enumerate(days):
+        np.testing.assert_array_equal(cube.time_slice(day), _ndwi(10 + i))
@@ -6,3 +6,9 @@ def test_definitions_load():
     graph = defs.resolve_asset_graph()
     asset_keys = {ak.to_user_string() for ak in graph.get_all_asset_keys()}
     assert asset_keys, "No assets found in Dagster definitions"
+
+
+def test_only_asset_handoff_jobs_run_in_process():
+    assert defs.resolve_job_def("daily_ndwi_job").executor_def.name == "in_process"
+    assert defs.resolve_job_def("field_metrics_downstream_job").executor_def.name == "in_process"
+    assert defs.resolve_job_def("raw_archive_maintenance_job").executor_def.name != "in_process"
@@ -0,0 +1,55 @@
+import datetime as dt
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alpes_water_monitor.config.fields import (
+    DEFAULT_FIELDS_PATH,
+    load_field_config,
+    load_field_config_cached,
+    warm_field_config_cache,
+)
+from alpes_water_monitor.services.field_metrics import summarize_today_and_delta
+
+
+def test_field_config_cache_roundtrip(tmp_path, monkeypatch):
+    geojson = tmp_path / "fields.geojson"
+    geojson.write_text(DEFAULT_FIELDS_PATH.read_text())
+    monkeypatch.setenv("ALPES_FIELDS_CACHE_DIR", str(tmp_path / "cache"))
+
+    cache_path = warm_field_config_cache(geojson)
+    assert cache_path.exists()
+
+    cached = load_field_config_cached(geojson)
+    assert [f.id for f in cached.fields] == [f.id for f in load_field_config(geojson).fields]
+
+    # Editing the GeoJSON invalidates the pickle.
+    geojson.write_text(geojson.read_text().replace("Lac de Saint-Cassien", "Renamed"))
+    assert load_field_config_cached(geojson).location_name == "Renamed"
+
+
+def test_hypsometry_from_geojson_gives_summary_volume(tmp_path):
+    gj = json.loads(DEFAULT_FIELDS_PATH.read_text())
+    gj["properties"]["hypsometry"] = {"area_ha": [0, 100, 400], "volume_hm3": [0, 5, 60]}
+    gj["features"][0]["properties"]["hypsometry"] = {"area_ha": [0, 50], "volume_hm3": [0, 2]}
+    geojson = tmp_path / "fields.geojson"
+    geojson.write_text(json.dumps(gj))
+
+    cfg = load_field_config(geojson)
+    assert cfg.fields[0].hypsometry.volume(25) == pytest.approx(1.0)
+    assert cfg.fields[1].hypsometry is None
+    np.testing.assert_allclose(cfg.hypsometry.volume(np.array([50, 250, 900])), [2.5, 32.5, 60.0])
+
+    today = pd.DataFrame(
+        {"mean_ndwi": [0.1, 0.2], "field_area_ha": [120.0, 200.0], "water_area_ha": [80.0, 170.0]}
+    )
+    (summary,) = summarize_today_and_delta(today, pd.DataFrame(), dt.date(2024, 5, 1), cfg)
+    assert summary["total_water_area_ha"] == pytest.approx(250.0)
+    assert summary["water_volume_hm3"] == pytest.approx(32.5)
+
+    gj["properties"]["hypsometry"] = {"area_ha": [100, 50], "volume_hm3": [1, 2]}
+    geojson.write_text(json.dumps(gj))
+    with pytest.raises(ValueError, match="increasing"):
+        load_field_config(geojson)
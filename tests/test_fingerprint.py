@@ -0,0 +1,172 @@
+import datetime as dt
+
+import numpy as np
+from dagster import materialize
+
+from alpes_water_monitor.dagster_app import assets
+from alpes_water_monitor.dagster_app.io_manager import minio_arrow_io_manager
+from alpes_water_monitor.utils.datacube import open_ndwi_cube
+from alpes_water_monitor.utils.fingerprint import lookup_fingerprint, partition_record, scene_fingerprint
+
+BUCKET = "alpes-water-monitor"
+
+
+def test_scene_fingerprint_covers_content_only():
+    parts = {"ndwi": b"a", "ndvi": b"b"}
+    fp = scene_fingerprint(parts)
+
+    assert fp == scene_fingerprint(dict(reversed(parts.items())))
+    assert fp != scene_fingerprint({"ndwi": b"a", "ndvi": b"c"})
+    assert fp != scene_fingerprint({"ndwi": b"a"})
+
+
+def _run(day: str, *extra):
+    result = materialize(
+        [assets.raw_ndwi_daily, assets.field_ndwi_daily, assets.ndwi_datacube, *extra],
+        partition_key=day,
+        resources={"io_manager": minio_arrow_io_manager},
+    )
+    assert result.success
+    return result
+
+
+def _metadata(result, node: str = "raw_ndwi_daily"):
+    (mat,) = [m for m in result.asset_materializations_for_node(node)]
+    return {k: v.value for k, v in mat.metadata.items()}
+
+
+def test_unchanged_scene_is_carried_forward(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.setenv("ALPES_DATACUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.chdir(tmp_path)
+    fake_index_fetch["2024-05-03"] = 7
+
+    first = _run("2024-05-01")
+    second = _run("2024-05-02")
+    third = _run("2024-05-03")
+
+    assert _metadata(first)["carried_forward"] is False
+    meta = _metadata(second)
+    assert meta["carried_forward"] is True
+    assert meta["carried_forward_from"] == "2024-05-01"
+    assert meta["minio_object"] == "raw_ndwi/date=2024-05-01/ndwi.png"
+    assert _metadata(third)["carried_forward"] is False
+
+    # Nothing re-uploaded or decoded for the carried-forward day, only a reference.
+    assert (BUCKET, "raw_ndwi/date=2024-05-02/ndwi.png") not in fake_minio.objects
+    assert (BUCKET, "raw_ndwi/date=2024-05-02/carried_forward.json") in fake_minio.objects
+    assert "timing.decode.load_png_array.wall_s" not in _metadata(second)
+
+    # Metrics are reused (same values, today's date) and the contract CSV is still written.
+    day1 = first.output_for_node("field_ndwi_daily")
+    day2 = second.output_for_node("field_ndwi_daily")
+    assert (day2["date"] == "2024-05-02").all()
+    np.testing.assert_allclose(day2["mean_ndwi"], day1["mean_ndwi"])
+    assert (BUCKET, "field_ndwi_daily/date=2024-05-02/metrics.csv") in fake_minio.objects
+
+    cube = open_ndwi_cube(str(tmp_path / "cube" / "datacube" / "ndwi_saint_cassien.zarr"))
+    assert cube.dates() == [dt.date(2024, 5, 1), dt.date(2024, 5, 3)]
+
+
+def test_carried_forward_recomputes_when_fields_change(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    from alpes_water_monitor.config.fields import default_st_cassien_config
+
+    monkeypatch.setenv("ALPES_DATACUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.chdir(tmp_path)
+    field = default_st_cassien_config().fields[0]
+    monkeypatch.setattr(field, "monitoring_start", dt.date(2024, 5, 2))
+
+    first = _run("2024-05-01")
+    second = _run("2024-05-02")
+
+    assert _metadata(second)["carried_forward"] is True
+    assert field.id not in set(first.output_for_node("field_ndwi_daily")["field_id"])
+    assert field.id in set(second.output_for_node("field_ndwi_daily")["field_id"])
+
+
+def test_shifted_acquisition_window_is_still_carried_forward(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    from alpes_water_monitor.utils import ndwi
+
+    monkeypatch.setenv("ALPES_DATACUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.chdir(tmp_path)
+    fetch = ndwi.fetch_index_parts_for_bbox
+
+    def shifting_window(bbox, date, config):
+        # The ±5-day window gains an acquisition that does not change the mosaic.
+        parts, ids = fetch(bbox, date, config)
+        return parts, ids + [f"S2_{date.isoformat()}"]
+
+    monkeypatch.setattr(ndwi, "fetch_index_parts_for_bbox", shifting_window)
+    _run("2024-05-01")
+    meta = _metadata(_run("2024-05-02"))
+
+    assert meta["carried_forward_from"] == "2024-05-01"
+    record = lookup_fingerprint(meta["fingerprint"])
+    assert record["partition"] == "2024-05-01" and "S2_2024-05-01" in record["acquisition_ids"]
+    assert partition_record("2024-05-02")["source"] == "2024-05-01"
+
+
+def test_rerun_with_new_content_drops_the_old_scene_record(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.setenv("ALPES_DATACUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.chdir(tmp_path)
+
+    old = _metadata(_run("2024-05-01"))["fingerprint"]
+    fake_index_fetch["2024-05-01"] = 5
+    new = _metadata(_run("2024-05-01"))["fingerprint"]
+
+    assert lookup_fingerprint(old) is None
+    assert lookup_fingerprint(new)["partition"] == "2024-05-01"
+    assert partition_record("2024-05-01")["fingerprint"] == new
+    # 05-02 has the old content, which 05-01 no longer holds: nothing to carry forward.
+    assert _metadata(_run("2024-05-02"))["carried_forward"] is False
+
+
+def test_carried_forward_partition_reuses_delta_and_summary(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    from alpes_water_monitor.services.field_metrics import carry_forward_summary
+
+    monkeypatch.setenv("ALPES_DATACUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.chdir(tmp_path)
+    downstream = (assets.field_ndwi_daily_delta, assets.st_cassien_daily_summary)
+
+    first = _run("2024-05-01", *downstream)
+    second = _run("2024-05-02", *downstream)
+
+    assert _metadata(second, "field_ndwi_daily_delta")["unchanged_scene"] is True
+    delta = second.output_for_node("field_ndwi_daily_delta")
+    assert len(delta) == len(first.output_for_node("field_ndwi_daily"))
+    assert (delta["delta_mean_ndwi"] == 0).all() and (delta["delta_water_fraction_pos"] == 0).all()
+
+    assert _metadata(second, "st_cassien_daily_summary")["carried_forward"] is True
+    summary = second.output_for_node("st_cassien_daily_summary").iloc[0]
+    previous = first.output_for_node("st_cassien_daily_summary")
+    assert summary["date"] == "2024-05-02" and summary["avg_delta_mean_ndwi"] == 0
+    assert summary["total_water_area_ha"] == previous.iloc[0]["total_water_area_ha"]
+
+    # A source summary that no longer matches the metrics (e.g. not yet rewritten
+    # after reprocessing) is not reused.
+    stale = previous.assign(total_water_area_ha=previous["total_water_area_ha"] + 1.0)
+    df_today = second.output_for_node("field_ndwi_daily")
+    assert carry_forward_summary(stale, df_today, delta, dt.date(2024, 5, 2)) is None
+
+
+def test_rerun_carried_forward_drops_the_stale_scene(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    from alpes_water_monitor.services.reprocess import ReprocessConfig, list_archived_scenes
+
+    monkeypatch.setenv("ALPES_DATACUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.chdir(tmp_path)
+    _run("2024-05-01")
+    fake_index_fetch["2024-05-02"] = 3
+    assert _metadata(_run("2024-05-02"))["carried_forward"] is False
+
+    # The provider now returns 05-01's mosaic for 05-02: re-run, carried forward.
+    fake_index_fetch["2024-05-02"] = 0
+    rerun = _run("2024-05-02")
+    assert _metadata(rerun)["carried_forward_from"] == "2024-05-01"
+
+    stored = {name for bucket, name in fake_minio.objects if name.startswith("raw_ndwi/date=2024-05-02/")}
+    assert stored == {"raw_ndwi/date=2024-05-02/carried_forward.json"}
+    scenes = list_archived_scenes(ReprocessConfig())
+    assert scenes[dt.date(2024, 5, 2)] == "raw_ndwi/date=2024-05-01/ndwi.png"
+
+    assert _metadata(rerun, "ndwi_datacube")["cleared_stale_slice"] is True
+    cube = open_ndwi_cube(str(tmp_path / "cube" / "datacube" / "ndwi_saint_cassien.zarr"))
+    assert cube.dates() == [dt.date(2024, 5, 1)]
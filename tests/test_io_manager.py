@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from dagster import materialize
+
+from alpes_water_monitor.dagster_app import assets
+from alpes_water_monitor.dagster_app.io_manager import _ObjectCache, deserialize, minio_arrow_io_manager, serialize
+from alpes_water_monitor.utils.models import SceneRasters
+
+
+def test_serialize_roundtrip():
+    df = pd.DataFrame({"field_id": ["a", "b"], "mean_ndwi": [0.1, -0.2]})
+    data, content_type = serialize(df)
+    pd.testing.assert_frame_equal(deserialize(data, content_type), df, check_dtype=False)
+
+    arr = np.arange(12, dtype=np.float32).reshape(3, 4)
+    data, content_type = serialize(arr)
+    loaded = deserialize(data, content_type)
+    np.testing.assert_array_equal(loaded, arr)
+    assert not loaded.flags.writeable  # viewed in place, not copied
+
+    scene = SceneRasters(indices={"ndwi": arr, "ndvi": -arr})
+    data, content_type = serialize(scene)
+    loaded = deserialize(data, content_type)
+    assert list(loaded.indices) == ["ndwi", "ndvi"]
+    np.testing.assert_array_equal(loaded.indices["ndvi"], -arr)
+
+    data, content_type = serialize("s3://bucket/key")
+    assert deserialize(data, content_type) == "s3://bucket/key"
+
+
+ALL_ASSETS = [
+    assets.raw_ndwi_daily,
+    assets.field_ndwi_daily,
+    assets.ndwi_datacube,
+    assets.field_ndwi_daily_delta,
+    assets.st_cassien_daily_summary,
+]
+
+
+def materialize_day(day: str):
+    result = materialize(ALL_ASSETS, partition_key=day, resources={"io_manager": minio_arrow_io_manager})
+    assert result.success
+    return result
+
+
+def test_object_cache_is_bounded_by_bytes():
+    cache = _ObjectCache(max_bytes=100)
+    cache.put("a", "e1", "A", 40)
+    cache.put("b", "e1", "B", 40)
+    assert cache.get("a", "e1") == "A"  # a is now the most recent
+    cache.put("c", "e1", "C", 40)
+
+    assert cache.get("b", "e1") is None and len(cache) == 2 and cache.nbytes == 80
+    assert cache.get("a", "e2") is None  # stale ETag
+    cache.put("huge", "e1", "H", 101)
+    assert cache.get("huge", "e1") is None and cache.nbytes == 80
+
+
+def test_daily_assets_hand_off_frames(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.setenv("ALPES_DATACUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.chdir(tmp_path)
+
+    for day in ("2024-05-01", "2024-05-02"):
+        result = materialize_day(day)
+
+    bucket = "alpes-water-monitor"
+    assert (bucket, "io/field_ndwi_daily/date=2024-05-02/value") in fake_minio.objects
+    assert (bucket, "field_ndwi_daily/date=2024-05-02/metrics.csv") in fake_minio.objects
+
+    today = result.output_for_node("field_ndwi_daily")
+    np.testing.assert_allclose(today["mean_ndvi"], -today["mean_ndwi"], atol=1e-6)
+
+    delta = result.output_for_node("field_ndwi_daily_delta")
+    assert len(delta) == 3
+    np.testing.assert_allclose(delta["delta_mean_ndwi"], 0.0)
+
+    summary = result.output_for_node("st_cassien_daily_summary")
+    assert summary.loc[0, "total_fields"] == 3
+
+
+def test_delta_uses_previous_acquisition_date(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.setenv("ALPES_DATACUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.chdir(tmp_path)
+    fake_index_fetch["2024-05-04"] = 5  # 3-day revisit, different scene
+
+    materialize_day("2024-05-01")
+    result = materialize_day("2024-05-04")
+
+    delta = result.output_for_node("field_ndwi_daily_delta")
+    assert len(delta) == 3 and (delta["delta_mean_ndwi"] != 0).any()
+    (event,) = result.asset_materializations_for_node("field_ndwi_daily_delta")
+    assert event.metadata["previous_date"].value == "2024-05-01"
+    assert event.metadata["gap_days"].value == 3
@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+from dagster import AssetExecutionContext, Output, asset, materialize
+from PIL import Image
+
+from alpes_water_monitor.dagster_app.instrumentation import with_timing_metadata
+from alpes_water_monitor.utils.cdse_client import load_png_array
+from alpes_water_monitor.utils.profiling import SpanThreadPool, record_spans, span
+
+
+def test_spans_are_aggregated_by_name():
+    buf = io.BytesIO()
+    Image.fromarray(np.zeros((4, 4), dtype=np.uint8)).save(buf, format="PNG")
+    png = buf.getvalue()
+    with record_spans() as recorder:
+        load_png_array(png)
+        load_png_array(png)
+        with span("custom") as s:
+            s.add_bytes(10)
+
+    meta = recorder.as_metadata()
+    assert meta["timing.decode.load_png_array.calls"] == 2
+    assert meta["timing.decode.load_png_array.bytes"] == 2 * len(png)
+    assert meta["timing.custom.bytes"] == 10
+    assert meta["timing.custom.wall_s"] >= 0.0
+
+    # Spans outside a recorder are not collected anywhere.
+    with span("ignored"):
+        pass
+    assert "timing.ignored.wall_s" not in recorder.as_metadata()
+
+
+def test_spans_in_pool_workers_reach_the_recorder():
+    def work(n):
+        with span("worker") as s:
+            s.add_bytes(n)
+
+    with record_spans() as recorder, SpanThreadPool(max_workers=4) as pool:
+        list(pool.map(work, range(1, 9)))
+
+    meta = recorder.as_metadata()
+    assert meta["timing.worker.calls"] == 8
+    assert meta["timing.worker.bytes"] == sum(range(1, 9))
+
+
+def test_with_timing_metadata_on_asset(monkeypatch, tmp_path):
+    monkeypatch.setenv("ALPES_PROFILE", "cprofile")
+    monkeypatch.setenv("ALPES_PROFILE_DIR", str(tmp_path))
+
+    @asset
+    @with_timing_metadata
+    def timed_asset(context: AssetExecutionContext) -> Output[int]:
+        with span("work") as s:
+            s.add_bytes(int(np.zeros(8).nbytes))
+        return Output(1, metadata={"rows": 1})
+
+    result = materialize([timed_asset])
+    meta = result.asset_materializations_for_node("timed_asset")[0].metadata
+
+    assert meta["rows"].value == 1
+    assert meta["timing.work.bytes"].value == 64
+    assert "timing.asset.timed_asset.wall_s" in meta
+    assert (tmp_path / "timed_asset.prof").exists()
@@ -0,0 +1,113 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pandas as pd
+import pytest
+
+from alpes_water_monitor.query.server import QueryServer
+from alpes_water_monitor.query.store import QueryConfig
+from alpes_water_monitor.utils.storage import put_bytes_to_minio
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "load_test_query_service.py"
+
+
+def _put_day(day: str, mean: float):
+    metrics = pd.DataFrame(
+        {"date": [day, day], "field_id": ["a", "b"], "field_name": ["A", "B"], "mean_ndwi": [mean, -mean],
+         "water_area_ha": [10.0, float("nan")]}
+    )
+    delta = pd.DataFrame({"field_id": ["a"], "field_name": ["A"], "delta_mean_ndwi": [0.01]})
+    summary = pd.DataFrame({"date": [day], "location_id": ["loc"], "avg_mean_ndwi": [0.0]})
+    for obj, df in (
+        (f"field_ndwi_daily/date={day}/metrics.csv", metrics),
+        (f"field_ndwi_daily_delta/date={day}/metrics_delta.csv", delta),
+        (f"st_cassien_daily_summary/date={day}/summary.csv", summary),
+    ):
+        put_bytes_to_minio(df.to_csv(index=False).encode(), obj, content_type="text/csv")
+
+
+def _get(url, etag=None):
+    request = Request(url)
+    if etag:
+        request.add_header("If-None-Match", etag)
+    try:
+        with urlopen(request, timeout=10) as resp:
+            return resp.status, json.loads(resp.read() or b"null"), resp.headers.get("ETag")
+    except HTTPError as e:
+        body = e.read()
+        return e.code, json.loads(body) if body else None, e.headers.get("ETag")
+
+
+@pytest.fixture
+def query_server(fake_minio):
+    for i, day in enumerate(("2024-05-01", "2024-05-02", "2024-05-03")):
+        _put_day(day, 0.1 * (i + 1))
+    # 2024-05-01 falls outside the hot window and is read from MinIO on demand.
+    server = QueryServer("127.0.0.1", 0, QueryConfig(hot_days=2, poll_seconds=3600, cache_size=8)).start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def test_series_latest_and_deltas(query_server):
+    base = query_server.url
+    status, body, _ = _get(f"{base}/fields/a/series?from=2024-05-01&to=2024-05-03")
+    assert status == 200
+    assert [r["date"] for r in body["rows"]] == ["2024-05-01", "2024-05-02", "2024-05-03"]
+    assert body["rows"][0]["mean_ndwi"] == pytest.approx(0.1)
+
+    _, latest, _ = _get(f"{base}/latest")
+    assert latest["date"] == "2024-05-03"
+    assert {r["field_id"] for r in latest["fields"]} == {"a", "b"}
+    assert [r["water_area_ha"] for r in latest["fields"]] == [10.0, None]
+
+    _, body, _ = _get(f"{base}/deltas?from=2024-05-02")
+    assert [r["date"] for r in body["rows"]] == ["2024-05-02", "2024-05-03"]
+    _, body, _ = _get(f"{base}/locations/loc/series?to=2024-05-01")
+    assert len(body["rows"]) == 1
+
+    assert _get(f"{base}/nowhere")[0] == 404
+    assert _get(f"{base}/deltas?from=May")[0] == 400
+
+
+def test_etag_cache_and_invalidation(query_server):
+    base = query_server.url
+    url = f"{base}/fields/a/series"
+    status, body, etag = _get(url)
+    assert status == 200 and len(body["rows"]) == 3 and etag
+
+    assert _get(url, etag)[0] == 304
+    assert query_server.service.cache.hits >= 1
+
+    _put_day("2024-05-04", 0.9)
+    with urlopen(Request(f"{base}/invalidate", method="POST"), timeout=10) as resp:
+        assert json.loads(resp.read())["changed"] is True
+
+    status, body, new_etag = _get(url, etag)
+    assert status == 200 and new_etag != etag
+    assert body["rows"][-1]["date"] == "2024-05-04"
+    assert _get(f"{base}/health")[1]["version"] == body["version"]
+
+
+def test_load_test_script_reports_percentiles(query_server):
+    out = subprocess.run(
+        [sys.executable, str(SCRIPT), "--url", query_server.url, "--requests", "40", "--concurrency", "4",
+         "--conditional"],
+        capture_output=True, text=True, timeout=60, check=True,
+    ).stdout
+    assert "p50" in out and "p99" in out and "ALL" in out
+
+
+def test_materialization_hook_invalidates(query_server, monkeypatch):
+    from alpes_water_monitor.query.notify import notify_query_service
+
+    version = query_server.service.store.version
+    _put_day("2024-05-04", 0.9)
+    monkeypatch.setenv("ALPES_QUERY_SERVICE_URL", query_server.url)
+    assert notify_query_service()
+    assert query_server.service.store.version != version
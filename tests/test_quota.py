@@ -0,0 +1,77 @@
+import datetime as dt
+import time
+
+import pytest
+from dagster import build_sensor_context
+
+from alpes_water_monitor.dagster_app.sensors import new_acquisitions_sensor
+from alpes_water_monitor.utils.cdse_client import CDSEClient, CDSECredentials, fetch_ndwi
+from alpes_water_monitor.utils.quota import (
+    CDSEQuotaExceeded,
+    QuotaConfig,
+    QuotaCoordinator,
+    estimate_processing_units,
+    get_quota_coordinator,
+)
+
+TIME_RANGE = ("2024-04-26T00:00:00Z", "2024-05-06T23:59:59Z")
+
+
+def test_estimate_processing_units():
+    assert estimate_processing_units(512, 512, 3) == pytest.approx(1.0)
+    assert estimate_processing_units(1024, 1024, 6) == pytest.approx(8.0)
+    assert estimate_processing_units(8, 8, 2) == pytest.approx(0.005)
+
+
+def test_coordinators_share_rate_and_budget(tmp_path):
+    url = f"sqlite:///{tmp_path / 'quota.db'}"
+    config = QuotaConfig(requests_per_minute=2, pu_per_minute=100, monthly_pu=3.0, max_wait_s=0.2)
+    pod_a, pod_b = QuotaCoordinator(url, config), QuotaCoordinator(url, config)
+
+    pod_a.acquire(1.0)
+    pod_b.acquire(1.0)
+    with pytest.raises(CDSEQuotaExceeded, match="slot"):
+        pod_a.acquire(0.5)  # third request within the minute, across both "pods"
+
+    usage = pod_b.usage()
+    assert usage.requests_last_minute == 2
+    assert usage.pu_month == pytest.approx(2.0)
+    assert usage.as_metadata()["cdse_quota.pu_month_remaining"] == pytest.approx(1.0)
+
+    with pytest.raises(CDSEQuotaExceeded, match="Monthly"):
+        pod_b.acquire(1.5)
+
+
+def test_client_backs_off_on_429_through_coordinator(stub_process_api, tmp_path):
+    stub_process_api.rate_limited = 1
+    client = CDSEClient(CDSECredentials("stub", "stub"))
+
+    start = time.time()
+    fetch_ndwi(client, bbox=(6.0, 43.0, 6.1, 43.1), time_range=TIME_RANGE, size=(16, 16), out_dir=str(tmp_path))
+
+    process_calls = [path for path, _ in stub_process_api.requests if path == "/process"]
+    assert len(process_calls) == 2
+    usage = client.quota.usage()
+    assert usage.blocked_until >= start + 1.0
+    assert usage.requests_last_minute == 2
+    assert client.processing_units == pytest.approx(estimate_processing_units(16, 16, 2))
+    # The 429 attempt counts against the request rate but is not charged.
+    assert usage.pu_month == pytest.approx(client.processing_units)
+    assert usage.pu_last_minute == pytest.approx(client.processing_units)
+
+
+def test_sensor_defers_dates_beyond_monthly_budget(stub_process_api):
+    today = dt.date.today()
+    older, newer = today - dt.timedelta(days=5), today - dt.timedelta(days=2)
+    stub_process_api.catalog_features = [
+        {"id": f"S2_{d}", "properties": {"datetime": f"{d.isoformat()}T10:00:00Z"}} for d in (older, newer)
+    ]
+    quota = get_quota_coordinator()
+    quota.config.monthly_pu = 2.0  # room for one 512 px multi-index run (~1.7 PU)
+
+    result = new_acquisitions_sensor(build_sensor_context())
+    assert [r.partition_key for r in result.run_requests] == [newer.isoformat()]
+
+    quota.config.monthly_pu = 100.0
+    result = new_acquisitions_sensor(build_sensor_context(cursor=result.cursor))
+    assert [r.partition_key for r in result.run_requests] == [older.isoformat()]
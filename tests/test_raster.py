@@ -0,0 +1,144 @@
+import datetime as dt
+
+import numpy as np
+import pytest
+import shapely.geometry as geom
+
+from alpes_water_monitor.services.field_metrics import MetricsConfig, compute_field_metrics_from_ndwi
+from alpes_water_monitor.utils.models import Field, FieldConfig
+from alpes_water_monitor.utils.raster import field_coverage_matrix
+
+
+def _field(fid, polygon):
+    return Field(id=fid, name=fid, polygon=polygon, monitoring_start=dt.date(2024, 1, 1))
+
+
+def test_coverage_matrix_fractions_and_overlap():
+    bbox = (0.0, 0.0, 4.0, 4.0)  # 4x4 pixels of 1x1
+    fields = [
+        _field("half", geom.box(0.0, 3.0, 1.5, 4.0)),  # top-left pixel + half of its neighbour
+        _field("overlap", geom.box(1.0, 3.0, 2.0, 4.0)),  # overlaps "half" on pixel (0, 1)
+    ]
+
+    matrix = field_coverage_matrix(fields, bbox, 4, 4)
+    dense = matrix.toarray().reshape(2, 4, 4)
+
+    np.testing.assert_allclose(dense[0, 0, :2], [1.0, 0.5])
+    assert dense[0].sum() == pytest.approx(1.5)
+    np.testing.assert_allclose(dense[1, 0, 1], 1.0)
+    assert dense[1].sum() == pytest.approx(1.0)
+
+    # Same (bbox, size, geometries) -> cached matrix.
+    assert field_coverage_matrix(fields, bbox, 4, 4) is matrix
+
+
+def test_weighted_metrics_use_fractional_coverage():
+    ndwi = np.array([[0.5, -0.5], [0.0, 0.0]], dtype=np.float32)
+    cfg = FieldConfig(
+        location_id="loc",
+        location_name="Loc",
+        bbox=(0.0, 0.0, 2.0, 2.0),
+        fields=[_field("f", geom.box(0.0, 1.0, 1.5, 2.0))],
+    )
+
+    (rec,) = compute_field_metrics_from_ndwi(ndwi, cfg, dt.date(2024, 4, 10), MetricsConfig())
+    # weights 1.0 and 0.5 on the top row
+    assert rec["mean_ndwi"] == pytest.approx((0.5 - 0.25) / 1.5)
+    assert rec["water_fraction_pos"] == pytest.approx(1.0 / 1.5)
+
+    (legacy,) = compute_field_metrics_from_ndwi(
+        ndwi, cfg, dt.date(2024, 4, 10), MetricsConfig(coverage="mask")
+    )
+    assert legacy["mean_ndwi"] == pytest.approx(0.0)
+
+
+def test_pixel_area_grid_sums_to_geodesic_bbox_area():
+    from pyproj import Geod
+
+    from alpes_water_monitor.utils.raster import pixel_area_grid
+
+    bbox = (6.8, 43.585, 6.82, 43.6)
+    grid = pixel_area_grid(bbox, 64, 32)
+    expected, _ = Geod(ellps="WGS84").polygon_area_perimeter([6.8, 6.82, 6.82, 6.8], [43.6, 43.6, 43.585, 43.585])
+
+    assert grid.shape == (64 * 32,) and not grid.flags.writeable
+    assert grid.sum() == pytest.approx(abs(expected), rel=1e-5)
+    # Cells shrink towards the pole: the top row is slightly smaller than the bottom one.
+    assert grid[0] < grid[-1]
+    assert pixel_area_grid(bbox, 64, 32) is grid
+
+
+def test_water_area_in_hectares_both_coverage_modes():
+    from pyproj import Geod
+
+    from alpes_water_monitor.services.field_metrics import compute_field_metrics_from_indices
+
+    bbox = (6.8, 43.585, 6.82, 43.6)
+    cfg = FieldConfig("loc", "Loc", bbox, [_field("lake", geom.box(6.802, 43.587, 6.818, 43.598))])
+    ndwi = np.full((40, 40), -0.5, dtype=np.float32)
+    ndwi[:, :20] = 0.5  # western half is water
+
+    (row,) = compute_field_metrics_from_indices({"ndwi": ndwi}, cfg, dt.date(2024, 5, 1))
+    geodesic_area, _ = Geod(ellps="WGS84").geometry_area_perimeter(cfg.fields[0].polygon)
+    assert row["field_area_ha"] == pytest.approx(abs(geodesic_area) / 1e4, rel=1e-4)
+    assert row["water_area_ha"] == pytest.approx(row["field_area_ha"] * row["water_fraction_pos"], rel=1e-3)
+    assert np.isnan(row["water_volume_hm3"])
+
+    (mask_row,) = compute_field_metrics_from_ndwi(ndwi, cfg, dt.date(2024, 5, 1), MetricsConfig(coverage="mask"))
+    assert mask_row["water_area_ha"] == pytest.approx(row["water_area_ha"], rel=0.15)
+
+
+def test_location_water_area_counts_overlapping_fields_once():
+    import pandas as pd
+    from pyproj import Geod
+
+    from alpes_water_monitor.services.field_metrics import (
+        compute_field_metrics_from_indices,
+        summarize_today_and_delta,
+    )
+    from alpes_water_monitor.services.reprocess import compute_metrics_stack
+
+    bbox = (6.8, 43.585, 6.82, 43.6)
+    west, east = geom.box(6.802, 43.587, 6.814, 43.598), geom.box(6.808, 43.587, 6.818, 43.598)
+    cfg = FieldConfig("loc", "Loc", bbox, [_field("west", west), _field("east", east)])
+    ndwi = np.full((80, 80), 0.5, dtype=np.float32)  # all water
+    day = dt.date(2024, 5, 1)
+
+    rows = compute_field_metrics_from_indices({"ndwi": ndwi}, cfg, day)
+    union_area, _ = Geod(ellps="WGS84").geometry_area_perimeter(west.union(east))
+    union_ha = abs(union_area) / 1e4
+    assert sum(r["water_area_ha"] for r in rows) > 1.3 * union_ha
+    assert rows[0]["location_water_area_ha"] == pytest.approx(union_ha, rel=1e-3)
+
+    (summary,) = summarize_today_and_delta(pd.DataFrame(rows), pd.DataFrame(), day, cfg)
+    assert summary["total_water_area_ha"] == pytest.approx(union_ha, rel=1e-3)
+    assert summary["total_field_area_ha"] == pytest.approx(union_ha, rel=1e-3)
+
+    # Bulk reprocessing computes the same union from the raw uint8 raster.
+    stack = np.full((1, 80, 80), 191, dtype=np.uint8)
+    bulk = compute_metrics_stack(stack, [day], cfg)
+    np.testing.assert_allclose(bulk["location_water_area_ha"], rows[0]["location_water_area_ha"], rtol=1e-5)
+
+    mask_rows = compute_field_metrics_from_ndwi(ndwi, cfg, day, MetricsConfig(coverage="mask"))
+    assert mask_rows[0]["location_water_area_ha"] < sum(r["water_area_ha"] for r in mask_rows)
+
+
+def test_location_area_of_adjacent_fields_equals_their_sum():
+    from alpes_water_monitor.services.field_metrics import compute_field_metrics_from_indices
+    from alpes_water_monitor.services.reprocess import compute_metrics_stack
+
+    # Touching but not overlapping, with the shared edge inside a pixel column.
+    bbox = (0.0, 0.0, 1.0, 1.0)
+    left, right = geom.box(0.1, 0.1, 0.55, 0.9), geom.box(0.55, 0.1, 0.9, 0.9)
+    cfg = FieldConfig("loc", "Loc", bbox, [_field("left", left), _field("right", right)])
+    ndwi = np.full((10, 10), 0.5, dtype=np.float32)  # all water
+    day = dt.date(2024, 5, 1)
+
+    rows = compute_field_metrics_from_indices({"ndwi": ndwi}, cfg, day)
+    total = sum(r["field_area_ha"] for r in rows)
+    assert rows[0]["location_area_ha"] == pytest.approx(total, rel=1e-5)
+    assert rows[0]["location_water_area_ha"] == pytest.approx(sum(r["water_area_ha"] for r in rows), rel=1e-5)
+
+    bulk = compute_metrics_stack(np.full((1, 10, 10), 191, dtype=np.uint8), [day], cfg)
+    np.testing.assert_allclose(bulk["location_area_ha"], total, rtol=1e-5)
+    np.testing.assert_allclose(bulk["location_water_area_ha"], total, rtol=1e-5)
@@ -0,0 +1,127 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+from dagster import DagsterInstance, build_run_status_sensor_context, materialize
+
+from alpes_water_monitor.dagster_app import assets
+from alpes_water_monitor.dagster_app.io_manager import load_stored_asset_partition, minio_arrow_io_manager
+from alpes_water_monitor.dagster_app.jobs import reprocess_field_metrics_job
+from alpes_water_monitor.dagster_app.sensors import reprocessed_metrics_sensor
+from alpes_water_monitor.utils import ndwi
+
+DAYS = ("2024-05-01", "2024-05-02", "2024-05-03")
+
+
+def _materialize_days(fake_index_fetch):
+    fake_index_fetch["2024-05-03"] = 9  # 05-02 is carried forward from 05-01
+    frames = {}
+    for day in DAYS:
+        result = materialize(
+            [assets.raw_ndwi_daily, assets.field_ndwi_daily],
+            partition_key=day,
+            resources={"io_manager": minio_arrow_io_manager},
+        )
+        assert result.success
+        frames[day] = result.output_for_node("field_ndwi_daily")
+    return frames
+
+
+def _no_cdse(*_args, **_kwargs):
+    raise AssertionError("reprocessing must not call CDSE")
+
+
+def test_reprocess_matches_daily_metrics(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    daily = _materialize_days(fake_index_fetch)
+    monkeypatch.setattr(ndwi, "fetch_index_parts_for_bbox", _no_cdse)
+
+    result = reprocess_field_metrics_job.execute_in_process(
+        run_config={"ops": {"reprocess_field_metrics_op": {"config": {"workers": 2, "chunk_dates": 2}}}},
+        resources={"io_manager": minio_arrow_io_manager},
+    )
+    assert result.success
+    # Decode and upload spans run in pool threads and still reach the op's timing metadata.
+    (output,) = [e for e in result.all_node_events if e.is_successful_output]
+    timing = set(output.step_output_data.metadata)
+    assert {"timing.minio.download.wall_s", "timing.decode.archive_png.wall_s"} <= timing
+    materializations = result.asset_materializations_for_node("reprocess_field_metrics_op")
+    assert [(m.asset_key.to_user_string(), m.partition) for m in materializations] == [
+        ("field_ndwi_daily", day) for day in DAYS
+    ]
+
+    for day in DAYS:
+        stored = load_stored_asset_partition("field_ndwi_daily", day)
+        pd.testing.assert_frame_equal(
+            stored[list(daily[day].columns)], daily[day], check_dtype=False, atol=1e-5
+        )
+
+
+def test_mask_coverage_reaches_daily_asset_and_reprocess(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    fractional = _materialize_days(fake_index_fetch)
+    monkeypatch.setenv("ALPES_METRICS_COVERAGE", "mask")
+    masked = _materialize_days(fake_index_fetch)["2024-05-01"]
+
+    # all_touched masks count whole edge pixels, so the areas differ from the fractional ones.
+    assert set(masked["field_id"]) == set(fractional["2024-05-01"]["field_id"])
+    assert "mean_ndvi" in masked.columns and masked["mean_ndvi"].notna().all()
+    assert (masked["field_area_ha"] > fractional["2024-05-01"]["field_area_ha"]).all()
+
+    monkeypatch.setattr(ndwi, "fetch_index_parts_for_bbox", _no_cdse)
+    config = {"start": "2024-05-01", "end": "2024-05-01"}
+    result = reprocess_field_metrics_job.execute_in_process(
+        run_config={"ops": {"reprocess_field_metrics_op": {"config": config}}},
+        resources={"io_manager": minio_arrow_io_manager},
+    )
+    assert result.success
+    stored = load_stored_asset_partition("field_ndwi_daily", "2024-05-01")
+    pd.testing.assert_frame_equal(stored[list(masked.columns)], masked, check_dtype=False, atol=1e-5)
+
+
+def test_reprocess_applies_new_thresholds(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    daily = _materialize_days(fake_index_fetch)
+
+    # The thresholds come from the same settings the daily asset reads.
+    monkeypatch.setenv("ALPES_WATER_THRESHOLD_POS", "0.5")
+    config = {"start": "2024-05-02", "end": "2024-05-03"}
+    result = reprocess_field_metrics_job.execute_in_process(
+        run_config={"ops": {"reprocess_field_metrics_op": {"config": config}}},
+        resources={"io_manager": minio_arrow_io_manager},
+    )
+    assert result.success
+
+    # Untouched outside the range, stricter threshold inside it.
+    first = load_stored_asset_partition("field_ndwi_daily", "2024-05-01")
+    np.testing.assert_allclose(first["water_fraction_pos"], daily["2024-05-01"]["water_fraction_pos"])
+    third = load_stored_asset_partition("field_ndwi_daily", "2024-05-03")
+    assert (third["water_fraction_pos"] <= daily["2024-05-03"]["water_fraction_pos"] + 1e-9).all()
+    assert (third["water_fraction_pos"] < daily["2024-05-03"]["water_fraction_pos"]).any()
+    np.testing.assert_allclose(third["mean_ndwi"], daily["2024-05-03"]["mean_ndwi"], atol=1e-5)
+
+    csv = pd.read_csv(fake_minio.get_object("alpes-water-monitor", "field_ndwi_daily/date=2024-05-02/metrics.csv"))
+    assert set(csv["date"]) == {dt.date(2024, 5, 2).isoformat()}
+
+
+def test_reprocess_requests_downstream_partitions(fake_minio, fake_index_fetch, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    _materialize_days(fake_index_fetch)
+
+    instance = DagsterInstance.ephemeral()
+    result = reprocess_field_metrics_job.execute_in_process(
+        run_config={"ops": {"reprocess_field_metrics_op": {"config": {"start": "2024-05-02"}}}},
+        resources={"io_manager": minio_arrow_io_manager},
+        instance=instance,
+    )
+    assert result.success
+
+    context = build_run_status_sensor_context(
+        sensor_name="reprocessed_metrics_sensor",
+        dagster_event=result.get_run_success_event(),
+        dagster_instance=instance,
+        dagster_run=result.dagster_run,
+    )
+    requests = reprocessed_metrics_sensor(context)
+    assert [r.partition_key for r in requests] == ["2024-05-02", "2024-05-03"]
+    assert len({r.run_key for r in requests}) == 2
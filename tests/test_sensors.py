@@ -0,0 +1,73 @@
+import datetime as dt
+import json
+
+from dagster import build_sensor_context
+
+from alpes_water_monitor.dagster_app.sensors import new_acquisitions_sensor
+from alpes_water_monitor.utils.cdse_client import CDSEClient, CDSECredentials
+
+
+def _feature(acq_id: str, day: dt.date, cloud: float = 10.0) -> dict:
+    return {
+        "id": acq_id,
+        "properties": {"datetime": f"{day.isoformat()}T10:20:30Z", "eo:cloud_cover": cloud},
+    }
+
+
+def test_catalog_search_follows_pages(stub_process_api):
+    today = dt.date.today()
+    stub_process_api.catalog_features = [_feature(f"S2_{i}", today) for i in range(5)]
+
+    client = CDSEClient(CDSECredentials("stub", "stub"))
+    features = client.search_catalog((6.0, 43.0, 6.1, 43.1), ("2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z"), limit=2)
+
+    assert [f["id"] for f in features] == [f"S2_{i}" for i in range(5)]
+    assert sum(path == "/catalog" for path, _ in stub_process_api.requests) == 3
+
+
+def test_sensor_requests_only_new_acquisition_dates(stub_process_api):
+    today = dt.date.today()
+    d1, d2 = today - dt.timedelta(days=6), today - dt.timedelta(days=1)
+    # Two tiles on d1 -> a single partition run.
+    stub_process_api.catalog_features = [_feature("S2A_T32TLP", d1), _feature("S2A_T32TLQ", d1)]
+
+    result = new_acquisitions_sensor(build_sensor_context())
+    assert [r.partition_key for r in result.run_requests] == [d1.isoformat()]
+    cursor = result.cursor
+
+    # Nothing new: no runs, cursor unchanged.
+    result = new_acquisitions_sensor(build_sensor_context(cursor=cursor))
+    assert result.run_requests == []
+    assert result.cursor == cursor
+
+    # A new revisit on d2 only requests d2.
+    stub_process_api.catalog_features.append(_feature("S2B_T32TLP", d2))
+    result = new_acquisitions_sensor(build_sensor_context(cursor=cursor))
+    assert [r.partition_key for r in result.run_requests] == [d2.isoformat()]
+    assert set(json.loads(result.cursor)["saint_cassien"]) == {"S2A_T32TLP", "S2A_T32TLQ", "S2B_T32TLP"}
+
+
+def test_sensor_skips_cloudy_scenes(stub_process_api, monkeypatch):
+    monkeypatch.setenv("ALPES_MAX_CLOUD_COVER", "60")
+    day = dt.date.today() - dt.timedelta(days=2)
+    stub_process_api.catalog_features = [_feature("S2A_cloudy", day, cloud=95.0)]
+
+    result = new_acquisitions_sensor(build_sensor_context())
+    assert result.run_requests == []
+
+
+def test_sensor_defers_same_day_acquisitions(stub_process_api, monkeypatch):
+    from alpes_water_monitor.dagster_app import sensors
+
+    now = dt.datetime.now(dt.timezone.utc)
+    today, yesterday = now.date(), now.date() - dt.timedelta(days=1)
+    stub_process_api.catalog_features = [_feature("S2A_today", today), _feature("S2A_yesterday", yesterday)]
+
+    # Today's partition does not exist yet: requesting it would fail the whole tick.
+    result = new_acquisitions_sensor(build_sensor_context())
+    assert [r.partition_key for r in result.run_requests] == [yesterday.isoformat()]
+    assert set(json.loads(result.cursor)["saint_cassien"]) == {"S2A_yesterday"}
+
+    monkeypatch.setattr(sensors, "_utcnow", lambda: now + dt.timedelta(days=1))
+    result = new_acquisitions_sensor(build_sensor_context(cursor=result.cursor))
+    assert [r.partition_key for r in result.run_requests] == [today.isoformat()]